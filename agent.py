@@ -1,126 +1,58 @@
 # agent.py
+import asyncio
 import os
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-# Import necessary chat model classes
-# from langchain_groq import ChatGroq # REMOVED
-from langchain_openai import ChatOpenAI  # We'll use this for OpenRouter and Groq
-# from groq import Groq  # REMOVED
-# from langchain_anthropic import ChatAnthropic # Keep commented out unless needed
-# from langchain_community.chat_models import ChatOllama # Keep commented out unless needed
-
 from langchain.agents import AgentExecutor, create_react_agent
-from langchain import hub # Hub for prompt templates
+from langchain.agents.agent import RunnableMultiActionAgent
+from parallel_tools import MultiActionReActParser, limit_tool_concurrency # Concurrent tool calls for async mode
+from prompt_loader import load_react_chat_prompt # Bundled prompt templates (no network)
+from metrics import AGENT_TURN_SECONDS, AGENT_TURNS, track # Prometheus counters (see metrics.py)
+from providers import create_llm # Provider registry with shared HTTP pools
 from tools import agent_tools # Import the tools we defined
+from config.constants import AGENT_ASYNC_CONFIG
 import logging # Import logging
-# Import message types for the custom wrapper
-# from langchain_core.messages import BaseMessage # REMOVED
 
-def create_agent_executor(model_name: str = "gemini-2.5-pro-exp-03-25"):
-    """Creates the LangChain agent executor with a specified model from various providers."""
-    logging.info(f"Attempting to create agent executor with model: {model_name}")
-    # Load environment variables
-    load_dotenv()
+def create_agent_executor(model_name: str = "gemini-2.5-pro-exp-03-25", async_mode: bool = False):
+    """Creates the LangChain agent executor with a specified model from various providers.
 
-    # --- 1. Initialize the LLM based on model_name prefix or value ---
-    llm = None
-    try:
-        # Identify provider based on model name (simple prefix check)
-        if model_name.startswith("gemini"):
-            llm = ChatGoogleGenerativeAI(
-                model=model_name,
-                temperature=0.7,
-                google_api_key=os.getenv("GOOGLE_API_KEY")
-            )
-            logging.info(f"Initialized Google Generative AI with model: {model_name}")
-        # REMOVED Llama/Groq block
-        # elif model_name.startswith("llama"):
-            # ... (Groq initialization code removed) ...
-            
-        elif model_name.startswith("gemma"):
-            # Check if OpenRouter API key exists
-            openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
-            if not openrouter_api_key:
-                raise ValueError("OPENROUTER_API_KEY not found in environment variables.")
-            
-            # Initialize ChatOpenAI with OpenRouter configuration for Gemma
-            llm = ChatOpenAI(
-                model="google/gemma-3-4b-it:free",
-                temperature=0.7,
-                openai_api_key=openrouter_api_key,
-                base_url="https://openrouter.ai/api/v1",
-                default_headers={
-                    "HTTP-Referer": "https://github.com/yourusername/your-repo",
-                    "X-Title": "Your App Name"
-                }
-            )
-            logging.info(f"Initialized Gemma via OpenRouter with model: {model_name}")
-        elif model_name.startswith("deepseek"):
-            # Check if OpenRouter API key exists
-            openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
-            if not openrouter_api_key:
-                raise ValueError("OPENROUTER_API_KEY not found in environment variables.")
-            
-            # Map DeepSeek model names to OpenRouter model names
-            model_mapping = {
-                "deepseek-chat": "deepseek/deepseek-r1:free",
-                "deepseek-coder": "deepseek/deepseek-r1:free"
-            }
-            
-            # Get the OpenRouter model name
-            openrouter_model = model_mapping.get(model_name, model_name)
-            
-            # Initialize ChatOpenAI with OpenRouter configuration
-            llm = ChatOpenAI(
-                model=openrouter_model,
-                temperature=0.7,
-                openai_api_key=openrouter_api_key,
-                base_url="https://openrouter.ai/api/v1",
-                default_headers={
-                    "HTTP-Referer": "https://github.com/yourusername/your-repo",  # Replace with your repo URL
-                    "X-Title": "Your App Name"  # Replace with your app name
-                }
-            )
-            logging.info(f"Initialized DeepSeek via OpenRouter with model: {model_name}")
-        # --- Add other providers here as elif blocks --- 
-        # elif model_name.startswith("gpt-"):
-        #     openai_api_key = os.getenv("OPENAI_API_KEY")
-        #     if not openai_api_key: raise ValueError("OPENAI_API_KEY not found")
-        #     llm = ChatOpenAI(model=model_name, temperature=0.7, openai_api_key=openai_api_key)
-        #     logging.info(f"Initialized ChatOpenAI with model: {model_name}")
-        # elif model_name.startswith("claude"):
-        #     anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-        #     if not anthropic_api_key: raise ValueError("ANTHROPIC_API_KEY not found")
-        #     llm = ChatAnthropic(model=model_name, temperature=0.7, anthropic_api_key=anthropic_api_key)
-        #     logging.info(f"Initialized ChatAnthropic with model: {model_name}")
-        # elif model_name in ["some-ollama-model"]: # Or check for Ollama connection
-        #     llm = ChatOllama(model=model_name, temperature=0.7)
-        #     logging.info(f"Initialized ChatOllama with model: {model_name}")
-        else:
-            raise ValueError(f"Unsupported model provider for: {model_name}")
+    With `async_mode`, the model may request several independent tool calls
+    in one step; `ainvoke`/`astream_events` then run them concurrently,
+    at most AGENT_ASYNC_CONFIG["max_concurrent_tools"] at a time.
+    """
+    logging.info(f"Attempting to create agent executor with model: {model_name} (async_mode={async_mode})")
 
-    except Exception as e:
-        logging.error(f"Failed to initialize LLM for model {model_name}: {e}")
-        raise # Re-raise the exception to be caught by the caller (e.g., Streamlit app)
+    # --- 1. Initialize the LLM ---
+    llm = create_llm(model_name)
 
     # --- 2. Get the Tools ---
     tools = agent_tools
+    if async_mode:
+        tools = limit_tool_concurrency(tools, AGENT_ASYNC_CONFIG["max_concurrent_tools"])
     # print(f"Tools loaded: {[tool.name for tool in tools]}") # Keep logging concise
 
     # --- 3. Create the Prompt ---
-    # We'll use a standard ReAct chat prompt from Langchain Hub
+    # We use the standard ReAct chat prompt from Langchain Hub, bundled locally
+    # (refresh with `python prompt_loader.py --refresh`)
     # This prompt guides the LLM on how to use tools within a conversation
     try:
-        prompt_template = hub.pull("hwchase17/react-chat")
+        prompt_template = load_react_chat_prompt(parallel_actions=async_mode)
     except Exception as e:
-        logging.error(f"Failed to pull prompt template: {e}")
+        logging.error(f"Failed to load prompt template: {e}")
         raise
 
     # --- 4. Create the Agent ---
     # This binds the LLM, tools, and prompt together
     # The create_react_agent function formats the tools and prompt correctly
     try:
-        agent = create_react_agent(llm, tools, prompt_template)
+        if async_mode:
+            # A multi-action agent hands every action of a step to the executor,
+            # which gathers them concurrently in its async path
+            agent = RunnableMultiActionAgent(
+                runnable=create_react_agent(llm, tools, prompt_template, output_parser=MultiActionReActParser()),
+                stream_runnable=True
+            )
+        else:
+            agent = create_react_agent(llm, tools, prompt_template)
         logging.info("Agent created successfully.")
     except Exception as e:
         logging.error(f"Failed to create react agent: {e}")
@@ -143,6 +75,24 @@ def create_agent_executor(model_name: str = "gemini-2.5-pro-exp-03-25"):
 
     return agent_executor
 
+async def arun_chat_turn(agent_executor, inputs, save_message=None):
+    """Runs one agent turn with `ainvoke` and returns the answer.
+
+    `save_message(role, content)` is an optional coroutine function that
+    persists the turn; the user message is written while the agent runs.
+    """
+    user_write = asyncio.ensure_future(save_message("user", inputs["input"])) if save_message else None
+    try:
+        with track(AGENT_TURNS, AGENT_TURN_SECONDS):
+            result = await agent_executor.ainvoke(inputs)
+    finally:
+        if user_write is not None:
+            await user_write
+    output = result.get("output", "")
+    if save_message:
+        await save_message("assistant", output)
+    return output
+
 if __name__ == '__main__':
     # Updated test block
     models_to_test = ["gemini-1.5-flash", "llama3-8b-8192", "deepseek-chat"] # Add DeepSeek model
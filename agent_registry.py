@@ -0,0 +1,126 @@
+# agent_registry.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from providers import resolve_model
+from config.constants import AGENT_REGISTRY_CONFIG, AGENT_ASYNC_CONFIG
+
+def build_agent_executor(model_name):
+    """Default registry factory. Imports agent, and with it LangChain's agents package, on first build."""
+    from agent import create_agent_executor
+    return create_agent_executor(model_name, async_mode=AGENT_ASYNC_CONFIG["enabled"])
+
+class AgentRegistry:
+    """Process-wide pool of agent executors.
+
+    Executors are keyed by the resolved (provider, model) pair, so model
+    names that map to the same backend model share one executor. Concurrent
+    requests for a model that is still being built wait for that single
+    build. Beyond `max_size` entries the least recently used executor is
+    evicted, and entries idle for `idle_ttl_s` seconds are dropped.
+    """
+
+    def __init__(self, factory=build_agent_executor,
+                 resolve=resolve_model,
+                 max_size=AGENT_REGISTRY_CONFIG["max_size"],
+                 idle_ttl_s=AGENT_REGISTRY_CONFIG["idle_ttl_s"]):
+        self._factory = factory
+        self._resolve = resolve
+        self.max_size = max_size
+        self.idle_ttl_s = idle_ttl_s
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (executor, last_used)
+        self._building = {}            # key -> Future
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.build_failures = 0
+
+    def get(self, model_name):
+        """Returns the executor serving `model_name`, building it if needed. Raises on build failure."""
+        key = self._resolve(model_name)
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], time.monotonic())
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            future = self._building.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._building[key] = future
+                self.misses += 1
+            else:
+                # Someone else is building it; count as a hit on the shared build
+                self.hits += 1
+
+        if owner:
+            self._build(key, model_name, future)
+        return future.result()
+
+    def _build(self, key, model_name, future):
+        """Builds the executor for `key` and publishes it to waiting callers."""
+        start = time.perf_counter()
+        try:
+            executor = self._factory(model_name=model_name)
+        except Exception as e:
+            with self._lock:
+                self._building.pop(key, None)
+                self.build_failures += 1
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._building.pop(key, None)
+            self._entries[key] = (executor, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                logging.info(f"Evicted agent executor for {evicted_key} (LRU)")
+        logging.info(f"Built agent executor for {key} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        future.set_result(executor)
+
+    def _evict_idle(self):
+        """Drops entries unused for longer than idle_ttl_s. Caller holds the lock."""
+        now = time.monotonic()
+        for key in [k for k, (_, last_used) in self._entries.items() if now - last_used > self.idle_ttl_s]:
+            del self._entries[key]
+            self.evictions += 1
+            logging.info(f"Evicted idle agent executor for {key}")
+
+    def prewarm(self, model_names):
+        """Builds executors for `model_names` on a background thread."""
+        def warm():
+            for model_name in model_names:
+                try:
+                    self.get(model_name)
+                except Exception as e:
+                    logging.warning(f"Prewarming agent for {model_name} failed: {e}")
+
+        thread = threading.Thread(target=warm, name="agent-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        """Returns cache statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "building": len(self._building),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "build_failures": self.build_failures,
+                "models": [f"{provider}:{model}" for provider, model in self._entries]
+            }
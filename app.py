@@ -1,30 +1,17 @@
 # app.py
+# Only what every page needs is imported here. Each page imports its own
+# component (and through it LangChain or the Imagen stack) the first time it
+# is shown; see benchmarks/bench_import_time.py for the cold start budget.
 import streamlit as st
-from agent import create_agent_executor
-# Import database functions
-from database import (
-    get_conversations,
-    create_conversation,
-    get_messages,
-    add_message,
-    delete_conversation
-)
-import sys
+from agent_registry import AgentRegistry
+from model_router import RoutedAgent, get_model_router
+from database import initialize_database_in_background
+from metrics import start_metrics_server
 import logging # Import logging
-import time
-# Import message types for chat history
-from langchain_core.messages import HumanMessage, AIMessage
-# Import NEW image generation functions for Imagen
-from image_generation import (
-    setup_image_generator, 
-    generate_images_with_imagen, 
-    process_imagen_response
-)
+from image_generation import prewarm_prediction_client
 from utils.styling import get_custom_styles
-from config.constants import PAGE_CONFIG, SESSION_KEYS, DEFAULTS
+from config.constants import PAGE_CONFIG, SESSION_KEYS, DEFAULTS, AGENT_REGISTRY_CONFIG, AUTO_MODEL, IMAGEN_CLIENT_CONFIG
 from components.sidebar import render_sidebar
-from components.chat_interface import render_chat_interface
-from components.image_generation import render_image_generation_interface
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -59,26 +46,56 @@ MODEL_DESCRIPTIONS = {
     "gemma": "Google's lightweight but powerful model"
 }
 
-# Cache the agent executor based on the selected model
+# Collections and indexes are ensured once per server process, off the render path
 @st.cache_resource
+def initialize_database_once():
+    return initialize_database_in_background()
+
+# Prometheus scrape endpoint next to the Streamlit server (METRICS_PORT)
+@st.cache_resource
+def start_metrics_server_once():
+    return start_metrics_server()
+
+# One executor registry per server process, shared by all sessions
+@st.cache_resource
+def get_agent_registry():
+    registry = AgentRegistry()
+    registry.prewarm(AGENT_REGISTRY_CONFIG["prewarm_models"])
+    return registry
+
+# Open the Imagen channel once per server process, off the render path,
+# when the image page is first shown
+@st.cache_resource
+def prewarm_imagen_client():
+    return prewarm_prediction_client()
+
 def setup_agent(model_name: str):
+    if model_name == AUTO_MODEL:
+        # Executors of the routed models are fetched per request
+        return RoutedAgent(get_model_router(), get_agent_registry().get)
     try:
-        agent_executor = create_agent_executor(model_name=model_name)
-        logging.info(f"Agent Executor created for Streamlit app with model: {model_name}")
-        return agent_executor
+        return get_agent_registry().get(model_name)
     except Exception as e:
         st.error(f"Failed to initialize the agent with model {model_name}: {e}")
         logging.error(f"Error in setup_agent({model_name}): {e}")
         return None
 
+initialize_database_once()
+start_metrics_server_once()
+
 # Render sidebar
 render_sidebar()
 
-# Get the agent executor based on the selected model
-agent_executor = setup_agent(st.session_state.get(SESSION_KEYS["selected_model"], DEFAULTS["initial_model"]))
-
 # Render main content based on current page
 if st.session_state[SESSION_KEYS["current_page"]] == "Chat":
+    from components.chat_interface import render_chat_interface
+
+    # Get the agent executor based on the selected model
+    agent_executor = setup_agent(st.session_state.get(SESSION_KEYS["selected_model"], DEFAULTS["initial_model"]))
     render_chat_interface(agent_executor)
 else:
+    from components.image_generation import render_image_generation_interface
+
+    if IMAGEN_CLIENT_CONFIG["prewarm"]:
+        prewarm_imagen_client()
     render_image_generation_interface() 
\ No newline at end of file
@@ -0,0 +1,115 @@
+# async_database.py
+# Asyncio counterpart of database.py's message writes, for code running on an
+# event loop (the HTTP server's chat turns). Uses PyMongo's native async client,
+# the successor of Motor. Documents have the same shape as the ones database.py
+# writes, so both modules read each other's data.
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pymongo import AsyncMongoClient
+from database import _get_mongo_uri, _get_db_name, _get_pool_settings, build_message
+from metrics import DB_OPERATIONS, DB_SECONDS, track
+from tracing import span
+from config.constants import DB_SLOW_QUERY_MS
+
+# --- Shared Client State ---
+# The async client is bound to the event loop it is first used on; in the
+# server that is uvicorn's loop of the worker process.
+_async_client = None
+_async_store = None
+_async_lock = threading.Lock()
+
+class AsyncConversationStore:
+    """Async data access for messages.
+
+    Methods raise on database errors; the module-level functions below wrap
+    them with logging and fallback values, like database.py does.
+    """
+
+    def __init__(self, db, slow_query_ms=DB_SLOW_QUERY_MS):
+        self.db = db
+        self.conversations = db.conversations
+        self.messages = db.messages
+        self.slow_query_ms = slow_query_ms
+
+    @contextmanager
+    def _timed(self, operation):
+        """Traces and counts the wrapped operation, like ConversationStore._timed."""
+        start = time.perf_counter()
+        try:
+            with span(f"db.{operation}"), track(DB_OPERATIONS, DB_SECONDS, operation):
+                yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms > self.slow_query_ms:
+                logging.warning(f"Slow query: {operation} took {elapsed_ms:.1f} ms")
+
+    async def insert_messages(self, messages):
+        """Inserts prepared message documents in order and bumps updated_at on their conversations."""
+        with self._timed("messages.insert_many"):
+            await self.messages.insert_many(messages, ordered=True)
+        conversation_ids = list({msg["conversation_id"] for msg in messages})
+        with self._timed("conversations.update_many"):
+            await self.conversations.update_many(
+                {"_id": {"$in": conversation_ids}},
+                {"$set": {"updated_at": datetime.utcnow()}}
+            )
+
+def get_async_store():
+    """Returns the shared AsyncConversationStore, creating the async client on first use."""
+    global _async_client, _async_store
+    if _async_store is not None:
+        return _async_store
+
+    with _async_lock:
+        if _async_store is None:
+            try:
+                settings = _get_pool_settings()
+                _async_client = AsyncMongoClient(
+                    _get_mongo_uri(),
+                    maxPoolSize=settings["max_pool_size"],
+                    minPoolSize=settings["min_pool_size"],
+                    maxIdleTimeMS=settings["max_idle_time_ms"],
+                    serverSelectionTimeoutMS=settings["server_selection_timeout_ms"],
+                    connectTimeoutMS=settings["connect_timeout_ms"]
+                )
+                _async_store = AsyncConversationStore(_async_client[_get_db_name()])
+            except Exception as e:
+                logging.error(f"Unexpected error while creating async database client: {e}")
+                return None
+    return _async_store
+
+async def close_async_db_connection():
+    """Closes the shared async client (call it on the loop that used it)."""
+    global _async_client, _async_store
+    with _async_lock:
+        client, _async_client, _async_store = _async_client, None, None
+    if client is not None:
+        await client.close()
+        logging.info("Async database connection closed")
+
+async def add_message_async(conversation_id, role, content):
+    """Adds a message to a conversation, awaiting the write.
+
+    Returns the message as the chat view sees it, or False if it could not
+    be stored.
+    """
+    store = get_async_store()
+    if store is None:
+        return False
+
+    try:
+        message = build_message(conversation_id, role, content)
+        await store.insert_messages([message])
+        logging.info(f"Added message to conversation {conversation_id}")
+        return {
+            "_id": str(message["_id"]),
+            "role": role,
+            "content": content,
+            "timestamp": message["timestamp"]
+        }
+    except Exception as e:
+        logging.error(f"Error adding message to conversation {conversation_id}: {e}")
+        return False
@@ -0,0 +1,37 @@
+# async_runtime.py
+import asyncio
+import atexit
+import threading
+
+# A single long-lived event loop for agent work. Async HTTP clients keep
+# connections bound to the loop that opened them, so running every async
+# agent call here lets them reuse pooled keep-alive connections safely.
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_agent_loop():
+    """Returns the shared agent event loop, starting its thread on first use."""
+    global _loop
+    if _loop is not None:
+        return _loop
+
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="agent-event-loop", daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+def run_coroutine(coro):
+    """Schedules a coroutine on the agent loop and returns its concurrent.futures.Future.
+
+    The caller's contextvars are carried over to the coroutine.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_agent_loop())
+
+def _stop_loop():
+    if _loop is not None:
+        _loop.call_soon_threadsafe(_loop.stop)
+
+atexit.register(_stop_loop)
@@ -0,0 +1,279 @@
+# batch_eval.py
+"""Runs a JSONL file of prompts through the agent for several models and writes the results as Parquet.
+
+Usage:
+    python batch_eval.py prompts.jsonl [--models gemini-1.5-flash gemma] [--output eval.parquet]
+                         [--concurrency google=8 openrouter=1] [--retry-errors] [--parallel-tools]
+
+Each input line is {"prompt": ..., "id": ..., "chat_history": ...}; only
+"prompt" is required and the id defaults to the line number. Every prompt
+runs once per model (default: every model in AVAILABLE_MODELS but "auto")
+through its own create_agent_executor, with at most BATCH_EVAL_CONFIG
+turns in flight per provider. Each finished turn is appended to
+<output>.checkpoint.jsonl, so an interrupted run picks up where it left off
+when started again with the same arguments; the output (Parquet, or Arrow
+IPC for .arrow/.feather) is written from the checkpoint at the end, with
+one row per prompt and model: answer, latencies, LLM calls, token counts
+and the tool calls of the turn. Use `FAKE_LLM=1 ... --models fake` to try
+it offline.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from agent import create_agent_executor
+from providers import resolve_model
+from sandbox import current_session_id
+from streaming import TurnStats, astream_agent_events
+from tracing import span, stage_summary
+from config.constants import AGENT_ASYNC_CONFIG, AUTO_MODEL, AVAILABLE_MODELS, BATCH_EVAL_CONFIG
+
+# --- Input and Checkpoints ---
+def load_prompts(path):
+    """Reads the prompt file. Returns [{"id", "prompt", "chat_history"}] in file order."""
+    prompts, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("prompt"):
+                raise ValueError(f"{path}:{line_number} has no prompt")
+            prompt_id = str(record.get("id", line_number))
+            if prompt_id in seen:
+                raise ValueError(f"{path}:{line_number} repeats prompt id {prompt_id}")
+            seen.add(prompt_id)
+            prompts.append({
+                "id": prompt_id,
+                "prompt": record["prompt"],
+                "chat_history": record.get("chat_history", "")
+            })
+    return prompts
+
+def load_checkpoint(path):
+    """Returns {(prompt_id, model): row} from a checkpoint file; later rows win."""
+    rows = {}
+    if not os.path.exists(path):
+        return rows
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interruption
+            rows[(row["prompt_id"], row["model"])] = row
+    return rows
+
+def parse_concurrency(values):
+    """Turns ["google=8", ...] into per-provider limits over the configured ones."""
+    limits = dict(BATCH_EVAL_CONFIG["provider_concurrency"])
+    for value in values or []:
+        provider, _, limit = value.partition("=")
+        limits[provider] = int(limit)
+    return limits
+
+# --- Running Turns ---
+async def run_prompt(agent_executor, prompt, model_name, provider):
+    """Runs one prompt through an executor and returns its result row."""
+    # Python_REPL state never leaks between prompts or models
+    current_session_id.set(f"eval:{model_name}:{prompt['id']}")
+    stats, started_at = TurnStats(), time.time()
+    answer, final_output, tool_calls, open_calls = "", None, [], []
+    with span("eval.turn", model=model_name, prompt_id=prompt["id"]) as turn_span:
+        inputs = {"input": prompt["prompt"], "chat_history": prompt["chat_history"]}
+        async for event in astream_agent_events(
+            agent_executor, inputs, stats, idle_timeout_s=BATCH_EVAL_CONFIG["turn_idle_timeout_s"]
+        ):
+            if event.kind == "token":
+                answer += event.content
+            elif event.kind == "final":
+                final_output = event.content
+            elif event.kind == "tool_start":
+                call = {"tool": event.name, "input": event.content, "output": None, "started": time.perf_counter()}
+                tool_calls.append(call)
+                open_calls.append(call)
+            elif event.kind == "tool_end":
+                # Parallel calls can end out of order; match the oldest open call of the tool
+                call = next((c for c in open_calls if c["tool"] == event.name), None)
+                if call is not None:
+                    open_calls.remove(call)
+                    call["output"] = event.content
+                    call["duration_ms"] = (time.perf_counter() - call["started"]) * 1000
+
+    return {
+        "prompt_id": prompt["id"],
+        "model": model_name,
+        "provider": provider,
+        "prompt": prompt["prompt"],
+        "answer": final_output or answer,
+        "succeeded": bool(final_output or answer) and stats.error_type is None,
+        "error_type": stats.error_type,
+        "error": stats.error,
+        "started_at": started_at,
+        "time_to_first_token_ms": stats.time_to_first_token_ms,
+        "total_ms": stats.total_ms,
+        "llm_calls": stats.llm_calls,
+        "input_tokens": stats.input_tokens,
+        "output_tokens": stats.output_tokens,
+        "tool_calls": [
+            {"tool": c["tool"], "input": c["input"], "output": c["output"], "duration_ms": c.get("duration_ms")}
+            for c in tool_calls
+        ],
+        "trace_id": turn_span.trace_id
+    }
+
+async def run_eval(prompts, models, checkpoint_path, concurrency, retry_errors=False,
+                   parallel_tools=AGENT_ASYNC_CONFIG["enabled"]):
+    """Runs every pending (prompt, model) pair, appending each result to the checkpoint."""
+    done = load_checkpoint(checkpoint_path)
+    pending = [
+        (prompt, model_name) for model_name in models for prompt in prompts
+        if (prompt["id"], model_name) not in done
+        or (retry_errors and not done[(prompt["id"], model_name)]["succeeded"])
+    ]
+    print(f"{len(prompts) * len(models) - len(pending)} results kept from {checkpoint_path}, {len(pending)} to run")
+    if not pending:
+        return
+
+    executors = {}
+    for model_name in sorted({model_name for _, model_name in pending}):
+        try:
+            executor = await asyncio.to_thread(
+                create_agent_executor, model_name=model_name, async_mode=parallel_tools
+            )
+        except Exception as e:
+            # Its prompts stay pending and run on the next attempt
+            print(f"Skipping {model_name}: {e}")
+            continue
+        executor.verbose = False  # concurrent turns would interleave on stdout
+        executors[model_name] = executor
+
+    semaphores = {}
+    for model_name in executors:
+        provider = resolve_model(model_name)[0]
+        if provider not in semaphores:
+            semaphores[provider] = asyncio.Semaphore(concurrency.get(provider, BATCH_EVAL_CONFIG["default_concurrency"]))
+    pending = [(prompt, model_name) for prompt, model_name in pending if model_name in executors]
+    finished = 0
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        async def run_one(prompt, model_name):
+            nonlocal finished
+            provider = resolve_model(model_name)[0]
+            async with semaphores[provider]:
+                row = await run_prompt(executors[model_name], prompt, model_name, provider)
+            checkpoint.write(json.dumps(row, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            finished += 1
+            outcome = "ok" if row["succeeded"] else row["error_type"] or "no answer"
+            print(f"[{finished}/{len(pending)}] {model_name} #{prompt['id']}: {outcome} in {row['total_ms'] / 1000:.1f}s")
+
+        await asyncio.gather(*(run_one(prompt, model_name) for prompt, model_name in pending))
+
+# --- Output ---
+def _arrow_schema(pa):
+    return pa.schema([
+        ("prompt_id", pa.string()),
+        ("model", pa.string()),
+        ("provider", pa.string()),
+        ("prompt", pa.string()),
+        ("answer", pa.string()),
+        ("succeeded", pa.bool_()),
+        ("error_type", pa.string()),
+        ("error", pa.string()),
+        ("started_at", pa.timestamp("ms", tz="UTC")),
+        ("time_to_first_token_ms", pa.float64()),
+        ("total_ms", pa.float64()),
+        ("llm_calls", pa.int64()),
+        ("input_tokens", pa.int64()),
+        ("output_tokens", pa.int64()),
+        ("tool_calls", pa.list_(pa.struct([
+            ("tool", pa.string()),
+            ("input", pa.string()),
+            ("output", pa.string()),
+            ("duration_ms", pa.float64())
+        ]))),
+        ("trace_id", pa.string())
+    ])
+
+def write_results(rows, path):
+    """Writes result rows as Parquet, or as Arrow IPC for .arrow/.feather paths."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Writing results needs pyarrow (pip install pyarrow)")
+
+    rows = [dict(row, started_at=datetime.fromtimestamp(row["started_at"], timezone.utc)) for row in rows]
+    table = pa.Table.from_pylist(rows, schema=_arrow_schema(pa))
+    tmp_path = f"{path}.tmp"
+    if path.endswith((".arrow", ".feather")):
+        from pyarrow import feather
+        feather.write_feather(table, tmp_path)
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+def print_summary(rows):
+    """Prints success rate, latency percentiles and tokens per model."""
+    by_model = {}
+    for row in rows:
+        by_model.setdefault(row["model"], []).append(row)
+    latencies = stage_summary({
+        model_name: [r["total_ms"] for r in model_rows if r["succeeded"]] for model_name, model_rows in by_model.items()
+    })
+    latencies = {s["stage"]: s for s in latencies}
+    width = max(len(model_name) for model_name in by_model)
+    print(f"{'model':<{width}}  {'ok':>9}  {'p50 s':>7}  {'p95 s':>7}  {'tokens in/out':>15}  tool calls")
+    for model_name, model_rows in sorted(by_model.items()):
+        ok = sum(1 for r in model_rows if r["succeeded"])
+        s = latencies.get(model_name)
+        p50, p95 = (f"{s['p50_ms'] / 1000:.1f}", f"{s['p95_ms'] / 1000:.1f}") if s else ("n/a", "n/a")
+        tokens = f"{sum(r['input_tokens'] for r in model_rows)}/{sum(r['output_tokens'] for r in model_rows)}"
+        tools = sum(len(r["tool_calls"]) for r in model_rows)
+        print(f"{model_name:<{width}}  {f'{ok}/{len(model_rows)}':>9}  {p50:>7}  {p95:>7}  {tokens:>15}  {tools}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("prompts", help="JSONL file with one {\"prompt\": ...} per line")
+    parser.add_argument("--models", nargs="+", default=[m for m in AVAILABLE_MODELS if m != AUTO_MODEL])
+    parser.add_argument("--output", help="result file (default: <prompts>.parquet)")
+    parser.add_argument("--concurrency", nargs="+", metavar="PROVIDER=N", help="turns in flight per provider")
+    parser.add_argument("--retry-errors", action="store_true", help="rerun checkpointed turns that failed")
+    parser.add_argument("--parallel-tools", action="store_true", default=AGENT_ASYNC_CONFIG["enabled"],
+                        help="let the agent run several tool calls of a step concurrently")
+    args = parser.parse_args()
+
+    for model_name in args.models:
+        if model_name == AUTO_MODEL:
+            parser.error(f"{AUTO_MODEL} routes each prompt differently; list the models to compare instead")
+        try:
+            resolve_model(model_name)
+        except ValueError as e:
+            parser.error(str(e))
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    output = args.output or f"{os.path.splitext(args.prompts)[0]}.parquet"
+    checkpoint_path = output + BATCH_EVAL_CONFIG["checkpoint_suffix"]
+    prompts = load_prompts(args.prompts)
+
+    try:
+        asyncio.run(run_eval(prompts, args.models, checkpoint_path, parse_concurrency(args.concurrency),
+                             args.retry_errors, args.parallel_tools))
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume from the checkpoint.")
+
+    done = load_checkpoint(checkpoint_path)
+    rows = [done[key] for key in ((p["id"], m) for m in args.models for p in prompts) if key in done]
+    if not rows:
+        print("No results yet.")
+        return
+    write_results(rows, output)
+    print(f"Wrote {len(rows)} of {len(prompts) * len(args.models)} results to {output}")
+    print_summary(rows)
+
+if __name__ == "__main__":
+    main()
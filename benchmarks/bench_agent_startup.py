@@ -0,0 +1,54 @@
+# benchmarks/bench_agent_startup.py
+"""Cold-start time of create_agent_executor with hub.pull vs. the bundled prompt.
+
+Usage:
+    python benchmarks/bench_agent_startup.py [--runs 5]
+
+The LLM is replaced by a fake chat model so no API keys are needed and only
+prompt loading and agent assembly are measured. The "before" run needs
+network access to LangChain Hub.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+import agent
+import prompt_loader
+
+def _time_runs(label, runs):
+    """Builds the executor `runs` times from a cold prompt cache and prints the timings."""
+    timings = []
+    for _ in range(runs):
+        prompt_loader.load_prompt.cache_clear()
+        prompt_loader.load_react_chat_prompt.cache_clear()
+        start = time.perf_counter()
+        try:
+            agent.create_agent_executor(model_name="gemini-1.5-flash")
+        except Exception as e:
+            print(f"{label:<8} failed: {e}")
+            return
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<8} mean={statistics.mean(timings):8.1f} ms  min={min(timings):8.1f} ms  max={max(timings):8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    agent.create_llm = lambda model_name: FakeListChatModel(responses=["Final Answer: ok"])
+
+    from langchain import hub
+    bundled_loader = agent.load_react_chat_prompt
+    agent.load_react_chat_prompt = lambda parallel_actions=False: hub.pull("hwchase17/react-chat")
+    _time_runs("before", args.runs)
+
+    agent.load_react_chat_prompt = bundled_loader
+    _time_runs("after", args.runs)
+
+if __name__ == "__main__":
+    main()
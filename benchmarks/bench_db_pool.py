@@ -0,0 +1,95 @@
+# benchmarks/bench_db_pool.py
+"""Per-operation latency of database.py with a fresh client per call vs. the shared pool.
+
+Usage:
+    python benchmarks/bench_db_pool.py [--uri mongodb://localhost:27017] [--ops 200]
+
+Uses a local mongod when one is reachable, otherwise falls back to mongomock
+(which hides connection setup costs, so the gap will be much smaller).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from bson import ObjectId
+import database
+
+DB_NAME = "chat_agent_benchmark"
+
+def _make_client_factory(uri):
+    """Returns a zero-argument MongoClient factory for a live server, or mongomock."""
+    try:
+        probe = MongoClient(uri, serverSelectionTimeoutMS=1000)
+        probe.admin.command('ping')
+        probe.close()
+        print(f"Using mongod at {uri}")
+        return lambda: MongoClient(uri, serverSelectionTimeoutMS=5000)
+    except PyMongoError:
+        import mongomock
+        print("mongod not reachable, using mongomock")
+        shared = mongomock.MongoClient()
+        return lambda: shared
+
+def _legacy_add_message(factory, conversation_id, role, content):
+    """Mimics the old add_message(): new client plus a ping on every call."""
+    client = factory()
+    client.admin.command('ping')
+    client[DB_NAME].messages.insert_one({
+        "conversation_id": ObjectId(conversation_id),
+        "role": role,
+        "content": content,
+        "timestamp": datetime.utcnow()
+    })
+
+def _legacy_get_messages(factory, conversation_id):
+    """Mimics the old get_messages(): new client plus a ping on every call."""
+    client = factory()
+    client.admin.command('ping')
+    return list(client[DB_NAME].messages.find({"conversation_id": ObjectId(conversation_id)}))
+
+def _run(label, add_message, get_messages, ops):
+    """Times add_message + get_messages round trips and prints per-operation latency."""
+    conversation_id = str(ObjectId())
+    timings = []
+    for i in range(ops):
+        start = time.perf_counter()
+        add_message(conversation_id, "user", f"message {i}")
+        get_messages(conversation_id)
+        timings.append((time.perf_counter() - start) * 1000 / 2)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<10} mean={statistics.mean(timings):8.3f} ms  p50={statistics.median(timings):8.3f} ms  p95={p95:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+
+    factory = _make_client_factory(args.uri)
+
+    _run(
+        "before",
+        lambda *a: _legacy_add_message(factory, *a),
+        lambda *a: _legacy_get_messages(factory, *a),
+        args.ops
+    )
+
+    database.close_db_connection()
+    database._create_client = lambda: (factory(), 30)
+    database._get_db_name = lambda: DB_NAME
+    _run("after", database.add_message, database.get_messages, args.ops)
+
+    database.get_db().drop_collection("messages")
+    database.close_db_connection()
+
+if __name__ == "__main__":
+    main()
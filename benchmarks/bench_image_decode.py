@@ -0,0 +1,104 @@
+# benchmarks/bench_image_decode.py
+"""Memory and latency of turning an Imagen response into displayable images, PIL round trip vs. encoded bytes.
+
+Usage:
+    python benchmarks/bench_image_decode.py [--images 8] [--size 1024] [--format PNG]
+
+Builds a synthetic response of `images` noise images (incompressible, so
+payloads are as large as real photos) and runs each pipeline in a fresh
+child process:
+  pil    - the old process_imagen_response(): dict copy of each prediction,
+           base64.b64decode, full PIL decode, then the PNG re-encode
+           st.image does for PIL input
+  bytes  - iter_image_bytes(): a2b_base64 straight to the encoded bytes,
+           which st.image serves as they are (it only reads the header;
+           images wider than 1460 px are still downscaled by Streamlit)
+Reports wall time, the tracemalloc peak (Python objects) and the growth of
+peak RSS (includes Pillow's pixel buffers, which tracemalloc can't see).
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+def _payload(images, size, image_format):
+    """Returns a fake Imagen response with `images` base64 noise images."""
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (size, size), os.urandom(size * size * 3)).save(buffer, format=image_format)
+    b64 = base64.b64encode(buffer.getvalue()).decode("ascii")
+    # Distinct strings per prediction, like a real response
+    predictions = [{"bytesBase64Encoded": b64[:-4] + b64[-4:], "mimeType": f"image/{image_format.lower()}"} for _ in range(images)]
+    return SimpleNamespace(predictions=predictions), len(buffer.getvalue())
+
+def _pil_pipeline(response):
+    displayed = []
+    for prediction in response.predictions:
+        prediction_dict = dict(prediction.items())
+        image = Image.open(io.BytesIO(base64.b64decode(prediction_dict["bytesBase64Encoded"])))
+        out = io.BytesIO()
+        image.save(out, format="PNG")  # what st.image does with a PIL image
+        displayed.append(out.getvalue())
+    return displayed
+
+def _bytes_pipeline(response):
+    from image_generation import iter_image_bytes
+    displayed = []
+    for data in iter_image_bytes(response):
+        Image.open(io.BytesIO(data)).size  # what st.image does with bytes that fit the page
+        displayed.append(data)
+    return displayed
+
+def _child(args):
+    """Runs one pipeline and prints its measurements as JSON."""
+    response, encoded_size = _payload(args.images, args.size, args.format)
+    if args.pipeline == "bytes":
+        import image_generation  # noqa: F401 - keep module import out of the measurement
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = time.perf_counter()
+    displayed = (_bytes_pipeline if args.pipeline == "bytes" else _pil_pipeline)(response)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    print(json.dumps({
+        "elapsed_ms": elapsed * 1000,
+        "tracemalloc_peak_mb": peak / 1e6,
+        "rss_growth_mb": rss_growth / 1024,
+        "encoded_mb": encoded_size * args.images / 1e6,
+        "displayed_mb": sum(len(d) for d in displayed) / 1e6
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--format", default="PNG", choices=["PNG", "JPEG"])
+    parser.add_argument("--pipeline", choices=["pil", "bytes"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.pipeline:
+        return _child(args)
+
+    print(f"{args.images} x {args.size}px {args.format}")
+    for pipeline in ("pil", "bytes"):
+        command = [sys.executable, __file__, "--pipeline", pipeline,
+                   "--images", str(args.images), "--size", str(args.size), "--format", args.format]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"  {pipeline:<6} {r['elapsed_ms']:8.1f} ms  tracemalloc peak={r['tracemalloc_peak_mb']:7.1f} MB  "
+              f"peak RSS +{r['rss_growth_mb']:7.1f} MB  displayed={r['displayed_mb']:6.1f} MB "
+              f"(encoded {r['encoded_mb']:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/bench_imagen_client.py
+"""Image page rerun latency and Imagen request latency, per-call SDK setup vs. the shared client.
+
+Usage:
+    python benchmarks/bench_imagen_client.py [--reruns 100] [--requests 50] [--server-latency 0.05]
+    GOOGLE_CLOUD_PROJECT=... python benchmarks/bench_imagen_client.py --live [--requests 5]
+
+Rerun latency is setup_image_generator() as the page calls it on every
+rerun: the old version imported the SDK and ran aiplatform.init; the new
+one only checks settings. "first" is the first rerun of a fresh process.
+
+Request latency is one predict round trip with a new PredictionServiceClient
+per request (old) vs. the shared client from get_prediction_client().
+Offline it runs against an in-process gRPC PredictionService on localhost,
+which has no TLS or credential setup, so it understates the gap. --live
+sends real Imagen requests (sampleCount 1, billed) to GOOGLE_CLOUD_PROJECT.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent import futures
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "benchmark-project")
+
+import grpc
+from google.protobuf import json_format, struct_pb2
+from google.cloud.aiplatform_v1.services.prediction_service import PredictionServiceClient
+from google.cloud.aiplatform_v1.services.prediction_service.transports.grpc import PredictionServiceGrpcTransport
+from google.cloud.aiplatform_v1.types import PredictRequest, PredictResponse
+import image_generation
+
+FIRST_RERUN_SCRIPT = """
+import sys, time
+sys.path.insert(0, {root!r})
+import image_generation
+start = time.perf_counter()
+if {legacy}:
+    import google.cloud.aiplatform as aiplatform
+    aiplatform.init(project=image_generation.PROJECT_ID, location=image_generation.LOCATION)
+else:
+    image_generation.setup_image_generator()
+print(time.perf_counter() - start)
+"""
+
+def _legacy_setup():
+    """Mimics the old setup_image_generator(): aiplatform.init on every rerun."""
+    import google.cloud.aiplatform as aiplatform
+    aiplatform.init(project=image_generation.PROJECT_ID, location=image_generation.LOCATION)
+
+def _first_rerun_ms(legacy):
+    script = FIRST_RERUN_SCRIPT.format(root=ROOT, legacy=legacy)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+def _time_ms(fn, n):
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"  {label:<8} p50={statistics.median(timings):8.2f} ms  p95={p95:8.2f} ms  max={timings[-1]:8.2f} ms")
+
+def _start_local_server(latency_s):
+    """Serves PredictionService.Predict on localhost; returns (server, address)."""
+    # Raw protobuf message: proto-plus won't wrap struct Values in a repeated field
+    response = PredictResponse.pb()(predictions=[
+        json_format.ParseDict({"bytesBase64Encoded": "AAAA"}, struct_pb2.Value())
+    ]).SerializeToString()
+
+    def predict(request, context):
+        time.sleep(latency_s)
+        return response
+
+    handler = grpc.method_handlers_generic_handler("google.cloud.aiplatform.v1.PredictionService", {
+        "Predict": grpc.unary_unary_rpc_method_handler(
+            predict,
+            request_deserializer=PredictRequest.deserialize,
+            response_serializer=lambda serialized: serialized
+        )
+    })
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, f"127.0.0.1:{port}"
+
+def _local_client(address):
+    return PredictionServiceClient(transport=PredictionServiceGrpcTransport(
+        host=address, channel=grpc.insecure_channel(address)
+    ))
+
+def _live_legacy_client():
+    """Mimics the old generate_images_with_imagen(): a new client per request."""
+    import google.cloud.aiplatform as aiplatform
+    client_options = {"api_endpoint": f"{image_generation.LOCATION}-aiplatform.googleapis.com"}
+    return aiplatform.gapic.PredictionServiceClient(client_options=client_options)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--server-latency", type=float, default=0.05)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    print("rerun latency (setup_image_generator):")
+    print(f"  first    old={_first_rerun_ms(True):8.2f} ms  new={_first_rerun_ms(False):8.2f} ms")
+    _legacy_setup()  # the SDK import is already counted in "first"
+    _report("old", _time_ms(_legacy_setup, args.reruns))
+    _report("new", _time_ms(image_generation.setup_image_generator, args.reruns))
+
+    instances = [{"prompt": "a lighthouse at dusk, realistic style"}]
+    parameters = {"sampleCount": 1}
+    endpoint = image_generation.imagen_endpoint()
+    if args.live:
+        print("request latency (live Imagen):")
+        new_client = lambda: image_generation.get_prediction_client()
+        old_client = _live_legacy_client
+        server = None
+    else:
+        server, address = _start_local_server(args.server_latency)
+        print(f"request latency (local gRPC server, {args.server_latency * 1000:.0f} ms per call):")
+        shared = _local_client(address)
+        new_client = lambda: shared
+        old_client = lambda: _local_client(address)
+
+    # One untimed call each, so imports and the shared channel's first connect aren't measured
+    for factory in (old_client, new_client):
+        factory().predict(endpoint=endpoint, instances=instances, parameters=parameters)
+    _report("old", _time_ms(lambda: old_client().predict(endpoint=endpoint, instances=instances, parameters=parameters), args.requests))
+    _report("new", _time_ms(lambda: new_client().predict(endpoint=endpoint, instances=instances, parameters=parameters), args.requests))
+    if server:
+        server.stop(None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_import_time.py
+"""Cold-start import time of the entry points, checked against IMPORT_TIME_BUDGETS_MS.
+
+Usage:
+    python benchmarks/bench_import_time.py [--repeat 3] [--top 8] [module ...]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter per
+target (after one untimed run to compile bytecode) and reports the best of
+`repeat` runs with the heaviest direct imports. "app" is executed in
+Streamlit bare mode, so it covers the imports plus the first render of the
+default Chat page. Exits with status 1 if a target is over its budget.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config.constants import IMPORT_TIME_BUDGETS_MS
+
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+def _import_times(module):
+    """Returns (total_us, [(cumulative_us, name) of direct imports]) for one fresh import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total, children = None, []
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)) // 2, match.group(4)
+        if depth == 0 and name == module:
+            total = cumulative
+        elif depth == 1:
+            children.append((cumulative, name))
+    return total, sorted(children, reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(IMPORT_TIME_BUDGETS_MS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        _import_times(module)  # compile bytecode
+        total, children = min((_import_times(module) for _ in range(args.repeat)), key=lambda run: run[0])
+        budget = IMPORT_TIME_BUDGETS_MS.get(module)
+        total_ms = total / 1000
+        verdict = "" if budget is None else ("  OK" if total_ms <= budget else "  OVER BUDGET")
+        print(f"{module}: {total_ms:7.0f} ms" + (f" (budget {budget} ms){verdict}" if budget else ""))
+        for cumulative, name in children[:args.top]:
+            print(f"    {cumulative / 1000:7.0f} ms  {name}")
+        if budget is not None and total_ms > budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
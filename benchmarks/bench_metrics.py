@@ -0,0 +1,77 @@
+# benchmarks/bench_metrics.py
+"""Cost of metric updates on the hot path, sharded counters vs. one shared lock.
+
+Usage:
+    python benchmarks/bench_metrics.py [--ops 200000] [--threads 1 4 16]
+
+Each thread does `ops` updates of labelled metrics (Counter.inc and
+Histogram.observe, as in database.py's `track`); reports the time per update
+for metrics.py's sharded metrics and for a single-lock counter, and the time
+of one scrape (REGISTRY.render) with the filled registry.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import REGISTRY, Counter, Histogram
+
+class SingleLockCounter:
+    """Baseline: one dict behind one lock, shared by all threads."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+def _run(threads, ops, update):
+    """Returns ns per update with `threads` threads each doing `ops` updates."""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for i in range(ops):
+            update(i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.join()
+    return (time.perf_counter() - start) / (threads * ops) * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    operations = [f"messages.op{i}" for i in range(8)]
+    sharded = Counter("bench_sharded_total", "bench", ("operation", "outcome"))
+    single = SingleLockCounter()
+    histogram = Histogram("bench_seconds", "bench", ("operation",))
+
+    print(f"ns per update ({args.ops} updates per thread):")
+    for threads in args.threads:
+        baseline = _run(threads, args.ops, lambda i: None)
+        results = {
+            "sharded inc": _run(threads, args.ops, lambda i: sharded.inc(operations[i & 7], "ok")),
+            "single-lock inc": _run(threads, args.ops, lambda i: single.inc(operations[i & 7], "ok")),
+            "sharded observe": _run(threads, args.ops, lambda i: histogram.observe(0.003, operations[i & 7]))
+        }
+        print(f"  {threads:>3} threads  " + "  ".join(f"{name}={ns - baseline:6.0f}" for name, ns in results.items()))
+
+    start = time.perf_counter()
+    body = REGISTRY.render()
+    print(f"scrape: {(time.perf_counter() - start) * 1000:.2f} ms for {len(body.splitlines())} lines")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_resilience.py
+"""Success rate and tail latency of LLM calls with and without the resilience layer.
+
+Usage:
+    python benchmarks/bench_resilience.py [--requests 200] [--concurrency 20]
+
+Runs fully offline against fakes.FakeProviderChatModel with injected faults:
+  healthy   - no faults
+  errors    - 20% of calls fail with a 503
+  hangs     - 3% of calls hang for 10 s (timeout + retry)
+  hedged    - same hangs, with hedged requests after the p95 latency
+  outage    - every call fails; the circuit breaker starts failing fast
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeProviderChatModel
+from resilience import CircuitBreaker, LatencyTracker, ResilientChatModel, get_resilience_stats
+
+SCENARIOS = [
+    ("healthy", {}, False),
+    ("errors", {"error_rate": 0.2}, False),
+    ("hangs", {"hang_rate": 0.03}, False),
+    ("hedged", {"hang_rate": 0.03}, True),
+    ("outage", {"error_rate": 1.0}, False),
+]
+
+POLICY = {
+    "timeout_s": 2,
+    "max_retries": 2,
+    "backoff_base_s": 0.1,
+    "backoff_max_s": 1,
+    "failure_threshold": 5,
+    "reset_timeout_s": 2
+}
+
+def _resilient(name, inner, hedge):
+    policy = dict(POLICY, hedge=hedge)
+    return ResilientChatModel(
+        inner=inner,
+        provider=name,
+        policy=policy,
+        breaker=CircuitBreaker(name, policy["failure_threshold"], policy["reset_timeout_s"]),
+        latencies=LatencyTracker(200),
+        first_chunk_latencies=LatencyTracker(200)
+    )
+
+async def _run(model, requests, concurrency):
+    """Returns (success count, latencies in seconds) for `requests` calls."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, successes = [], 0
+
+    async def one():
+        nonlocal successes
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await model.ainvoke("hello")
+                successes += 1
+            except Exception:
+                pass
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return successes, sorted(latencies)
+
+def _report(label, requests, successes, latencies):
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"  {label:<10} ok={successes / requests:6.1%}  p50={statistics.median(latencies):6.2f} s  p99={p99:6.2f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, faults, hedge in SCENARIOS:
+        print(f"{name}:")
+        inner = FakeProviderChatModel(latency_s=0.2, jitter_s=0.1, hang_s=10, **faults)
+        _report("bare", args.requests, *asyncio.run(_run(inner, args.requests, args.concurrency)))
+        provider = f"bench-{name}"
+        model = _resilient(provider, inner, hedge)
+        _report("resilient", args.requests, *asyncio.run(_run(model, args.requests, args.concurrency)))
+        print(f"  breaker={model.breaker.state}  {get_resilience_stats().get(provider, {})}")
+
+if __name__ == "__main__":
+    main()
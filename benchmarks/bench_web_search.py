@@ -0,0 +1,66 @@
+# benchmarks/bench_web_search.py
+"""WebSearch throughput with a bare backend vs. the cached, coalescing SearchService.
+
+Usage:
+    python benchmarks/bench_web_search.py [--latency 0.3] [--users 20]
+
+Runs fully offline against fakes.FakeSearchBackend. Three scenarios:
+  repeat   - one agent loop that searches the same query 5 times
+  crowd    - `users` concurrent sessions searching the same query
+  fan-out  - one input with 4 independent sub-queries
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeSearchBackend
+from web_search import SearchService
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+def _report(name, backend, before_ms, after_backend, after_ms):
+    print(f"{name:<8} before: {before_ms:8.0f} ms ({backend.calls:3d} backend calls)   "
+          f"after: {after_ms:8.0f} ms ({after_backend.calls:3d} backend calls)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    def service(backend):
+        return SearchService(backend, rate_per_s=100, burst=100, timeout_s=30)
+
+    # repeat: the same query inside one ReAct loop
+    bare, fake = FakeSearchBackend(args.latency), FakeSearchBackend(args.latency)
+    svc = service(fake)
+    before = _timed(lambda: [bare.search("python 3.13 release date") for _ in range(5)])
+    after = _timed(lambda: [svc.search("python 3.13 release date") for _ in range(5)])
+    _report("repeat", bare, before, fake, after)
+
+    # crowd: many sessions asking the same thing at the same time
+    bare, fake = FakeSearchBackend(args.latency), FakeSearchBackend(args.latency)
+    svc = service(fake)
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        before = _timed(lambda: list(pool.map(lambda _: bare.search("weather in istanbul"), range(args.users))))
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        after = _timed(lambda: list(pool.map(lambda _: svc.search("weather in istanbul"), range(args.users))))
+    _report("crowd", bare, before, fake, after)
+
+    # fan-out: independent sub-queries run concurrently instead of one by one
+    queries = ["gdp of turkey", "gdp of germany", "gdp of japan", "gdp of brazil"]
+    bare, fake = FakeSearchBackend(args.latency), FakeSearchBackend(args.latency)
+    svc = service(fake)
+    before = _timed(lambda: [bare.search(q) for q in queries])
+    after = _timed(lambda: svc.search_many(queries))
+    _report("fan-out", bare, before, fake, after)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/load_test_async.py
+"""Throughput of concurrent chat sessions, sync executor on threads vs. async executor on one loop.
+
+Usage:
+    python benchmarks/load_test_async.py [--sessions 100] [--threads 16]
+        [--llm-latency 0.3] [--tool-latency 0.5] [--db-latency 0.02]
+
+Runs fully offline: the LLM is fakes.FakeChatModel, WebSearch runs against
+fakes.FakeSearchBackend and messages go to fakes.FakeMessageStore. Every
+session asks a question that needs two independent searches.
+  sync   - create_agent_executor() driven by `invoke` from a pool of
+           `threads` worker threads (one search per step, blocking writes)
+  async  - create_agent_executor(async_mode=True) driven by `ainvoke` for all
+           sessions at once (both searches in one step, async writes)
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agent
+from fakes import FakeChatModel, FakeMessageStore, FakeSearchBackend
+from web_search import SearchService, WebSearchTool
+
+SEARCHES = ["weather in city {n}", "population of city {n}"]
+
+class Script:
+    """Scripted ReAct replies; counts LLM calls."""
+
+    def __init__(self, parallel):
+        self.parallel = parallel
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            self.calls += 1
+        n = re.search(r"New input: session (\d+)", text).group(1)
+        done = text.split("New input:")[-1].count("Observation:")
+        if done >= len(SEARCHES):
+            return f"Thought: Do I need to use a tool? No\nFinal Answer: Summary for session {n}."
+        pending = SEARCHES if self.parallel else SEARCHES[done:done + 1]
+        actions = "\n".join(f"Action: WebSearch\nAction Input: {q.format(n=n)}" for q in pending)
+        return f"Thought: Do I need to use a tool? Yes\n{actions}"
+
+def _build(args, async_mode):
+    """Returns (executor, script, backend) wired to fresh fakes."""
+    script = Script(parallel=async_mode)
+    backend = FakeSearchBackend(args.tool_latency)
+    service = SearchService(backend, rate_per_s=10000, burst=10000, timeout_s=120, max_workers=args.sessions * 2)
+    agent.create_llm = lambda model_name: FakeChatModel(respond=script, latency_s=args.llm_latency)
+    agent.agent_tools = [WebSearchTool(service=service)]
+    executor = agent.create_agent_executor(model_name="fake", async_mode=async_mode)
+    executor.verbose = False
+    return executor, script, backend
+
+def _inputs(n):
+    return {"input": f"session {n}", "chat_history": ""}
+
+def run_sync(args, store):
+    executor, script, backend = _build(args, async_mode=False)
+    latencies = []
+
+    def turn(n):
+        start = time.perf_counter()
+        store.add_message(f"session-{n}", "user", f"session {n}")
+        output = executor.invoke(_inputs(n))["output"]
+        store.add_message(f"session-{n}", "assistant", output)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(turn, range(args.sessions)))
+    return time.perf_counter() - start, latencies, script, backend
+
+def run_async(args, store):
+    executor, script, backend = _build(args, async_mode=True)
+    latencies = []
+
+    async def turn(n):
+        start = time.perf_counter()
+        await agent.arun_chat_turn(executor, _inputs(n), partial(store.add_message_async, f"session-{n}"))
+        latencies.append(time.perf_counter() - start)
+
+    async def all_turns():
+        await asyncio.gather(*(turn(n) for n in range(args.sessions)))
+
+    start = time.perf_counter()
+    asyncio.run(all_turns())
+    return time.perf_counter() - start, latencies, script, backend
+
+def _report(name, elapsed, latencies, script, backend, sessions):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(f"{name:<6} {elapsed:7.2f} s  {sessions / elapsed:7.1f} turns/s  "
+          f"p50={statistics.median(latencies):6.2f} s  p95={p95:6.2f} s  "
+          f"llm_calls={script.calls:4d}  searches={backend.calls:4d}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tool-latency", type=float, default=0.5)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    sync_result = run_sync(args, FakeMessageStore(args.db_latency))
+    _report("sync", *sync_result, args.sessions)
+    async_result = run_async(args, FakeMessageStore(args.db_latency))
+    _report("async", *async_result, args.sessions)
+    print(f"speedup: {sync_result[0] / async_result[0]:.1f}x")
+
+if __name__ == "__main__":
+    main()
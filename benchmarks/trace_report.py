@@ -0,0 +1,67 @@
+# benchmarks/trace_report.py
+"""Per-stage latency percentiles from an exported span file.
+
+Usage:
+    python benchmarks/trace_report.py [.traces/spans.jsonl] [--last-minutes 15] [--prefix llm.]
+
+Reads the OTLP/JSON lines tracing.py exports (TRACE_EXPORT_PATH), plus the
+rotated `<path>.1` when present, and prints count, p50, p95 and max per span name, slowest p95 first, plus the
+error count. Stages are span names: chat.turn, history.build, db.<collection>.<op>,
+llm.<provider>, tool.<name>, image.job, imagen.predict, ...
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tracing import STATUS_ERROR, stage_summary
+from config.constants import TRACING_CONFIG
+
+def _iter_spans(path):
+    for file_path in (f"{path}.1", path):
+        if file_path != path and not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                for resource_spans in json.loads(line).get("resourceSpans", []):
+                    for scope_spans in resource_spans.get("scopeSpans", []):
+                        yield from scope_spans.get("spans", [])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", default=os.getenv("TRACE_EXPORT_PATH") or TRACING_CONFIG["export_path"])
+    parser.add_argument("--last-minutes", type=float, help="only spans that started in this window")
+    parser.add_argument("--prefix", default="", help="only span names starting with this")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("no span file: pass its path or set TRACE_EXPORT_PATH")
+
+    since_ns = time.time_ns() - int(args.last_minutes * 60e9) if args.last_minutes else 0
+    durations, errors = defaultdict(list), Counter()
+    for span in _iter_spans(args.path):
+        start_ns = int(span["startTimeUnixNano"])
+        if start_ns < since_ns or not span["name"].startswith(args.prefix):
+            continue
+        durations[span["name"]].append((int(span["endTimeUnixNano"]) - start_ns) / 1e6)
+        if span.get("status", {}).get("code") == STATUS_ERROR:
+            errors[span["name"]] += 1
+
+    stats = stage_summary(durations)
+    if not stats:
+        print(f"No spans in {args.path}")
+        return
+    width = max(len(s["stage"]) for s in stats)
+    print(f"{'stage':<{width}}  {'count':>7}  {'p50 ms':>9}  {'p95 ms':>9}  {'max ms':>9}  errors")
+    for s in stats:
+        print(f"{s['stage']:<{width}}  {s['count']:>7}  {s['p50_ms']:>9.1f}  {s['p95_ms']:>9.1f}  "
+              f"{s['max_ms']:>9.1f}  {errors[s['stage']]}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
 import streamlit as st
-from config.constants import SESSION_KEYS
-from database import get_messages, add_message
-from langchain_core.messages import HumanMessage, AIMessage
+from config.constants import SESSION_KEYS, DEFAULTS
+from database import (
+    get_message_page,
+    get_messages,
+    add_message,
+    get_conversation_summary,
+    save_conversation_summary,
+    MESSAGE_PROJECTION
+)
+from providers import create_llm
+from history import HistoryManager, HistoryState, make_llm_summarizer, new_message
+from streaming import stream_agent_events, TurnStats
+from response_cache import get_response_cache
+from sandbox import current_session_id
+from model_router import RoutedAgent, get_model_router, history_model
+from tracing import get_tracer, span
 import logging
+import time
 
 def render_chat_interface(agent_executor):
     """Render the chat interface."""
@@ -20,14 +34,72 @@ def render_chat_interface(agent_executor):
     # Chat input
     handle_chat_input(agent_executor)
 
+    if st.session_state.get(SESSION_KEYS["show_trace"]):
+        render_turn_trace(st.session_state.get(SESSION_KEYS["last_trace_id"]))
+
+def load_latest_messages(conversation_id):
+    """Load the most recent page of a conversation into session state."""
+    messages, cursor = get_message_page(conversation_id, DEFAULTS["chat_page_size"])
+    st.session_state[SESSION_KEYS["messages"]] = messages
+    st.session_state[SESSION_KEYS["messages_cursor"]] = cursor
+
+def load_older_messages(conversation_id):
+    """Prepend the next older page of messages to session state."""
+    older, cursor = get_message_page(
+        conversation_id,
+        DEFAULTS["chat_page_size"],
+        before=st.session_state.get(SESSION_KEYS["messages_cursor"])
+    )
+    st.session_state[SESSION_KEYS["messages"]] = older + st.session_state[SESSION_KEYS["messages"]]
+    st.session_state[SESSION_KEYS["messages_cursor"]] = cursor
+
+@st.cache_resource
+def get_summarizer(model_name):
+    """One lazily created summarizer per model, shared across sessions."""
+    return make_llm_summarizer(lambda: create_llm(model_name))
+
+def get_history_state(conversation_id):
+    """Return the history summary state of the conversation, loading it once per session."""
+    state = st.session_state.get(SESSION_KEYS["history_state"])
+    if state is None or state.conversation_id != conversation_id:
+        summary, summary_until = get_conversation_summary(conversation_id)
+        state = HistoryState(conversation_id, summary, summary_until)
+        st.session_state[SESSION_KEYS["history_state"]] = state
+    return state
+
+def build_chat_history(conversation_id, messages, model_name):
+    """Build the budgeted chat history (rolling summary + recent messages) for the prompt.
+
+    `model_name` must be a real model (see model_router.history_model), not "auto".
+    """
+    manager = HistoryManager(
+        model_name,
+        summarize=get_summarizer(model_name),
+        fetch_older=lambda after, before, limit: get_messages(
+            conversation_id, limit=limit, before=before, projection=MESSAGE_PROJECTION, after=after,
+            oldest_first=True
+        ),
+        on_summary=lambda summary, until: save_conversation_summary(conversation_id, summary, until)
+    )
+    return manager.build(
+        messages,
+        get_history_state(conversation_id),
+        has_unloaded_older=bool(st.session_state.get(SESSION_KEYS["messages_cursor"]))
+    )
+
 def display_chat_messages():
     """Display the chat messages."""
-    if st.session_state.get(SESSION_KEYS["current_conversation_id"]):
-        if not st.session_state.get(SESSION_KEYS["messages"]):
-            st.session_state[SESSION_KEYS["messages"]] = get_messages(
-                st.session_state[SESSION_KEYS["current_conversation_id"]]
-            )
-        
+    conversation_id = st.session_state.get(SESSION_KEYS["current_conversation_id"])
+    if conversation_id:
+        # None means the conversation hasn't been loaded yet; [] is a loaded, empty one
+        if st.session_state.get(SESSION_KEYS["messages"]) is None:
+            load_latest_messages(conversation_id)
+
+        if st.session_state.get(SESSION_KEYS["messages_cursor"]):
+            if st.button("⬆️ Load older messages", key="load_older_messages"):
+                load_older_messages(conversation_id)
+                st.rerun()
+
         for message in st.session_state.get(SESSION_KEYS["messages"], []):
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
@@ -42,45 +114,161 @@ def handle_chat_input(agent_executor):
         elif not agent_executor:
             st.error(f"Agent could not be initialized for model '{st.session_state.get(SESSION_KEYS['selected_model'])}'. Please check the logs.")
         else:
-            # Add user message to DB and display immediately
-            add_message(
-                st.session_state[SESSION_KEYS["current_conversation_id"]],
-                "user",
-                prompt
-            )
-            st.session_state[SESSION_KEYS["messages"]].append({"role": "user", "content": prompt})
-            with st.chat_message("user"):
-                st.markdown(prompt)
+            conversation_id = st.session_state[SESSION_KEYS["current_conversation_id"]]
+            model_name = st.session_state.get(SESSION_KEYS["selected_model"], DEFAULTS["initial_model"])
+            # Python_REPL code of this conversation shares one sandbox namespace
+            current_session_id.set(str(conversation_id))
+            # Every DB, LLM and tool call of the turn is traced under this span
+            with span("chat.turn", model=model_name) as turn_span:
+                # Build the history before the new message is added to it
+                with span("history.build", messages=len(st.session_state[SESSION_KEYS["messages"]])):
+                    chat_history_for_prompt = build_chat_history(
+                        conversation_id,
+                        st.session_state[SESSION_KEYS["messages"]],
+                        history_model(model_name, prompt)
+                    )
+
+                # Add user message to DB and display immediately
+                user_message = add_message(conversation_id, "user", prompt)
+                st.session_state[SESSION_KEYS["messages"]].append(
+                    user_message or new_message("user", prompt)
+                )
+                with st.chat_message("user"):
+                    st.markdown(prompt)
             
-            # Get agent response with loading animation
-            with st.chat_message("assistant"):
-                with st.spinner("🤔 Thinking..."):
-                    try:
-                        chat_history_for_prompt = []
-                        raw_messages_for_history = st.session_state[SESSION_KEYS["messages"]][:-1]
-                        for msg in raw_messages_for_history:
-                            if msg["role"] == "user":
-                                chat_history_for_prompt.append(HumanMessage(content=msg["content"]))
-                            elif msg["role"] == "assistant":
-                                chat_history_for_prompt.append(AIMessage(content=msg["content"]))
-                        
-                        response = agent_executor.invoke({
+                # Stream the agent response: thoughts and tool calls go into a
+                # collapsible status box, final answer tokens straight into the message
+                with st.chat_message("assistant"):
+                    response_cache = get_response_cache()
+                    cached = response_cache.get(model_name, prompt, chat_history_for_prompt) if response_cache else None
+                    turn_span.set_attribute("cached", cached is not None)
+                    if cached is not None:
+                        response_content = cached
+                        st.markdown(response_content)
+                        st.caption("⚡ Answered from cache")
+                    else:
+                        inputs = {
                             "input": prompt,
                             "chat_history": chat_history_for_prompt
-                        })
-                        response_content = response.get('output', 'Sorry, I had trouble processing that.')
-                        
-                    except Exception as e:
-                        response_content = f"An error occurred during agent processing: {e}"
-                        logging.exception("Error during agent invocation:")
-                    
-                    # Add agent response to DB and display
-                    add_message(
-                        st.session_state[SESSION_KEYS["current_conversation_id"]],
-                        "assistant",
-                        response_content
-                    )
-                    st.markdown(response_content)
+                        }
+                        if isinstance(agent_executor, RoutedAgent):
+                            response_content, stats, succeeded = render_routed_stream(agent_executor, prompt, inputs)
+                        else:
+                            response_content, stats, succeeded = render_agent_stream(agent_executor, inputs)
+                            # Every turn feeds the health metrics "auto" routes on
+                            get_model_router().record(model_name, stats.total_ms, stats.error_type, stats.error)
+                        st.caption(f"⏱️ {stats.summary()}")
+                        # Tool results (web search, code) go stale; only self-contained answers are reused
+                        if succeeded and response_cache and not stats.tool_calls:
+                            response_cache.put(model_name, prompt, chat_history_for_prompt, response_content)
+
+                    # Add agent response to DB
+                    assistant_message = add_message(conversation_id, "assistant", response_content)
                     st.session_state[SESSION_KEYS["messages"]].append(
-                        {"role": "assistant", "content": response_content}
-                    ) 
\ No newline at end of file
+                        assistant_message or new_message("assistant", response_content)
+                    )
+            st.session_state[SESSION_KEYS["last_trace_id"]] = turn_span.trace_id
+
+def render_turn_trace(trace_id):
+    """Show the spans of the last turn as a waterfall chart."""
+    spans = get_tracer().get_trace(trace_id) if trace_id else []
+    with st.expander("⏱️ Last turn trace", expanded=True):
+        if not spans:
+            st.caption("Send a message to see where the time of a turn goes.")
+            return
+
+        import altair as alt  # only needed while the trace view is on
+        by_id = {s.span_id: s for s in spans}
+        def depth(s):
+            return depth(by_id[s.parent_id]) + 1 if s.parent_id in by_id else 0
+
+        turn_start = spans[0].start_ns
+        rows = [
+            {
+                "span": f"{i + 1}. {'  ' * depth(s)}{s.name}",
+                "stage": s.name.split(".")[0],
+                "start_ms": (s.start_ns - turn_start) / 1e6,
+                "end_ms": (s.end_ns - turn_start) / 1e6,
+                "duration_ms": round(s.duration_ms, 1),
+                "error": s.error or ""
+            }
+            for i, s in enumerate(spans)
+        ]
+        chart = alt.Chart(alt.Data(values=rows)).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since turn start"),
+            x2="end_ms:Q",
+            y=alt.Y("span:N", sort=None, title=None),
+            color=alt.Color("stage:N", legend=None),
+            tooltip=["span:N", "duration_ms:Q", "error:N"]
+        ).properties(height=24 * len(rows))
+        st.altair_chart(chart)
+
+def render_routed_stream(routed_agent, prompt, inputs):
+    """Run the turn on the model the router picks, falling back to the next one on timeouts and rate limits."""
+    response_content, stats, succeeded = "Sorry, no model is available right now.", TurnStats(), False
+    failed_model = None
+    for category, model_name, agent_executor in routed_agent.attempts(prompt):
+        if failed_model:
+            st.caption(f"⚠️ {failed_model} failed ({stats.error_type}), trying the next model...")
+        st.caption(f"🧭 Auto → **{model_name}** ({category})")
+        response_content, stats, succeeded = render_agent_stream(
+            agent_executor, inputs, idle_timeout_s=routed_agent.idle_timeout_s
+        )
+        if routed_agent.finish(model_name, stats, succeeded):
+            break
+        failed_model = model_name
+
+    if stats.finished_at is None:
+        stats.finished_at = time.perf_counter()
+    return response_content, stats, succeeded
+
+def render_agent_stream(agent_executor, inputs, idle_timeout_s=None):
+    """Run the agent in streaming mode, rendering events as they arrive.
+
+    Returns the final response text, the TurnStats of the turn and whether
+    the agent produced an answer (False on errors). With `idle_timeout_s`,
+    a turn that stalls for that long is cancelled and reported as an error.
+    """
+    stats = TurnStats()
+    status = st.status("🤔 Thinking...", expanded=False)
+    steps_placeholder = status.empty()
+    answer_placeholder = st.empty()
+
+    steps_log = ""
+    answer = ""
+    final_output = None
+    error = None
+    try:
+        for event in stream_agent_events(agent_executor, inputs, stats, idle_timeout_s=idle_timeout_s):
+            if event.kind == "thought":
+                steps_log += event.content
+            elif event.kind == "tool_start":
+                steps_log += f"\n\n🔧 **{event.name}** ← `{event.content}`\n\n"
+                status.update(label=f"🔧 Using {event.name}...")
+            elif event.kind == "tool_end":
+                steps_log += f"📄 {event.content[:500]}\n\n"
+                status.update(label="🤔 Thinking...")
+            elif event.kind == "token":
+                answer += event.content
+                answer_placeholder.markdown(answer + "▌")
+                continue
+            elif event.kind == "final":
+                final_output = event.content
+                continue
+            elif event.kind == "error":
+                error = event.content
+                continue
+            steps_placeholder.markdown(steps_log)
+    except Exception as e:
+        error = str(e)
+        logging.exception("Error during agent invocation:")
+
+    succeeded = bool(final_output or answer) and not (error and not final_output)
+    if error and not final_output:
+        response_content = f"An error occurred during agent processing: {error}"
+        status.update(label="❌ Failed", state="error")
+    else:
+        response_content = final_output or answer or 'Sorry, I had trouble processing that.'
+        status.update(label="✅ Done", state="complete")
+    answer_placeholder.markdown(response_content)
+    return response_content, stats, succeeded
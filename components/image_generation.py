@@ -1,11 +1,11 @@
 import streamlit as st
 import time
-from config.constants import SESSION_KEYS, DEFAULTS
-from image_generation import (
-    setup_image_generator,
-    generate_images_with_imagen,
-    process_imagen_response
-)
+import logging
+from config.constants import SESSION_KEYS, DEFAULTS, IMAGE_JOB_CONFIG, IMAGE_STORE_CONFIG
+from database import list_image_generations
+from image_generation import setup_image_generator
+from image_jobs import get_image_job_queue
+from image_store import get_image_store
 
 def render_image_generation_interface():
     """Render the image generation interface."""
@@ -19,7 +19,9 @@ def render_image_generation_interface():
     
     # Initialize session state for image history
     if SESSION_KEYS["image_history"] not in st.session_state:
-        st.session_state[SESSION_KEYS["image_history"]] = []
+        st.session_state[SESSION_KEYS["image_history"]] = load_image_history()
+    if SESSION_KEYS["image_jobs"] not in st.session_state:
+        st.session_state[SESSION_KEYS["image_jobs"]] = []
     
     # Setup the image generator
     imagen_ready = setup_image_generator()
@@ -52,50 +54,118 @@ def render_image_generation_interface():
                     ["Realistic", "Photographic", "Artistic", "Cartoon", "Abstract", "Watercolor", "Oil Painting"],
                     help="The artistic style of the generated images"
                 )
+            use_cache = st.checkbox(
+                "Reuse images from identical earlier requests",
+                value=True,
+                help="Same prompt, style and number of images; untick to generate new variations"
+            )
             
             submitted = st.form_submit_button("✨ Generate Images")
         
         if submitted and prompt:
-            handle_image_generation(prompt, num_images, style)
+            handle_image_generation(prompt, num_images, style, use_cache)
+        
+        render_image_jobs()
         
         # Display image generation history
         display_image_history()
 
-def handle_image_generation(prompt, num_images, style):
-    """Handle the image generation process."""
-    with st.spinner("🎨 Creating your images..."):
-        try:
-            api_response = generate_images_with_imagen(
-                prompt=prompt,
-                num_images=num_images,
-                style=style
-            )
-            
-            if api_response:
-                processed_images = process_imagen_response(api_response)
-            else:
-                processed_images = None
-            
-            if processed_images:
-                st.session_state[SESSION_KEYS["image_history"]].append({
-                    "prompt": prompt,
-                    "style": style,
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                })
-                
-                st.success(f"✨ Successfully generated {len(processed_images)} image(s)!")
-                
-                # Display images in a grid
-                cols = st.columns(len(processed_images))
-                for idx, (col, img) in enumerate(zip(cols, processed_images)):
-                    with col:
-                        st.image(img, caption=f"Image {idx + 1}")
-            else:
-                st.warning("Failed to generate or process images. Check the logs for details.")
-        
-        except Exception as e:
-            st.error(f"An unexpected error occurred: {e}")
-            logging.exception("Error in image generation:")
+def load_image_history():
+    """Past generations from the database, oldest first, so new ones can be appended."""
+    if get_image_store() is None:
+        return []
+    generations, _ = list_image_generations(IMAGE_STORE_CONFIG["gallery_size"])
+    return [
+        {
+            "prompt": generation["prompt"],
+            "style": generation["style"],
+            "timestamp": generation["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
+            "image_ids": generation.get("image_ids", [])
+        }
+        for generation in reversed(generations)
+    ]
+
+def handle_image_generation(prompt, num_images, style, use_cache=True):
+    """Queue an image generation job; its images show up in render_image_jobs as they finish."""
+    try:
+        job = get_image_job_queue().submit(prompt=prompt, num_images=int(num_images), style=style, use_cache=use_cache)
+        st.session_state[SESSION_KEYS["image_jobs"]].append({"id": job.id, "recorded": False})
+    except Exception as e:
+        st.error(f"An unexpected error occurred: {e}")
+        logging.exception("Error in image generation:")
+
+def render_image_jobs():
+    """Render this session's running jobs and the latest finished one.
+
+    While a job runs, the grid is a fragment that re-renders every
+    poll_interval_s without rerunning the rest of the page.
+    """
+    queue = get_image_job_queue()
+    entries = [
+        (entry, job) for entry in st.session_state[SESSION_KEYS["image_jobs"]]
+        if (job := queue.get(entry["id"])) is not None
+    ]
+    # Forget jobs the queue has dropped
+    st.session_state[SESSION_KEYS["image_jobs"]] = [entry for entry, _ in entries]
+    if not entries:
+        return
+
+    # Running jobs plus the most recent one, newest first
+    visible = [item for item in entries[:-1] if item[1].active] + [entries[-1]]
+    running = any(job.active for _, job in visible)
+    run_every = IMAGE_JOB_CONFIG["poll_interval_s"] if running else None
+    st.fragment(run_every=run_every)(_render_job_grids)(list(reversed(visible)), running)
+
+def _render_job_grids(visible, was_running):
+    for entry, job in visible:
+        _render_job(entry, job)
+    # Once every job is finished, rerun the whole page to stop polling and update the history
+    if was_running and not any(job.active for _, job in visible):
+        st.rerun()
+
+def _render_job(entry, job):
+    state, images, errors = job.snapshot()
+    done = sum(1 for image in images if image is not None)
+
+    st.markdown(f"### 🖼️ {job.prompt} ({job.style})")
+    if state in ("queued", "running"):
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.progress(done / job.num_images, text=f"🎨 Creating your images... {done}/{job.num_images}")
+        with col2:
+            if st.button("✖ Cancel", key=f"cancel_image_job_{job.id}"):
+                get_image_job_queue().cancel(job.id)
+                st.rerun()
+    elif state == "done" and job.cached:
+        st.success(f"⚡ Served {done} image(s) from earlier results")
+    elif state == "done":
+        st.success(f"✨ Successfully generated {done} image(s)!")
+    elif state == "cancelled":
+        st.info(f"Cancelled after {done} of {job.num_images} image(s).")
+    else:
+        st.warning("Failed to generate or process images. Check the logs for details.")
+    if errors and state != "cancelled":
+        st.caption(f"⚠️ {len(errors)} request(s) failed: {errors[-1]}")
+
+    # Grid with a placeholder for every image still on its way
+    columns = IMAGE_JOB_CONFIG["grid_columns"]
+    for row in range(0, len(images), columns):
+        cols = st.columns(columns)
+        for idx in range(row, min(row + columns, len(images))):
+            with cols[idx - row]:
+                if images[idx] is not None:
+                    st.image(images[idx], caption=f"Image {idx + 1}")
+                elif state in ("queued", "running"):
+                    st.markdown(f"⏳ Image {idx + 1}")
+
+    if state == "done" and not entry["recorded"] and not job.cached:
+        entry["recorded"] = True
+        st.session_state[SESSION_KEYS["image_history"]].append({
+            "prompt": job.prompt,
+            "style": job.style,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.finished_at)),
+            "image_ids": [image_id for image_id in job.image_ids if image_id]
+        })
 
 def display_image_history():
     """Display the image generation history."""
@@ -103,4 +173,20 @@ def display_image_history():
         st.markdown("### 📜 Generation History")
         for entry in reversed(st.session_state[SESSION_KEYS["image_history"]]):
             with st.expander(f"🎨 {entry['prompt']} ({entry['style']})"):
-                st.write(f"⏰ Generated at: {entry['timestamp']}") 
\ No newline at end of file
+                st.write(f"⏰ Generated at: {entry['timestamp']}")
+                render_thumbnails(entry.get("image_ids", []))
+
+def render_thumbnails(image_ids):
+    """Show stored thumbnails of past images; evicted ones are skipped."""
+    store = get_image_store()
+    if store is None or not image_ids:
+        return
+    thumbnails = [thumb for thumb in (store.get_thumbnail(image_id) for image_id in image_ids if image_id) if thumb]
+    if not thumbnails:
+        st.caption("Images are no longer stored.")
+        return
+    columns = IMAGE_JOB_CONFIG["grid_columns"]
+    cols = st.columns(columns)
+    for idx, thumbnail in enumerate(thumbnails):
+        with cols[idx % columns]:
+            st.image(thumbnail) 
\ No newline at end of file
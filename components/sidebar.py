@@ -1,6 +1,9 @@
 import streamlit as st
-from config.constants import SESSION_KEYS, AVAILABLE_MODELS, MODEL_DESCRIPTIONS, DEFAULTS
-from database import get_conversations, create_conversation, delete_conversation, get_messages
+from datetime import datetime
+from config.constants import SESSION_KEYS, AVAILABLE_MODELS, MODEL_DESCRIPTIONS, DEFAULTS, AUTO_MODEL
+from database import list_conversations, count_conversations, create_conversation, delete_conversation
+from model_router import get_model_router
+from tracing import get_tracer
 
 def render_sidebar():
     """Render the sidebar with navigation and settings."""
@@ -40,19 +43,30 @@ def render_sidebar():
             st.session_state[SESSION_KEYS["selected_model"]] = selected_model
             st.rerun()
         
+        if selected_model == AUTO_MODEL:
+            render_router_metrics()
+
+        if st.checkbox("⏱️ Show turn traces", key=SESSION_KEYS["show_trace"]):
+            render_stage_latency()
+        
         st.markdown("---")
         st.markdown("### 💭 Conversations")
         
         # New conversation button
         if st.button("➕ New Conversation", key="new_conv"):
-            refresh_conversations()
-            num_conversations = len(st.session_state.get(SESSION_KEYS["conversations_list"], []))
-            new_conv_name = f"Conversation {num_conversations + 1}"
+            new_conv_name = f"Conversation {count_conversations() + 1}"
             new_conv_id = create_conversation(name=new_conv_name)
             if new_conv_id:
                 st.session_state[SESSION_KEYS["current_conversation_id"]] = new_conv_id
                 st.session_state[SESSION_KEYS["messages"]] = []
-                refresh_conversations()
+                st.session_state[SESSION_KEYS["messages_cursor"]] = None
+                # Prepend locally instead of reloading the list from the database
+                if st.session_state.get(SESSION_KEYS["conversations_list"]) is not None:
+                    st.session_state[SESSION_KEYS["conversations_list"]].insert(0, {
+                        "_id": new_conv_id,
+                        "name": new_conv_name,
+                        "created_at": datetime.utcnow()
+                    })
                 st.rerun()
             else:
                 st.error("Failed to create new conversation. Check logs.")
@@ -60,13 +74,69 @@ def render_sidebar():
         # Display conversations
         display_conversations()
 
+def render_router_metrics():
+    """Show the rolling latency and error metrics the "auto" model routes on."""
+    metrics = [m for m in get_model_router().metrics() if m["requests"]]
+    with st.expander("📈 Model health", expanded=False):
+        if not metrics:
+            st.caption("No requests in the current window yet.")
+            return
+        st.dataframe(
+            [
+                {
+                    "Model": m["model"],
+                    "Turns": m["requests"],
+                    "p50 (s)": round(m["p50_ms"] / 1000, 2) if m["p50_ms"] is not None else None,
+                    "p95 (s)": round(m["p95_ms"] / 1000, 2) if m["p95_ms"] is not None else None,
+                    "Errors": f"{m['error_rate']:.0%}",
+                    "Status": "⏸️ Rate limited" if m["cooling_down"] else ("✅" if m["healthy"] else "⚠️ Degraded")
+                }
+                for m in metrics
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+def render_stage_latency():
+    """Show p50/p95 per traced stage (DB calls, LLM calls, tools, ...) over recent spans of this process."""
+    stats = get_tracer().stage_stats()
+    with st.expander("⏱️ Stage latency", expanded=False):
+        if not stats:
+            st.caption("No traced spans yet.")
+            return
+        st.dataframe(
+            [
+                {
+                    "Stage": s["stage"],
+                    "Count": s["count"],
+                    "p50 (ms)": round(s["p50_ms"], 1),
+                    "p95 (ms)": round(s["p95_ms"], 1),
+                    "Max (ms)": round(s["max_ms"], 1)
+                }
+                for s in stats
+            ],
+            hide_index=True
+        )
+
 def refresh_conversations():
-    """Refresh the conversations list in session state."""
-    st.session_state[SESSION_KEYS["conversations_list"]] = get_conversations()
+    """Reload the first page of conversations into session state."""
+    conversations, cursor = list_conversations(DEFAULTS["sidebar_page_size"])
+    st.session_state[SESSION_KEYS["conversations_list"]] = conversations
+    st.session_state[SESSION_KEYS["conversations_cursor"]] = cursor
+
+def load_more_conversations():
+    """Append the next page of conversations to session state."""
+    conversations, cursor = list_conversations(
+        DEFAULTS["sidebar_page_size"],
+        before=st.session_state.get(SESSION_KEYS["conversations_cursor"])
+    )
+    st.session_state[SESSION_KEYS["conversations_list"]].extend(conversations)
+    st.session_state[SESSION_KEYS["conversations_cursor"]] = cursor
 
 def display_conversations():
     """Display the list of conversations in the sidebar."""
-    if not st.session_state.get(SESSION_KEYS["conversations_list"]):
+    # None means not loaded yet; [] is a loaded, empty list
+    if st.session_state.get(SESSION_KEYS["conversations_list"]) is None:
         refresh_conversations()
     
     if not st.session_state.get(SESSION_KEYS["conversations_list"]):
@@ -86,7 +156,9 @@ def display_conversations():
                         type="primary" if conv_id == st.session_state.get(SESSION_KEYS["current_conversation_id"]) else "secondary"
                     ):
                         st.session_state[SESSION_KEYS["current_conversation_id"]] = conv_id
-                        st.session_state[SESSION_KEYS["messages"]] = get_messages(conv_id)
+                        # Loaded lazily, one page at a time, by the chat view
+                        st.session_state[SESSION_KEYS["messages"]] = None
+                        st.session_state[SESSION_KEYS["messages_cursor"]] = None
                         st.rerun()
                 with col2:
                     if st.button("🗑️", key=f"del_{conv_id}", help="Delete conversation"):
@@ -95,7 +167,15 @@ def display_conversations():
                             if conv_id == st.session_state.get(SESSION_KEYS["current_conversation_id"]):
                                 st.session_state[SESSION_KEYS["current_conversation_id"]] = None
                                 st.session_state[SESSION_KEYS["messages"]] = []
-                            refresh_conversations()
+                                st.session_state[SESSION_KEYS["messages_cursor"]] = None
+                            st.session_state[SESSION_KEYS["conversations_list"]] = [
+                                c for c in st.session_state[SESSION_KEYS["conversations_list"]] if c["_id"] != conv_id
+                            ]
                             st.rerun()
                         else:
-                            st.error("Failed to delete conversation. Check logs.") 
\ No newline at end of file
+                            st.error("Failed to delete conversation. Check logs.")
+
+        if st.session_state.get(SESSION_KEYS["conversations_cursor"]):
+            if st.button("Load more", key="load_more_conversations", use_container_width=True):
+                load_more_conversations()
+                st.rerun()
\ No newline at end of file
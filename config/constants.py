@@ -1,5 +1,9 @@
+# Pseudo-model that routes each request to a real one (see model_router.py)
+AUTO_MODEL = "auto"
+
 # Available models
 AVAILABLE_MODELS = [
+    AUTO_MODEL,
     "gemini-1.5-pro",
     "gemini-1.5-flash",
     "gemini-2.5-pro-exp-03-25",
@@ -10,6 +14,7 @@ AVAILABLE_MODELS = [
 
 # Model descriptions
 MODEL_DESCRIPTIONS = {
+    AUTO_MODEL: "Picks the fastest healthy model for each request",
     "gemini-1.5-pro": "Google's advanced model for complex tasks",
     "gemini-1.5-flash": "Fast and efficient for quick responses",
     "gemini-2.5-pro-exp-03-25": "Latest experimental version with enhanced capabilities",
@@ -33,7 +38,13 @@ SESSION_KEYS = {
     "messages": "messages",
     "conversations_list": "conversations_list",
     "selected_model": "selected_model",
-    "image_history": "image_history"
+    "image_history": "image_history",
+    "messages_cursor": "messages_cursor",
+    "conversations_cursor": "conversations_cursor",
+    "history_state": "history_state",
+    "image_jobs": "image_jobs",
+    "show_trace": "show_trace",
+    "last_trace_id": "last_trace_id"
 }
 
 # Default values
@@ -41,5 +52,238 @@ DEFAULTS = {
     "initial_page": "Chat",
     "initial_model": "gemini-1.5-pro",
     "num_images": 1,
-    "style": "Realistic"
-} 
\ No newline at end of file
+    "style": "Realistic",
+    "chat_page_size": 50,
+    "sidebar_page_size": 20
+} 
+# MongoDB connection pool settings (can be overridden in the [database] secrets section)
+DB_POOL_CONFIG = {
+    "max_pool_size": 20,
+    "min_pool_size": 1,
+    "max_idle_time_ms": 60000,
+    "server_selection_timeout_ms": 5000,
+    "connect_timeout_ms": 5000,
+    "health_check_interval_s": 30
+}
+
+# Queries slower than this (in milliseconds) are logged as warnings
+DB_SLOW_QUERY_MS = 100
+
+# Write-behind buffer for chat messages (see database.MessageWriteBuffer)
+MESSAGE_BUFFER_CONFIG = {
+    "enabled": True,
+    "batch_size": 50,
+    "flush_interval_s": 0.5,
+    "max_queue_size": 10000
+}
+
+# Token budget for the chat history sent with each prompt, per model.
+# Kept well below each context window to leave room for tools and the answer.
+MODEL_HISTORY_BUDGETS = {
+    "gemini-1.5-pro": 16000,
+    "gemini-1.5-flash": 8000,
+    "gemini-2.5-pro-exp-03-25": 16000,
+    "deepseek-chat": 6000,      # DeepSeek R1 via OpenRouter
+    "deepseek-coder": 6000,     # DeepSeek R1 via OpenRouter
+    "gemma": 2000               # Gemma 3 4B has an 8K context
+}
+
+# Chat history management (see history.HistoryManager)
+HISTORY_CONFIG = {
+    "default_budget": 4000,
+    "recent_messages": 12,          # newest messages always kept verbatim (budget permitting)
+    "summary_batch_messages": 8,    # fold older messages into the summary this many at a time
+    "summary_max_tokens": 500,
+    "max_catchup_messages": 200,    # cap on unloaded older messages summarized in one go
+    "chars_per_token": 4
+}
+
+# Agent executor registry (see agent_registry.AgentRegistry)
+AGENT_REGISTRY_CONFIG = {
+    "max_size": 4,                           # executors kept alive at once (LRU beyond that)
+    "idle_ttl_s": 1800,                      # evict executors unused for this long
+    "prewarm_models": ["gemini-1.5-pro"]     # built in the background at startup
+}
+
+# Async agent execution (see agent.py, parallel_tools.py)
+AGENT_ASYNC_CONFIG = {
+    "enabled": False,               # opt in: executors use the multi-action prompt and run requested tools concurrently
+    "max_concurrent_tools": 16      # tool calls in flight at once per executor, across all sessions
+}
+
+# Shared HTTP connection pool for OpenAI-compatible providers (see providers.py)
+HTTP_POOL_CONFIG = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry_s": 60,
+    "connect_timeout_s": 10,
+    "read_timeout_s": 120,
+    "write_timeout_s": 30,
+    "pool_timeout_s": 10
+}
+
+# Response cache in front of the agent (see response_cache.py)
+# Shared across all users and conversations; turns that called tools are never cached
+RESPONSE_CACHE_CONFIG = {
+    "enabled": True,
+    "ttl_s": 24 * 3600,
+    "max_entries": 5000,
+    "history_messages": 4,          # only the last few history messages are part of the key
+    "history_chars": 2000,          # ...truncated to this many characters
+    "disabled_models": [],          # models that always bypass the cache
+    # Optional embedding-similarity tier (costs one embedding call per lookup)
+    "semantic_enabled": False,
+    "embedding_model": "models/text-embedding-004",
+    "similarity_threshold": 0.95,
+    "semantic_candidates": 500      # most recent entries compared per lookup
+}
+
+# WebSearch tool (see web_search.py)
+WEB_SEARCH_CONFIG = {
+    "cache_ttl_s": 15 * 60,
+    "cache_max_entries": 1000,
+    "rate_per_s": 1.0,          # sustained searches per second across the process
+    "burst": 5,
+    "timeout_s": 10,            # hard limit per search, including waiting for a rate token
+    "max_workers": 8,
+    "max_subqueries": 4,        # fan-out limit for "a || b || c" inputs
+    "query_separator": "||"
+}
+
+# Python_REPL tool sandbox (see sandbox.py)
+SANDBOX_CONFIG = {
+    "workers": 2,                   # pre-spawned worker processes
+    "cpu_time_s": 10,               # CPU time per call
+    "wall_time_s": 30,              # wall-clock time per call; the worker is replaced beyond it
+    "memory_mb": 1024,              # address-space limit per worker
+    "max_output_chars": 4000,       # longer output is truncated before it reaches the LLM
+    "preload_modules": ["numpy", "pandas"],  # warmed in each worker if installed
+    "max_sessions_per_worker": 50,  # least recently used session namespaces are dropped
+    "env_allowlist": ["PATH", "HOME", "LANG", "LC_ALL", "TZ", "TMPDIR"]  # other variables (API keys, MONGO_URI) are withheld; files are not (see sandbox._Worker)
+}
+
+# "auto" model routing (see model_router.py)
+MODEL_ROUTER_CONFIG = {
+    # Preferred models per prompt category, best first; other models follow as fallbacks
+    "routes": {
+        "code": ["deepseek-coder", "gemini-1.5-pro", "gemini-1.5-flash"],
+        "chat": ["gemini-1.5-flash", "gemma", "gemini-1.5-pro"],
+        "general": ["gemini-1.5-pro", "gemini-1.5-flash", "deepseek-chat"]
+    },
+    "chat_max_chars": 80,           # prompts this short without code signals count as chit-chat
+    "window_s": 600,                # rolling metrics window
+    "max_samples": 200,             # turns kept per model within the window
+    "min_samples": 5,               # turns needed before latency and error rate are trusted
+    "default_latency_ms": 5000,     # assumed p95 for models without enough samples
+    "preference_weight": 0.5,       # each step down the preference list adds 50% to the score
+    "max_error_rate": 0.5,          # above this a model is moved to the back
+    "rate_limit_cooldown_s": 60,    # a rate-limited model is moved to the back this long
+    "idle_timeout_s": 45,           # no agent event for this long counts as a timeout
+    "max_attempts": 3               # models tried per request, including fallbacks
+}
+
+# Timeouts, retries, circuit breakers and hedging around LLM calls (see resilience.py)
+RESILIENCE_CONFIG = {
+    "enabled": True,
+    "providers": {
+        # Defaults for every provider; entries below override single keys
+        "default": {
+            "timeout_s": 60,            # per attempt (streams: until the first chunk)
+            "max_retries": 2,           # transient failures only
+            "backoff_base_s": 0.5,      # full-jitter exponential backoff
+            "backoff_max_s": 8,
+            "failure_threshold": 5,     # consecutive transient failures that open the breaker
+            "reset_timeout_s": 30,      # open breaker rejects calls this long before a trial call
+            "hedge": False              # duplicate slow requests after the recent p95 latency
+        },
+        "openrouter": {
+            "timeout_s": 45
+        },
+        "fake": {
+            "timeout_s": 5
+        }
+    },
+    "stream_idle_timeout_s": 30,        # max gap between streamed chunks
+    "hedge_percentile": 0.95,
+    "hedge_min_samples": 20,            # latencies needed before hedging kicks in
+    "hedge_min_delay_s": 0.5,
+    "latency_samples": 200              # recent successful calls kept per model
+}
+
+# Shared Imagen prediction client (see image_generation.get_prediction_client)
+IMAGEN_CLIENT_CONFIG = {
+    "prewarm": True,                # create the client and open its channel at server start
+    "warmup_timeout_s": 10,
+    "keepalive_time_ms": 30000,     # ping idle connections so they survive NAT/load balancer timeouts
+    "keepalive_timeout_ms": 10000
+}
+
+# Background image generation (see image_jobs.py)
+IMAGE_JOB_CONFIG = {
+    "max_concurrent_requests": 4,   # Imagen calls in flight per process, across all sessions
+    "images_per_request": 2,        # sampleCount of each sub-request; a job is split into several
+    "max_jobs": 100,                # finished jobs kept in memory for their sessions
+    "poll_interval_s": 0.5,         # how often the page checks running jobs
+    "grid_columns": 4
+}
+
+# Content-addressed image cache and gallery files (see image_store.py); metadata lives in the "images" collection
+IMAGE_STORE_CONFIG = {
+    "enabled": True,
+    "root": ".image_store",         # overridable with the IMAGE_STORE_DIR environment variable
+    "max_mb": 1024,                 # least recently used images are evicted beyond this
+    "thumbnail_px": 256,
+    "gallery_size": 20              # past generations loaded into the history of a new session
+}
+
+# Cold-start import budgets per entry point (see benchmarks/bench_import_time.py)
+IMPORT_TIME_BUDGETS_MS = {
+    "main": 1500,                           # CLI, before the agent is built
+    "app": 2000,                            # imports plus the first render of the Chat page
+    "components.chat_interface": 1200,
+    "components.image_generation": 500      # no LangChain or Imagen SDK until a request is made
+}
+
+# Per-turn spans (see tracing.py); exported as OTLP/JSON lines an OpenTelemetry collector can read
+TRACING_CONFIG = {
+    "enabled": True,
+    "service_name": "multi-chat-agent",
+    "export_path": None,                    # span file (e.g. .traces/spans.jsonl), or the TRACE_EXPORT_PATH variable; off by default
+    "max_file_mb": 50,                      # the span file is rotated to <path>.1 beyond this (one backup kept)
+    "otlp_endpoint": None,                  # OTLP/HTTP traces URL, or the OTEL_EXPORTER_OTLP_TRACES_ENDPOINT variable
+    "max_traces": 200,                      # recent traces kept in memory for the waterfall view
+    "stage_samples": 1000,                  # recent durations kept per span name for p50/p95
+    "max_queue": 10000,                     # spans waiting for export; newer ones are dropped beyond this
+    "batch_size": 512,
+    "flush_interval_s": 2.0
+}
+
+# Prometheus metrics (see metrics.py), served at http://<host>:<port>/metrics by the app and the CLI
+METRICS_CONFIG = {
+    "enabled": True,
+    "host": "127.0.0.1",            # METRICS_HOST; use 0.0.0.0 to let a Prometheus on another host scrape
+    "port": 9464,                   # METRICS_PORT; 0 disables the endpoint
+    "shards": 16,                   # per-thread shards of every counter and histogram
+    "latency_buckets_s": (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+}
+
+# Headless HTTP API (see server.py)
+SERVER_CONFIG = {
+    "host": "127.0.0.1",            # SERVER_HOST; the API has no auth: expose it only behind an authenticating proxy
+    "port": 8000,
+    "page_size": 50,                # default page of conversations and messages
+    "max_page_size": 200,
+    "turn_idle_timeout_s": 120      # a streamed turn with no event for this long ends with a TimeoutError
+}
+
+# Offline prompt evaluation (see batch_eval.py)
+BATCH_EVAL_CONFIG = {
+    "provider_concurrency": {       # turns in flight at once per provider, across its models
+        "google": 4,
+        "openrouter": 2,            # free tier models are rate limited hard
+        "fake": 16
+    },
+    "default_concurrency": 2,       # providers not listed above
+    "turn_idle_timeout_s": 120,     # a turn with no agent event for this long is recorded as a TimeoutError
+    "checkpoint_suffix": ".checkpoint.jsonl"
+}
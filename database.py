@@ -1,97 +1,725 @@
 # database.py
+import atexit
 import logging
-import streamlit as st
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
 from datetime import datetime
 from bson import ObjectId
+from config.constants import DB_POOL_CONFIG, DB_SLOW_QUERY_MS, MESSAGE_BUFFER_CONFIG
+from tracing import span
+from metrics import DB_OPERATIONS, DB_SECONDS, track
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --- Shared Client State ---
+# One MongoClient per process. MongoClient is thread-safe and keeps its own
+# connection pool, so every Streamlit session and thread can share it.
+_client = None
+_client_lock = threading.Lock()
+_client_healthy = False
+_health_thread = None
+_health_stop = threading.Event()
+_store = None
+_message_buffer = None
+
+# Fields the chat view needs; skips conversation_id and anything added later
+MESSAGE_PROJECTION = {"role": 1, "content": 1, "timestamp": 1}
+# Fields the sidebar needs from a conversation
+CONVERSATION_PROJECTION = {"name": 1, "created_at": 1, "updated_at": 1}
+# Fields the image gallery needs from an image generation
+IMAGE_PROJECTION = {"prompt": 1, "style": 1, "image_ids": 1, "created_at": 1}
+
+def _get_setting(name, default=None):
+    """Reads a database setting from the environment, falling back to the [database] secrets.
+
+    Streamlit is only imported for the fallback, so the CLI and other
+    non-Streamlit entry points can use the database without it.
+    """
+    value = os.getenv(name)
+    if value is not None:
+        return value
+    try:
+        import streamlit as st
+        section = st.secrets["database"]
+        if name in section:
+            return section[name]
+    except Exception as e:  # no streamlit, no secrets file or no [database] section
+        logging.debug(f"No [database] secrets for {name}: {e}")
+    if default is None:
+        raise KeyError(f"{name} is not set in the environment or the [database] secrets")
+    return default
+
+def _get_pool_settings():
+    """Returns the pool settings, letting the environment or [database] secrets override the defaults."""
+    settings = dict(DB_POOL_CONFIG)
+    for key, default in settings.items():
+        settings[key] = type(default)(_get_setting(key.upper(), default))
+    return settings
+
+def _get_mongo_uri():
+    """Returns the configured MongoDB connection string."""
+    return _get_setting("MONGO_URI")
+
+def _get_db_name():
+    """Returns the configured database name."""
+    return _get_setting("DB_NAME")
+
+def _create_client():
+    """Builds the shared MongoClient. Connecting happens lazily in the background."""
+    settings = _get_pool_settings()
+    client = MongoClient(
+        _get_mongo_uri(),
+        maxPoolSize=settings["max_pool_size"],
+        minPoolSize=settings["min_pool_size"],
+        maxIdleTimeMS=settings["max_idle_time_ms"],
+        serverSelectionTimeoutMS=settings["server_selection_timeout_ms"],
+        connectTimeoutMS=settings["connect_timeout_ms"]
+    )
+    return client, settings["health_check_interval_s"]
+
+def _health_check_loop(client, interval):
+    """Pings the server periodically so request paths never have to."""
+    global _client_healthy
+    while True:
+        try:
+            client.admin.command('ping')
+            if not _client_healthy:
+                logging.info("Database connection established successfully")
+            _client_healthy = True
+        except PyMongoError as e:
+            if _client_healthy:
+                logging.error(f"Database health check failed: {e}")
+            _client_healthy = False
+        if _health_stop.wait(interval):
+            return
+
 def get_db_connection():
-    """Establishes a connection to the MongoDB database."""
-    try:
-        # Get MongoDB connection string from Streamlit secrets
-        client = MongoClient(st.secrets["database"]["MONGO_URI"], serverSelectionTimeoutMS=5000)
-        # Test the connection
-        client.admin.command('ping')
-        logging.info("Database connection established successfully")
-        return client
-    except ServerSelectionTimeoutError as e:
-        logging.error(f"Database connection error: {e}")
+    """Returns the shared MongoDB client, creating it on first use."""
+    global _client, _health_thread
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is not None:
+            return _client
+        try:
+            client, interval = _create_client()
+        except Exception as e:
+            logging.error(f"Unexpected error while connecting to database: {e}")
+            return None
+
+        _health_stop.clear()
+        _health_thread = threading.Thread(
+            target=_health_check_loop,
+            args=(client, interval),
+            name="mongo-health-check",
+            daemon=True
+        )
+        _health_thread.start()
+        _client = client
+        return _client
+
+def get_db():
+    """Returns the application database on the shared client, or None if unavailable."""
+    client = get_db_connection()
+    if client is None:
         return None
-    except Exception as e:
-        logging.error(f"Unexpected error while connecting to database: {e}")
+    return client[_get_db_name()]
+
+def is_db_healthy():
+    """Returns the result of the most recent background health check."""
+    return _client_healthy
+
+def close_db_connection():
+    """Flushes buffered messages, stops the health check and closes the shared client."""
+    global _client, _health_thread, _client_healthy, _store, _message_buffer
+    if _message_buffer is not None:
+        _message_buffer.stop()
+        _message_buffer = None
+    with _client_lock:
+        _store = None
+        _health_stop.set()
+        if _health_thread is not None:
+            _health_thread.join(timeout=1)
+            _health_thread = None
+        if _client is not None:
+            _client.close()
+            _client = None
+            logging.info("Database connection closed")
+        _client_healthy = False
+
+atexit.register(close_db_connection)
+
+def _to_object_id(value):
+    """Converts a string ID to an ObjectId, leaving other values untouched."""
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+def message_cursor(message):
+    """Returns the (timestamp, _id) pagination cursor for a message."""
+    return message["timestamp"], message["_id"]
+
+def conversation_cursor(conversation):
+    """Returns the (created_at, _id) pagination cursor for a conversation."""
+    return conversation["created_at"], conversation["_id"]
+
+def build_message(conversation_id, role, content):
+    """Builds a message document. The _id is assigned up front so order is fixed at creation."""
+    return {
+        "_id": ObjectId(),
+        "conversation_id": ObjectId(conversation_id),
+        "role": role,
+        "content": content,
+        "timestamp": datetime.utcnow()
+    }
+
+def _keyset_filter(field, before=None, after=None):
+    """Builds a filter for documents strictly between two (field, _id) cursors."""
+    clauses = []
+    if before is not None:
+        before_value, before_id = before
+        clauses.append({"$or": [
+            {field: {"$lt": before_value}},
+            {field: before_value, "_id": {"$lt": _to_object_id(before_id)}}
+        ]})
+    if after is not None:
+        after_value, after_id = after
+        clauses.append({"$or": [
+            {field: {"$gt": after_value}},
+            {field: after_value, "_id": {"$gt": _to_object_id(after_id)}}
+        ]})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+class ConversationStore:
+    """Data access for conversations and messages on top of the shared client.
+
+    Methods raise on database errors; the module-level functions below wrap
+    them with the logging and fallback values the UI expects.
+    """
+
+    # Compound indexes backing every query below. `_id` is the tie-breaker
+    # so sorts stay stable when timestamps collide.
+    MESSAGE_INDEXES = [
+        [("conversation_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]
+    ]
+    CONVERSATION_INDEXES = [
+        [("created_at", DESCENDING), ("_id", DESCENDING)]
+    ]
+    IMAGE_INDEXES = [
+        [("request_key", ASCENDING), ("complete", ASCENDING), ("created_at", DESCENDING)],
+        [("created_at", DESCENDING), ("_id", DESCENDING)]
+    ]
+
+    def __init__(self, db, slow_query_ms=DB_SLOW_QUERY_MS):
+        self.db = db
+        self.conversations = db.conversations
+        self.messages = db.messages
+        self.images = db.images
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_count = 0
+
+    def ensure_indexes(self):
+        """Creates the indexes if they don't exist. Safe to call repeatedly."""
+        for keys in self.MESSAGE_INDEXES:
+            name = self.messages.create_index(keys)
+            logging.info(f"Ensured index on messages: {name}")
+        for keys in self.CONVERSATION_INDEXES:
+            name = self.conversations.create_index(keys)
+            logging.info(f"Ensured index on conversations: {name}")
+        for keys in self.IMAGE_INDEXES:
+            name = self.images.create_index(keys)
+            logging.info(f"Ensured index on images: {name}")
+
+    @contextmanager
+    def _timed(self, operation):
+        """Traces and counts the wrapped operation; logs a warning when it exceeds the slow query threshold."""
+        start = time.perf_counter()
+        try:
+            with span(f"db.{operation}"), track(DB_OPERATIONS, DB_SECONDS, operation):
+                yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms > self.slow_query_ms:
+                self.slow_query_count += 1
+                logging.warning(f"Slow query: {operation} took {elapsed_ms:.1f} ms")
+
+    def create_conversation(self, name):
+        """Inserts a new conversation and returns its ID as a string."""
+        now = datetime.utcnow()
+        conversation_data = {
+            "name": name,
+            "created_at": now,
+            "updated_at": now
+        }
+        with self._timed("conversations.insert_one"):
+            result = self.conversations.insert_one(conversation_data)
+        return str(result.inserted_id)
+
+    def count_conversations(self):
+        """Returns the approximate number of conversations from collection metadata."""
+        with self._timed("conversations.estimated_document_count"):
+            return self.conversations.estimated_document_count()
+
+    def list_conversations(self, limit=None, before=None, projection=None):
+        """Returns (conversations, next_cursor), newest first.
+
+        Keyset pagination on (created_at, _id); `next_cursor` is None when
+        there is nothing older left to fetch.
+        """
+        query = _keyset_filter("created_at", before=before)
+
+        with self._timed("conversations.find"):
+            cursor = self.conversations.find(query, projection).sort(
+                [("created_at", DESCENDING), ("_id", DESCENDING)]
+            )
+            if limit is not None:
+                cursor = cursor.limit(limit + 1)
+            conversations = list(cursor)
+
+        has_more = limit is not None and len(conversations) > limit
+        conversations = conversations[:limit]
+        for conv in conversations:
+            conv["_id"] = str(conv["_id"])
+        next_cursor = conversation_cursor(conversations[-1]) if has_more else None
+        return conversations, next_cursor
+
+    def get_conversation(self, conversation_id):
+        """Returns a single conversation, or None if it doesn't exist."""
+        with self._timed("conversations.find_one"):
+            conversation = self.conversations.find_one({"_id": _to_object_id(conversation_id)})
+        if conversation:
+            conversation["_id"] = str(conversation["_id"])
+        return conversation
+
+    def save_conversation(self, conversation_data):
+        """Inserts a prepared conversation document and returns its ID."""
+        with self._timed("conversations.insert_one"):
+            result = self.conversations.insert_one(conversation_data)
+        return result.inserted_id
+
+    def save_message(self, message_data):
+        """Inserts a prepared message document and returns its ID."""
+        with self._timed("messages.insert_one"):
+            result = self.messages.insert_one(message_data)
+        return result.inserted_id
+
+    def get_messages(self, conversation_id, limit=None, before=None, projection=None, after=None,
+                     oldest_first=False):
+        """Returns messages of a conversation in chronological order.
+
+        With `limit`, only the newest `limit` messages older than the `before`
+        cursor are returned (keyset pagination on (timestamp, _id)), or with
+        `oldest_first` the oldest `limit` ones. `after` restricts the result
+        to messages newer than that cursor.
+        """
+        if limit is None or not oldest_first:
+            messages, _ = self.get_message_page(conversation_id, limit, before, projection, after)
+            return messages
+
+        query = {"conversation_id": _to_object_id(conversation_id)}
+        query.update(_keyset_filter("timestamp", before=before, after=after))
+        with self._timed("messages.find"):
+            messages = list(
+                self.messages.find(query, projection)
+                .sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+                .limit(limit)
+            )
+        for msg in messages:
+            msg["_id"] = str(msg["_id"])
+        return messages
+
+    def get_message_page(self, conversation_id, limit=None, before=None, projection=None, after=None):
+        """Returns (messages, next_cursor) for one page of a conversation.
+
+        `next_cursor` points at the oldest returned message and is None when
+        there is nothing older left to fetch.
+        """
+        query = {"conversation_id": _to_object_id(conversation_id)}
+        query.update(_keyset_filter("timestamp", before=before, after=after))
+
+        with self._timed("messages.find"):
+            if limit is None:
+                messages = list(
+                    self.messages.find(query, projection)
+                    .sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+                )
+                has_more = False
+            else:
+                # Walk the index backwards from the cursor and fetch one extra
+                # document to learn whether an older page exists.
+                messages = list(
+                    self.messages.find(query, projection)
+                    .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+                    .limit(limit + 1)
+                )
+                has_more = len(messages) > limit
+                messages = messages[:limit]
+                messages.reverse()
+
+        for msg in messages:
+            msg["_id"] = str(msg["_id"])
+        next_cursor = message_cursor(messages[0]) if has_more and messages else None
+        return messages, next_cursor
+
+    def add_message(self, conversation_id, role, content):
+        """Appends a message to a conversation and returns its ID."""
+        return self.save_message(build_message(conversation_id, role, content))
+
+    def insert_messages(self, messages):
+        """Bulk-inserts messages in order and bumps updated_at on their conversations."""
+        with self._timed("messages.insert_many"):
+            self.messages.insert_many(messages, ordered=True)
+        conversation_ids = list({msg["conversation_id"] for msg in messages})
+        with self._timed("conversations.update_many"):
+            self.conversations.update_many(
+                {"_id": {"$in": conversation_ids}},
+                {"$set": {"updated_at": datetime.utcnow()}}
+            )
+
+    def get_summary(self, conversation_id):
+        """Returns the stored history summary fields of a conversation."""
+        with self._timed("conversations.find_one"):
+            return self.conversations.find_one(
+                {"_id": _to_object_id(conversation_id)},
+                {"summary": 1, "summary_until": 1}
+            )
+
+    def rename_conversation(self, conversation_id, name):
+        """Renames a conversation. Returns the number of conversations matched."""
+        with self._timed("conversations.update_one"):
+            result = self.conversations.update_one(
+                {"_id": _to_object_id(conversation_id)},
+                {"$set": {"name": name, "updated_at": datetime.utcnow()}}
+            )
+        return result.matched_count
+
+    def save_summary(self, conversation_id, summary, summary_until):
+        """Stores the rolling history summary and the cursor it covers up to."""
+        with self._timed("conversations.update_one"):
+            self.conversations.update_one(
+                {"_id": _to_object_id(conversation_id)},
+                {"$set": {"summary": summary, "summary_until": list(summary_until)}}
+            )
+
+    def delete_conversation(self, conversation_id):
+        """Deletes a conversation and its messages. Returns (conversations, messages) deleted."""
+        conversation_oid = ObjectId(conversation_id)
+        with self._timed("conversations.delete_one"):
+            conv_result = self.conversations.delete_one({"_id": conversation_oid})
+        with self._timed("messages.delete_many"):
+            msg_result = self.messages.delete_many({"conversation_id": conversation_oid})
+        return conv_result.deleted_count, msg_result.deleted_count
+
+    def save_image_generation(self, image_data):
+        """Inserts an image generation record and returns its ID as a string."""
+        with self._timed("images.insert_one"):
+            result = self.images.insert_one(image_data)
+        return str(result.inserted_id)
+
+    def find_image_generation(self, request_key):
+        """Returns the newest complete generation for a request key, or None."""
+        with self._timed("images.find_one"):
+            generation = self.images.find_one(
+                {"request_key": request_key, "complete": True},
+                sort=[("created_at", DESCENDING)]
+            )
+        if generation:
+            generation["_id"] = str(generation["_id"])
+        return generation
+
+    def list_image_generations(self, limit, before=None, projection=None):
+        """Returns (generations, next_cursor), newest first, keyset-paginated on (created_at, _id)."""
+        query = _keyset_filter("created_at", before=before)
+        with self._timed("images.find"):
+            generations = list(
+                self.images.find(query, projection)
+                .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+                .limit(limit + 1)
+            )
+        has_more = len(generations) > limit
+        generations = generations[:limit]
+        for generation in generations:
+            generation["_id"] = str(generation["_id"])
+        next_cursor = conversation_cursor(generations[-1]) if has_more else None
+        return generations, next_cursor
+
+def get_store():
+    """Returns the shared ConversationStore, or None if the database is unavailable."""
+    global _store
+    if _store is not None:
+        return _store
+
+    db = get_db()
+    if db is None:
+        return None
+    with _client_lock:
+        if _store is None:
+            _store = ConversationStore(db)
+    return _store
+
+class MessageWriteBuffer:
+    """Write-behind queue that batches new messages into insert_many calls.
+
+    A single writer thread drains the queue in FIFO order, so messages of a
+    conversation are always inserted in the order they were added. Batches
+    are flushed when `batch_size` messages are waiting, every
+    `flush_interval_s` seconds, on demand via flush(), and at shutdown.
+    At most `max_queue_size` messages are held, including a batch being
+    retried; beyond that enqueue() refuses and the caller writes directly.
+    """
+
+    def __init__(self, store_getter, batch_size=50, flush_interval_s=0.5, max_queue_size=10000):
+        self._store_getter = store_getter
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_queue_size = max_queue_size
+
+        self._pending = []
+        self._in_flight = 0  # messages of the batch being written; they count toward max_queue_size
+        self._pending_by_conversation = Counter()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="message-write-buffer", daemon=True)
+
+        # Metrics
+        self.enqueued = 0
+        self.flushed = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.sync_fallbacks = 0
+        self.max_queue_depth = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self):
+        """Starts the writer thread."""
+        self._thread.start()
+        return self
+
+    def enqueue(self, message):
+        """Queues a message. Returns False when the caller should write it synchronously."""
+        with self._cond:
+            if self._stopped or len(self._pending) + self._in_flight >= self.max_queue_size:
+                self.sync_fallbacks += 1
+                return False
+            self._pending.append(message)
+            self._pending_by_conversation[message["conversation_id"]] += 1
+            self.enqueued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def has_pending(self, conversation_id):
+        """Returns True if messages of the conversation are still waiting to be written."""
+        with self._cond:
+            return self._pending_by_conversation[_to_object_id(conversation_id)] > 0
+
+    def flush(self):
+        """Writes everything queued so far. Returns False if the write failed."""
+        with self._flush_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = []
+                self._in_flight = len(batch)
+            if not batch:
+                return True
+
+            start = time.perf_counter()
+            try:
+                store = self._store_getter()
+                if store is None:
+                    raise RuntimeError("database unavailable")
+                store.insert_messages(batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                logging.error(f"Error flushing {len(batch)} buffered messages: {e}")
+                # Put the batch back in front so ordering is preserved on retry.
+                # enqueue() counted it as in flight, so the queue stays within max_queue_size.
+                with self._cond:
+                    self._pending = batch + self._pending
+                    self._in_flight = 0
+                return False
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._cond:
+                self._in_flight = 0
+                for message in batch:
+                    self._pending_by_conversation[message["conversation_id"]] -= 1
+                self._pending_by_conversation += Counter()  # drop zero counts
+                self.flushed += len(batch)
+                self.flush_count += 1
+                self.last_flush_ms = elapsed_ms
+                self.total_flush_ms += elapsed_ms
+            logging.info(f"Flushed {len(batch)} buffered messages in {elapsed_ms:.1f} ms")
+            return True
+
+    def _run(self):
+        """Writer loop: waits for a full batch or the flush interval, then flushes."""
+        failed = False
+        while True:
+            with self._cond:
+                # After a failed flush, wait out the interval even if a batch is full
+                if not self._stopped and (failed or len(self._pending) < self.batch_size):
+                    self._cond.wait(self.flush_interval_s)
+                stopped = self._stopped
+            failed = not self.flush()
+            if stopped:
+                return
+
+    def stop(self, timeout=5):
+        """Stops accepting messages, flushes what is queued and joins the writer thread."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        if not self.flush():
+            logging.error(f"Dropped {self.queue_depth} buffered messages at shutdown")
+
+    @property
+    def queue_depth(self):
+        """Number of messages waiting to be written."""
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        """Returns queue depth and flush latency metrics."""
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self.max_queue_depth,
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "flush_count": self.flush_count,
+                "failed_flushes": self.failed_flushes,
+                "sync_fallbacks": self.sync_fallbacks,
+                "last_flush_ms": self.last_flush_ms,
+                "avg_flush_ms": self.total_flush_ms / self.flush_count if self.flush_count else 0.0
+            }
+
+def get_message_buffer():
+    """Returns the shared write-behind buffer, or None when buffering is disabled."""
+    global _message_buffer
+    if not MESSAGE_BUFFER_CONFIG["enabled"]:
         return None
+    if _message_buffer is not None:
+        return _message_buffer
+
+    with _client_lock:
+        if _message_buffer is None:
+            _message_buffer = MessageWriteBuffer(
+                get_store,
+                batch_size=MESSAGE_BUFFER_CONFIG["batch_size"],
+                flush_interval_s=MESSAGE_BUFFER_CONFIG["flush_interval_s"],
+                max_queue_size=MESSAGE_BUFFER_CONFIG["max_queue_size"]
+            ).start()
+    return _message_buffer
+
+def get_message_buffer_stats():
+    """Returns write-behind buffer metrics, or None when buffering is disabled."""
+    buffer = _message_buffer
+    return buffer.stats() if buffer is not None else None
+
+def _flush_pending(conversation_id):
+    """Makes buffered writes of a conversation visible before reading or deleting it."""
+    buffer = _message_buffer
+    if buffer is not None and buffer.has_pending(conversation_id):
+        buffer.flush()
 
 def initialize_database():
-    """Creates the necessary collections if they don't exist."""
-    client = get_db_connection()
-    if not client:
+    """Creates the necessary collections and indexes if they don't exist."""
+    store = get_store()
+    if store is None:
         logging.error("Cannot initialize database, connection failed.")
         return
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        
+        db = store.db
+
         # Create collections if they don't exist
-        collections = ["conversations", "messages", "agents"]
+        existing = db.list_collection_names()
+        collections = ["conversations", "messages", "agents", "images"]
         for collection in collections:
-            if collection not in db.list_collection_names():
+            if collection not in existing:
                 db.create_collection(collection)
                 logging.info(f"Created collection: {collection}")
-        
+
+        store.ensure_indexes()
         logging.info("Database initialized successfully")
     except Exception as e:
         logging.error(f"Error initializing database: {e}")
 
 def create_conversation(name="New Conversation"):
     """Creates a new conversation and returns its ID."""
-    client = get_db_connection()
-    if not client:
+    store = get_store()
+    if store is None:
         return None
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        conversation_data = {
-            "name": name,
-            "created_at": datetime.utcnow()
-        }
-        result = db.conversations.insert_one(conversation_data)
-        logging.info(f"Created new conversation with ID: {result.inserted_id}")
-        return str(result.inserted_id)
+        conversation_id = store.create_conversation(name)
+        logging.info(f"Created new conversation with ID: {conversation_id}")
+        return conversation_id
     except Exception as e:
         logging.error(f"Error creating conversation: {e}")
         return None
 
 def get_conversations():
     """Retrieves all conversations from the database."""
-    client = get_db_connection()
-    if not client:
+    store = get_store()
+    if store is None:
         return []
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        conversations = list(db.conversations.find().sort("created_at", -1))
-        # Convert ObjectId to string for JSON serialization
-        for conv in conversations:
-            conv["_id"] = str(conv["_id"])
+        conversations, _ = store.list_conversations()
         return conversations
     except Exception as e:
         logging.error(f"Error retrieving conversations: {e}")
         return []
 
+def list_conversations(limit, before=None, projection=CONVERSATION_PROJECTION):
+    """Retrieves one page of conversations and the cursor for the next page."""
+    store = get_store()
+    if store is None:
+        return [], None
+
+    try:
+        return store.list_conversations(limit, before, projection)
+    except Exception as e:
+        logging.error(f"Error retrieving conversations: {e}")
+        return [], None
+
+def count_conversations():
+    """Returns the approximate number of stored conversations."""
+    store = get_store()
+    if store is None:
+        return 0
+
+    try:
+        return store.count_conversations()
+    except Exception as e:
+        logging.error(f"Error counting conversations: {e}")
+        return 0
+
 def save_conversation(conversation_data):
     """Saves a conversation to the database."""
-    client = get_db_connection()
-    if not client:
+    store = get_store()
+    if store is None:
         return False
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        result = db.conversations.insert_one(conversation_data)
-        logging.info(f"Saved conversation with ID: {result.inserted_id}")
+        inserted_id = store.save_conversation(conversation_data)
+        logging.info(f"Saved conversation with ID: {inserted_id}")
         return True
     except Exception as e:
         logging.error(f"Error saving conversation: {e}")
@@ -99,93 +727,139 @@ def save_conversation(conversation_data):
 
 def get_conversation(conversation_id):
     """Retrieves a conversation from the database."""
-    client = get_db_connection()
-    if not client:
+    store = get_store()
+    if store is None:
         return None
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        conversation = db.conversations.find_one({"_id": conversation_id})
-        if conversation:
-            conversation["_id"] = str(conversation["_id"])
-        return conversation
+        return store.get_conversation(conversation_id)
     except Exception as e:
         logging.error(f"Error retrieving conversation: {e}")
         return None
 
 def save_message(message_data):
     """Saves a message to the database."""
-    client = get_db_connection()
-    if not client:
+    store = get_store()
+    if store is None:
         return False
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        result = db.messages.insert_one(message_data)
-        logging.info(f"Saved message with ID: {result.inserted_id}")
+        inserted_id = store.save_message(message_data)
+        logging.info(f"Saved message with ID: {inserted_id}")
         return True
     except Exception as e:
         logging.error(f"Error saving message: {e}")
         return False
 
-def get_messages(conversation_id):
-    """Retrieves all messages for a conversation."""
-    client = get_db_connection()
-    if not client:
+def get_messages(conversation_id, limit=None, before=None, projection=None, after=None, oldest_first=False):
+    """Retrieves messages for a conversation, optionally between the `after` and `before` cursors."""
+    store = get_store()
+    if store is None:
         return []
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        messages = list(db.messages.find({"conversation_id": conversation_id}))
-        # Convert ObjectId to string for JSON serialization
-        for msg in messages:
-            msg["_id"] = str(msg["_id"])
-        return messages
+        _flush_pending(conversation_id)
+        return store.get_messages(conversation_id, limit, before, projection, after, oldest_first)
     except Exception as e:
         logging.error(f"Error retrieving messages: {e}")
         return []
 
+def get_message_page(conversation_id, limit, before=None, projection=MESSAGE_PROJECTION):
+    """Retrieves one page of messages and the cursor for the next older page."""
+    store = get_store()
+    if store is None:
+        return [], None
+
+    try:
+        _flush_pending(conversation_id)
+        return store.get_message_page(conversation_id, limit, before, projection)
+    except Exception as e:
+        logging.error(f"Error retrieving messages: {e}")
+        return [], None
+
 def add_message(conversation_id, role, content):
-    """Adds a message to a conversation."""
-    client = get_db_connection()
-    if not client:
+    """Adds a message to a conversation.
+
+    Returns the message as the chat view sees it (with its pagination cursor
+    fields), or False if it could not be stored.
+    """
+    store = get_store()
+    if store is None:
         return False
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        message_data = {
-            "conversation_id": ObjectId(conversation_id),
+        message = build_message(conversation_id, role, content)
+        view = {
+            "_id": str(message["_id"]),
             "role": role,
             "content": content,
-            "timestamp": datetime.utcnow()
+            "timestamp": message["timestamp"]
         }
-        result = db.messages.insert_one(message_data)
+        buffer = get_message_buffer()
+        if buffer is not None and buffer.enqueue(message):
+            return view
+        # Synchronous fallback: buffering disabled, stopped or full. The
+        # conversation's queued messages are written first so they stay in order.
+        if buffer is not None and buffer.has_pending(conversation_id) and not buffer.flush():
+            raise RuntimeError("earlier messages of the conversation could not be written")
+        store.save_message(message)
         logging.info(f"Added message to conversation {conversation_id}")
-        return True
+        return view
     except Exception as e:
         logging.error(f"Error adding message to conversation {conversation_id}: {e}")
         return False
 
+def get_conversation_summary(conversation_id):
+    """Returns (summary, summary_until) for a conversation, or (None, None)."""
+    store = get_store()
+    if store is None:
+        return None, None
+
+    try:
+        doc = store.get_summary(conversation_id)
+        if not doc or not doc.get("summary"):
+            return None, None
+        return doc["summary"], tuple(doc["summary_until"])
+    except Exception as e:
+        logging.error(f"Error retrieving summary for conversation {conversation_id}: {e}")
+        return None, None
+
+def save_conversation_summary(conversation_id, summary, summary_until):
+    """Persists the rolling history summary of a conversation."""
+    store = get_store()
+    if store is None:
+        return False
+
+    try:
+        store.save_summary(conversation_id, summary, summary_until)
+        return True
+    except Exception as e:
+        logging.error(f"Error saving summary for conversation {conversation_id}: {e}")
+        return False
+
+def rename_conversation(conversation_id, name):
+    """Renames a conversation. Returns False if it doesn't exist or on errors."""
+    store = get_store()
+    if store is None:
+        return False
+
+    try:
+        return store.rename_conversation(conversation_id, name) > 0
+    except Exception as e:
+        logging.error(f"Error renaming conversation {conversation_id}: {e}")
+        return False
+
 def delete_conversation(conversation_id):
     """Deletes a conversation and its associated messages."""
-    client = get_db_connection()
-    if not client:
+    store = get_store()
+    if store is None:
         return False
 
     try:
-        db = client[st.secrets["database"]["DB_NAME"]]
-        
-        # Convert string ID to ObjectId
-        conversation_oid = ObjectId(conversation_id)
-        
-        # Delete the conversation
-        conv_result = db.conversations.delete_one({"_id": conversation_oid})
-        
-        # Delete associated messages
-        msg_result = db.messages.delete_many({"conversation_id": conversation_oid})
-        
-        if conv_result.deleted_count > 0:
-            logging.info(f"Deleted conversation {conversation_id} and {msg_result.deleted_count} associated messages")
+        _flush_pending(conversation_id)
+        conv_deleted, msg_deleted = store.delete_conversation(conversation_id)
+        if conv_deleted > 0:
+            logging.info(f"Deleted conversation {conversation_id} and {msg_deleted} associated messages")
             return True
         else:
             logging.warning(f"Conversation {conversation_id} not found")
@@ -194,7 +868,59 @@ def delete_conversation(conversation_id):
         logging.error(f"Error deleting conversation {conversation_id}: {e}")
         return False
 
-# --- Initial Database Setup Call ---
-# This will run when the module is first imported
-if __name__ != "__main__": # Prevent running during direct script execution
-    initialize_database() 
\ No newline at end of file
+def save_image_generation(request_key, prompt, style, model, params, image_ids):
+    """Records a finished image generation. `image_ids` are image store digests, None for missing images."""
+    store = get_store()
+    if store is None:
+        return None
+
+    try:
+        generation_id = store.save_image_generation({
+            "request_key": request_key,
+            "prompt": prompt,
+            "style": style,
+            "model": model,
+            "params": params,
+            "image_ids": image_ids,
+            "complete": all(image_ids),
+            "created_at": datetime.utcnow()
+        })
+        logging.info(f"Saved image generation with ID: {generation_id}")
+        return generation_id
+    except Exception as e:
+        logging.error(f"Error saving image generation: {e}")
+        return None
+
+def find_image_generation(request_key):
+    """Returns the newest complete image generation for a request key, or None."""
+    store = get_store()
+    if store is None:
+        return None
+
+    try:
+        return store.find_image_generation(request_key)
+    except Exception as e:
+        logging.error(f"Error looking up image generation: {e}")
+        return None
+
+def list_image_generations(limit, before=None, projection=IMAGE_PROJECTION):
+    """Retrieves one page of image generations, newest first, and the cursor for the next page."""
+    store = get_store()
+    if store is None:
+        return [], None
+
+    try:
+        return store.list_image_generations(limit, before, projection)
+    except Exception as e:
+        logging.error(f"Error retrieving image generations: {e}")
+        return [], None
+
+def initialize_database_in_background():
+    """Runs initialize_database() on a daemon thread, so startup never waits on MongoDB.
+
+    Queries don't depend on it: collections are created on first insert and
+    indexes only speed queries up.
+    """
+    thread = threading.Thread(target=initialize_database, name="mongo-initialize", daemon=True)
+    thread.start()
+    return thread
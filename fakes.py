@@ -0,0 +1,195 @@
+# fakes.py
+# Offline stand-ins for external services, used by the benchmarks and for local development.
+import asyncio
+import base64
+import io
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class FakeSearchBackend:
+    """Search backend that sleeps for `latency_s` and returns canned text."""
+
+    def __init__(self, latency_s=0.5):
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search(self, query):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_s)
+        return f"Fake results for '{query}': lorem ipsum dolor sit amet."
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that waits `latency_s` and answers with `respond(prompt_text)`.
+
+    The prompt text is the content of all messages joined by newlines, so a
+    scripted `respond` can look at the agent scratchpad to pick its next step.
+    """
+
+    respond: Callable[[str], str]
+    latency_s: float = 0.5
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-model"
+
+    def _result(self, messages):
+        text = self.respond("\n".join(str(m.content) for m in messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_s)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_s)
+        return self._result(messages)
+
+class FakeServerError(Exception):
+    """Injected provider failure (HTTP 503)."""
+
+class FakeRateLimitError(Exception):
+    """Injected provider rate limit (HTTP 429)."""
+
+class FakeProviderChatModel(BaseChatModel):
+    """Chat model behind the "fake" provider: configurable latency and injected failures.
+
+    Each call draws one fault: a hang of `hang_s` seconds (`hang_rate`), a
+    429 (`rate_limit_rate`), a 503 (`error_rate`) or none. Successful calls
+    take `latency_s` plus up to `jitter_s` and answer with `response`,
+    streamed in `chunk_chars`-sized chunks.
+    """
+
+    response: str = "Thought: Do I need to use a tool? No\nFinal Answer: This is a response from the fake provider."
+    latency_s: float = 0.5
+    jitter_s: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_s: float = 300.0
+    chunk_chars: int = 8
+
+    @property
+    def _llm_type(self):
+        return "fake-provider"
+
+    def _draw(self):
+        """Returns (delay in seconds, exception to raise or None) for one call."""
+        roll = random.random()
+        if roll < self.hang_rate:
+            return self.hang_s, None
+        roll -= self.hang_rate
+        if roll < self.rate_limit_rate:
+            return self.latency_s, FakeRateLimitError("429 Too Many Requests (injected)")
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            return self.latency_s, FakeServerError("503 Service Unavailable (injected)")
+        return self.latency_s + random.uniform(0, self.jitter_s), None
+
+    def _chunks(self):
+        return [self.response[i:i + self.chunk_chars] for i in range(0, len(self.response), self.chunk_chars)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        delay, error = self._draw()
+        time.sleep(delay)
+        if error:
+            raise error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        delay, error = self._draw()
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        delay, error = self._draw()
+        time.sleep(delay)
+        if error:
+            raise error
+        for text in self._chunks():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        delay, error = self._draw()
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        for text in self._chunks():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+class FakeMessageStore:
+    """In-memory message log whose writes take `latency_s`, with sync and async variants."""
+
+    def __init__(self, latency_s=0.02):
+        self.latency_s = latency_s
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def _append(self, conversation_id, role, content):
+        with self._lock:
+            self.messages.append((conversation_id, role, content))
+
+    def add_message(self, conversation_id, role, content):
+        time.sleep(self.latency_s)
+        self._append(conversation_id, role, content)
+
+    async def add_message_async(self, conversation_id, role, content):
+        await asyncio.sleep(self.latency_s)
+        self._append(conversation_id, role, content)
+
+
+class FakePredictionServiceClient:
+    """Stand-in for aiplatform.gapic.PredictionServiceClient serving Imagen-style responses.
+
+    Each predict call takes `latency_s` plus `per_image_s` per requested
+    image, fails with probability `error_rate`, and returns `sampleCount`
+    solid-color PNGs as base64 predictions. Tracks calls and the peak number
+    of calls in flight.
+    """
+
+    def __init__(self, latency_s=2.0, per_image_s=0.5, error_rate=0.0, size=256):
+        self.latency_s = latency_s
+        self.per_image_s = per_image_s
+        self.error_rate = error_rate
+        self.size = size
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _png(self):
+        from PIL import Image
+        color = tuple(random.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new("RGB", (self.size, self.size), color).save(buffer, format="PNG")
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    def predict(self, endpoint, instances, parameters):
+        count = parameters.get("sampleCount", 1)
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency_s + self.per_image_s * count)
+            if random.random() < self.error_rate:
+                raise FakeServerError("503 Service Unavailable (injected)")
+            return SimpleNamespace(predictions=[{"bytesBase64Encoded": self._png()} for _ in range(count)])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
@@ -0,0 +1,205 @@
+# history.py
+import itertools
+import logging
+import math
+import threading
+from datetime import datetime
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from database import message_cursor
+from config.constants import MODEL_HISTORY_BUDGETS, HISTORY_CONFIG
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+
+Current summary:
+{previous_summary}
+
+New messages to fold into the summary:
+{transcript}
+
+Write the updated summary in at most {max_words} words. Keep facts, names, numbers,
+decisions and open questions the assistant may need later. Reply with the summary only."""
+
+_local_ids = itertools.count()
+
+def estimate_tokens(text):
+    """Cheap, provider-independent token estimate."""
+    return math.ceil(len(text) / HISTORY_CONFIG["chars_per_token"])
+
+def message_tokens(message):
+    """Returns the token estimate of a message, cached on the message dict."""
+    if "_tokens" not in message:
+        message["_tokens"] = estimate_tokens(message["content"])
+    return message["_tokens"]
+
+def new_message(role, content):
+    """Builds an in-memory message with the same cursor fields as stored ones (used by the CLI)."""
+    return {
+        "_id": f"{next(_local_ids):024x}",
+        "role": role,
+        "content": content,
+        "timestamp": datetime.utcnow()
+    }
+
+def to_langchain_messages(messages):
+    """Converts stored message dicts to LangChain chat messages."""
+    converted = []
+    for msg in messages:
+        if msg["role"] == "user":
+            converted.append(HumanMessage(content=msg["content"]))
+        elif msg["role"] == "assistant":
+            converted.append(AIMessage(content=msg["content"]))
+    return converted
+
+def make_llm_summarizer(llm_factory):
+    """Returns a summarize(previous_summary, messages) function backed by a lazily created LLM."""
+    llm = None
+    lock = threading.Lock()
+
+    def summarize(previous_summary, messages):
+        nonlocal llm
+        with lock:
+            if llm is None:
+                llm = llm_factory()
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = SUMMARY_PROMPT.format(
+            previous_summary=previous_summary or "(none yet)",
+            transcript=transcript,
+            # Roughly 0.75 words per token
+            max_words=int(HISTORY_CONFIG["summary_max_tokens"] * 0.75)
+        )
+        result = llm.invoke(prompt)
+        return getattr(result, "content", str(result)).strip()
+
+    return summarize
+
+class HistoryState:
+    """Rolling summary of one conversation and the cursor of the last message it covers."""
+
+    def __init__(self, conversation_id=None, summary=None, summary_until=None):
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.summary_until = summary_until
+        # Set once unloaded older messages have been summarized this session
+        self.caught_up = False
+
+    @property
+    def summary_tokens(self):
+        return estimate_tokens(self.summary) if self.summary else 0
+
+class HistoryManager:
+    """Builds the chat history for a prompt within a per-model token budget.
+
+    The newest messages are kept verbatim. Older messages are folded into a
+    rolling summary a batch at a time, so each turn only does work for the
+    messages that arrived since the previous one.
+
+    summarize:   (previous_summary, messages) -> new summary
+    fetch_older: (after_cursor, before_cursor, limit) -> the oldest `limit`
+                 messages between the cursors, chronological, for history
+                 that isn't loaded in memory
+    on_summary:  (summary, summary_until) -> None, to persist a new summary
+    """
+
+    def __init__(self, model_name, summarize=None, fetch_older=None, on_summary=None):
+        self.budget = MODEL_HISTORY_BUDGETS.get(model_name, HISTORY_CONFIG["default_budget"])
+        self.summarize = summarize
+        self.fetch_older = fetch_older
+        self.on_summary = on_summary
+
+    def build(self, messages, state, has_unloaded_older=False):
+        """Returns LangChain messages for `messages` (chronological), updating `state`."""
+        if has_unloaded_older and messages:
+            self._catch_up(state, message_cursor(messages[0]))
+
+        # Only messages after the summary cursor still need attention
+        start = len(messages)
+        while start > 0 and (
+            state.summary_until is None or message_cursor(messages[start - 1]) > state.summary_until
+        ):
+            start -= 1
+        unsummarized = messages[start:]
+
+        # Keep room for the summary whenever one can be produced
+        reserved = HISTORY_CONFIG["summary_max_tokens"] if self.summarize else state.summary_tokens
+        window_budget = max(self.budget - reserved, 0)
+
+        window = []
+        used = 0
+        for msg in reversed(unsummarized):
+            tokens = message_tokens(msg)
+            if len(window) >= HISTORY_CONFIG["recent_messages"] or used + tokens > window_budget:
+                break
+            window.append(msg)
+            used += tokens
+        window.reverse()
+        older = unsummarized[:len(unsummarized) - len(window)]
+
+        older_tokens = sum(message_tokens(msg) for msg in older)
+        if older and (
+            len(older) >= HISTORY_CONFIG["summary_batch_messages"] or used + older_tokens > window_budget
+        ):
+            if self._fold(state, older):
+                older = []
+
+        # Older messages not summarized yet are sent verbatim while they fit
+        pending = []
+        for msg in reversed(older):
+            tokens = message_tokens(msg)
+            if used + tokens > window_budget:
+                break
+            pending.append(msg)
+            used += tokens
+        pending.reverse()
+
+        history = []
+        if state.summary:
+            history.append(SystemMessage(content=f"Summary of the earlier conversation:\n{state.summary}"))
+        history.extend(to_langchain_messages(pending + window))
+        return history
+
+    def _catch_up(self, state, first_loaded_cursor):
+        """Summarizes stored messages between the summary cursor and the first loaded message.
+
+        The gap is folded oldest first, at most `max_catchup_messages` per
+        turn; a longer gap is resumed from the new summary cursor next turn.
+        """
+        if state.caught_up or not self.fetch_older or not self.summarize:
+            return
+        if state.summary_until is not None and state.summary_until >= first_loaded_cursor:
+            state.caught_up = True
+            return
+
+        limit = HISTORY_CONFIG["max_catchup_messages"]
+        gap = self.fetch_older(state.summary_until, first_loaded_cursor, limit)
+        if not gap or (self._fold(state, gap) and len(gap) < limit):
+            state.caught_up = True
+
+    def _fold(self, state, messages):
+        """Folds messages into the summary, in chunks that fit the budget. Returns True on success."""
+        if not self.summarize:
+            return False
+
+        chunks = [[]]
+        chunk_tokens = 0
+        for msg in messages:
+            tokens = message_tokens(msg)
+            if chunks[-1] and chunk_tokens + tokens > self.budget:
+                chunks.append([])
+                chunk_tokens = 0
+            chunks[-1].append(msg)
+            chunk_tokens += tokens
+
+        summary, summary_until = state.summary, state.summary_until
+        try:
+            for chunk in chunks:
+                summary = self.summarize(summary, chunk)
+                summary_until = message_cursor(chunk[-1])
+        except Exception as e:
+            logging.error(f"Failed to summarize chat history: {e}")
+            return False
+
+        state.summary, state.summary_until = summary, summary_until
+        logging.info(f"Folded {len(messages)} messages into the history summary")
+        if self.on_summary:
+            self.on_summary(summary, summary_until)
+        return True
@@ -1,16 +1,20 @@
-import streamlit as st
-# Use Google Cloud AI Platform SDK for Imagen
-import google.cloud.aiplatform as aiplatform
+# Streamlit and PIL are imported where they are used, so background jobs
+# and non-Streamlit callers don't load them.
+# Google Cloud AI Platform SDK for Imagen is imported lazily by the first
+# request (see _create_prediction_client); importing it takes seconds
 # from google.cloud.aiplatform.gapic import PredictionServiceClient # Potentially needed
 # from google.protobuf import json_format # Potentially needed
 # from google.protobuf.struct_pb2 import Value # Potentially needed
-import base64
-from PIL import Image
+import binascii
+import importlib.util
 import io
 import os
+import threading
 from dotenv import load_dotenv
 import logging
 import time # Added for potential retries or delays
+from metrics import IMAGEN_IMAGES, IMAGEN_REQUESTS, IMAGEN_SECONDS, track
+from config.constants import IMAGEN_CLIENT_CONFIG
 
 # Load environment variables
 load_dotenv()
@@ -25,111 +29,201 @@ PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1") # Default location
 IMAGEN_MODEL_NAME = "imagegeneration@006" # Using a specific stable Imagen model version
 
+# Set IMAGEN_BACKEND=fake to generate placeholder images offline (fakes.FakePredictionServiceClient)
+IMAGEN_BACKEND = os.getenv("IMAGEN_BACKEND", "vertex")
+
 def setup_image_generator():
-    """Initialize the Imagen model using Google Cloud AI Platform."""
-    try:
-        if not PROJECT_ID:
-            raise ValueError("GOOGLE_CLOUD_PROJECT not found in environment variables.")
-        
-        aiplatform.init(project=PROJECT_ID, location=LOCATION)
-        logger.info(f"Initialized AI Platform for project '{PROJECT_ID}' in location '{LOCATION}'")
-        
-        # Get the Imagen model endpoint (no need to load the model object directly)
-        # The predict method uses the endpoint name structure.
-        # model = aiplatform.Model(model_name=IMAGEN_MODEL_NAME) # This might not be needed
-        logger.info(f"Using Imagen model endpoint: {IMAGEN_MODEL_NAME}")
-        # Return something truthy to indicate success, actual generation uses aiplatform.predict
-        return True # Indicate setup success
-
-    except ImportError:
-         logger.error("google-cloud-aiplatform library not found. Please install it: pip install google-cloud-aiplatform")
-         st.error("Required library 'google-cloud-aiplatform' not found. Please install it.")
-         return None
-    except Exception as e:
-        logger.error(f"Failed to initialize AI Platform for Imagen: {e}")
-        st.error(f"Failed to initialize Imagen model: {e}")
+    """Check the Imagen configuration without touching the SDK.
+
+    Runs on every rerun of the image page, so it only validates settings;
+    the SDK is imported and initialized once, by the first request or the
+    startup warm-up (see get_prediction_client).
+    """
+    if IMAGEN_BACKEND == "fake":
+        return True
+    import streamlit as st
+    if importlib.util.find_spec("google.cloud.aiplatform") is None:
+        logger.error("google-cloud-aiplatform library not found. Please install it: pip install google-cloud-aiplatform")
+        st.error("Required library 'google-cloud-aiplatform' not found. Please install it.")
+        return None
+    if not PROJECT_ID:
+        logger.error("Failed to initialize AI Platform for Imagen: GOOGLE_CLOUD_PROJECT not found in environment variables.")
+        st.error("Failed to initialize Imagen model: GOOGLE_CLOUD_PROJECT not found in environment variables.")
         return None
+    return True
 
-def generate_images_with_imagen(prompt: str, num_images: int = 1, style: str = "Realistic"):
-    """Generates images using the Imagen model via AI Platform Prediction."""
-    try:
-        # Map friendly style names to potential Imagen parameters if available,
-        # or just include in the prompt. For now, include in prompt.
-        enhanced_prompt = f"{prompt}, {style.lower()} style"
-
-        # Imagen API parameters
-        # Note: Parameter names might change based on the model version (e.g., @006)
-        parameters = {
-            "sampleCount": num_images, # Number of images to generate
-            # "aspectRatio": "1:1", # Example: specify aspect ratio if needed
-            # "guidanceScale": 7, # Example: control prompt adherence
-            # Add other parameters as needed based on Imagen documentation for the model version
-        }
-
-        # Construct the instance payload
-        instances = [{"prompt": enhanced_prompt}]
-
-        # Get the regional endpoint based on the location
-        client_options = {"api_endpoint": f"{LOCATION}-aiplatform.googleapis.com"}
-        client = aiplatform.gapic.PredictionServiceClient(client_options=client_options)
-        
-        endpoint = (
-            f"projects/{PROJECT_ID}/locations/{LOCATION}/"
-            f"publishers/google/models/{IMAGEN_MODEL_NAME}"
-        )
+# --- Prediction clients ---
+# One long-lived client (and gRPC channel) per (backend, project, location)
+_clients = {}
+_clients_lock = threading.Lock()
+
+def imagen_endpoint(project=PROJECT_ID, location=LOCATION):
+    return f"projects/{project}/locations/{location}/publishers/google/models/{IMAGEN_MODEL_NAME}"
+
+def _keepalive_channel(host, **kwargs):
+    """gRPC channel factory for the prediction transport that adds keep-alive pings."""
+    from google.cloud.aiplatform_v1.services.prediction_service.transports.grpc import PredictionServiceGrpcTransport
+    kwargs["options"] = list(kwargs.get("options") or []) + [
+        ("grpc.keepalive_time_ms", IMAGEN_CLIENT_CONFIG["keepalive_time_ms"]),
+        ("grpc.keepalive_timeout_ms", IMAGEN_CLIENT_CONFIG["keepalive_timeout_ms"]),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0)
+    ]
+    return PredictionServiceGrpcTransport.create_channel(host, **kwargs)
+
+def _create_prediction_client(project, location):
+    """Returns a new prediction client for the configured backend."""
+    if IMAGEN_BACKEND == "fake":
+        from fakes import FakePredictionServiceClient
+        return FakePredictionServiceClient()
+    import google.cloud.aiplatform as aiplatform
+    from google.cloud.aiplatform_v1.services.prediction_service.transports.grpc import PredictionServiceGrpcTransport
+
+    aiplatform.init(project=project, location=location)
+    logger.info(f"Initialized AI Platform for project '{project}' in location '{location}'")
+    # Get the regional endpoint based on the location
+    transport = PredictionServiceGrpcTransport(
+        host=f"{location}-aiplatform.googleapis.com",
+        channel=_keepalive_channel
+    )
+    return aiplatform.gapic.PredictionServiceClient(transport=transport)
+
+def get_prediction_client(project=PROJECT_ID, location=LOCATION):
+    """Returns the shared prediction client for (project, location), creating it on first use."""
+    key = (IMAGEN_BACKEND, project, location)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _create_prediction_client(project, location)
+            _clients[key] = client
+        return client
+
+def prewarm_prediction_client(project=PROJECT_ID, location=LOCATION):
+    """Creates the shared client and opens its channel on a background thread.
+
+    Returns the thread, or None when Imagen is not configured.
+    """
+    if IMAGEN_BACKEND != "fake" and not project:
+        return None
+
+    def warm():
+        try:
+            start = time.perf_counter()
+            client = get_prediction_client(project, location)
+            channel = getattr(getattr(client, "transport", None), "grpc_channel", None)
+            if channel is not None:
+                import grpc
+                grpc.channel_ready_future(channel).result(timeout=IMAGEN_CLIENT_CONFIG["warmup_timeout_s"])
+            logger.info(f"Imagen prediction client ready in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.warning(f"Prewarming the Imagen prediction client failed: {str(e) or type(e).__name__}")
 
-        logger.info(f"Sending prediction request to endpoint: {endpoint}")
-        logger.info(f"Instance: {instances[0]}")
-        logger.info(f"Parameters: {parameters}")
+    thread = threading.Thread(target=warm, name="imagen-prewarm", daemon=True)
+    thread.start()
+    return thread
 
-        # Make the prediction call
+def predict_images(prompt: str, num_images: int = 1, style: str = "Realistic"):
+    """Sends one Imagen prediction request and returns the raw response.
+
+    Raises on failure and never touches the Streamlit page, so it is safe to
+    call from background threads (see image_jobs.py).
+    """
+    # Map friendly style names to potential Imagen parameters if available,
+    # or just include in the prompt. For now, include in prompt.
+    enhanced_prompt = f"{prompt}, {style.lower()} style"
+
+    # Imagen API parameters
+    # Note: Parameter names might change based on the model version (e.g., @006)
+    parameters = {
+        "sampleCount": num_images, # Number of images to generate
+        # "aspectRatio": "1:1", # Example: specify aspect ratio if needed
+        # "guidanceScale": 7, # Example: control prompt adherence
+        # Add other parameters as needed based on Imagen documentation for the model version
+    }
+
+    # Construct the instance payload
+    instances = [{"prompt": enhanced_prompt}]
+
+    client = get_prediction_client()
+    endpoint = imagen_endpoint()
+
+    logger.info(f"Sending prediction request to endpoint: {endpoint}")
+    logger.info(f"Instance: {instances[0]}")
+    logger.info(f"Parameters: {parameters}")
+
+    # Make the prediction call
+    IMAGEN_IMAGES.inc(amount=num_images)
+    with track(IMAGEN_REQUESTS, IMAGEN_SECONDS):
         response = client.predict(
             endpoint=endpoint, instances=instances, parameters=parameters
         )
-        
-        logger.info("Prediction request successful.")
-        return response
+    
+    logger.info("Prediction request successful.")
+    return response
 
+def generate_images_with_imagen(prompt: str, num_images: int = 1, style: str = "Realistic"):
+    """Generates images using the Imagen model via AI Platform Prediction."""
+    try:
+        return predict_images(prompt, num_images, style)
     except Exception as e:
         logger.error(f"Error during Imagen prediction request: {e}")
+        import streamlit as st
         st.error(f"Error calling Imagen API: {e}")
         return None
 
+# Prediction fields that may carry the base64 image (name varies by model version)
+IMAGE_DATA_KEYS = ("bytesBase64Encoded", "image_bytes")
+
+def _prediction_image_data(prediction):
+    """Returns the base64 image field of a prediction without converting the rest of it."""
+    for key in IMAGE_DATA_KEYS:
+        value = prediction.get(key) if hasattr(prediction, "get") else getattr(prediction, key, None)
+        if value:
+            return value
+    return None
+
+def iter_image_bytes(response):
+    """Yields the encoded image bytes (PNG/JPEG) of each prediction in an Imagen response.
+
+    Predictions are decoded one at a time, so only one image's base64 text
+    is alive at once. binascii.a2b_base64 reads an ASCII str in place, where
+    base64.b64decode would first copy it to bytes. Nothing is decoded to
+    pixels: st.image and the image store take the encoded bytes as they are.
+    """
+    if not response or not response.predictions:
+        logger.warning("Received empty or invalid response from Imagen model.")
+        return
+
+    for index, prediction in enumerate(response.predictions):
+        b64_data = _prediction_image_data(prediction)
+        if not b64_data:
+            logger.warning(f"Could not find image data in prediction {index}")
+            continue
+        try:
+            image_data = binascii.a2b_base64(b64_data)
+        except (binascii.Error, ValueError) as decode_err:
+            logger.error(f"Failed to decode base64 image data: {decode_err}")
+            continue
+        del b64_data
+        yield image_data
+
 def process_imagen_response(response):
-    """Process the prediction response from the Imagen model."""
+    """Process the prediction response from the Imagen model into PIL images.
+
+    Image.open only reads the header; pixels are decoded when the image is
+    first used. Prefer iter_image_bytes when the bytes are only displayed.
+    """
+    from PIL import Image
+
     generated_images = []
     try:
-        if not response or not response.predictions:
-            logger.warning("Received empty or invalid response from Imagen model.")
-            return None
-
-        # Imagen response structure might vary, check logs or documentation
-        # Assuming predictions is a list and each prediction has a 'bytesBase64Encoded' field
-        for prediction in response.predictions:
-            # Prediction is often a protobuf struct, convert to dict
-            prediction_dict = prediction # Assuming it behaves like a dict or access fields directly
-            if hasattr(prediction_dict, 'items'): # Check if it's dict-like
-                 prediction_dict = dict(prediction_dict.items())
-
-            # Find the base64 encoded image data field (name might vary)
-            # Common names: 'bytesBase64Encoded', 'imageBytes', 'content'
-            b64_data = prediction_dict.get('bytesBase64Encoded') # Adjust key if necessary
-            
-            if not b64_data:
-                 # Try other common keys if the first one fails
-                 b64_data = prediction_dict.get('image_bytes') 
-            
-            if b64_data:
-                 try:
-                     image_data = base64.b64decode(b64_data)
-                     image = Image.open(io.BytesIO(image_data))
-                     generated_images.append(image)
-                     logger.info("Successfully decoded and processed an image from Imagen response.")
-                 except Exception as decode_err:
-                     logger.error(f"Failed to decode base64 image data: {decode_err}")
-            else:
-                 logger.warning(f"Could not find image data in prediction: {prediction_dict}")
-
+        for image_data in iter_image_bytes(response):
+            try:
+                image = Image.open(io.BytesIO(image_data))
+                generated_images.append(image)
+                logger.info("Successfully decoded and processed an image from Imagen response.")
+            except Exception as decode_err:
+                logger.error(f"Failed to decode image data: {decode_err}")
 
         return generated_images if generated_images else None
 
@@ -147,6 +241,8 @@ def process_imagen_response(response):
 # This part is just illustrative of how app.py *should* call the new functions.
 # DO NOT copy this directly into image_generation.py. It belongs in app.py's logic.
 if __name__ == "__main__":
+     import streamlit as st
+
      # Example Usage (for testing, simulate app.py logic)
      st.title("🎨 AI Image Generator (Imagen Test)")
      
@@ -0,0 +1,231 @@
+# image_jobs.py
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from database import find_image_generation, save_image_generation
+from image_generation import IMAGEN_MODEL_NAME, iter_image_bytes, predict_images
+from image_store import get_image_store, request_key
+from tracing import span, start_span
+from metrics import CACHE_LOOKUPS
+from config.constants import IMAGE_JOB_CONFIG
+
+class ImageJob:
+    """One image generation request, split into sub-requests that fill `images` as they finish.
+
+    state is "queued", "running", "done", "failed" or "cancelled". `images`
+    holds encoded image bytes and `image_ids` their image store digests.
+    The job is traced as one "image.job" span, ended when it finishes.
+    """
+
+    def __init__(self, prompt, num_images, style, model=IMAGEN_MODEL_NAME):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.num_images = num_images
+        self.style = style
+        self.model = model
+        self.params = {"sampleCount": num_images}
+        self.request_key = request_key(prompt, style, model, self.params)
+        self.cached = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self.state = "queued"
+        self.images = [None] * num_images  # slot per requested image, in request order
+        self.image_ids = [None] * num_images
+        self.errors = []
+        self.pending = 0
+        self.futures = []
+        self.cancel_event = threading.Event()
+        self.span = start_span("image.job", images=num_images, style=style, model=model)
+        self._lock = threading.Lock()
+
+    @property
+    def completed(self):
+        """Number of images received so far."""
+        with self._lock:
+            return sum(1 for image in self.images if image is not None)
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def snapshot(self):
+        """Returns (state, images, errors) as one consistent copy."""
+        with self._lock:
+            return self.state, list(self.images), list(self.errors)
+
+    def end_span(self):
+        self.span.set_attribute("state", self.state)
+        self.span.set_attribute("cached", self.cached)
+        self.span.end()
+
+class ImageJobQueue:
+    """Background image generation with a process-wide cap on concurrent Imagen calls.
+
+    A job for N images is split into sub-requests of at most
+    `images_per_request` images each. Sub-requests of all jobs share one
+    pool of `max_concurrent_requests` workers, so the cap holds no matter
+    how many sessions submit jobs. Cancelling a job drops its sub-requests
+    that haven't started; calls already in flight finish and are discarded.
+
+    With an image store, finished images are saved to it and the generation
+    is recorded in the database; a later request with the same prompt,
+    style, model and parameters is then served from the store.
+    """
+
+    def __init__(self, predict=predict_images, process=iter_image_bytes,
+                 max_concurrent_requests=IMAGE_JOB_CONFIG["max_concurrent_requests"],
+                 images_per_request=IMAGE_JOB_CONFIG["images_per_request"],
+                 max_jobs=IMAGE_JOB_CONFIG["max_jobs"],
+                 store=None, find_generation=find_image_generation, save_generation=save_image_generation):
+        self._predict = predict
+        self._process = process
+        self.store = store if store is not None else get_image_store()
+        self._find_generation = find_generation
+        self._save_generation = save_generation
+        self.images_per_request = images_per_request
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_requests, thread_name_prefix="imagen")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, prompt, num_images, style, use_cache=True):
+        """Queues a job and returns it immediately; cache hits come back already done."""
+        job = ImageJob(prompt, num_images, style)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        if use_cache:
+            with span("image.cache_lookup", parent=job.span):
+                hit = self._load_cached(job)
+            CACHE_LOOKUPS.inc("image_request", "hit" if hit else "miss")
+            if hit:
+                logging.info(f"Image job {job.id} served from the image store")
+                job.end_span()
+                return job
+
+        offsets = range(0, num_images, self.images_per_request)
+        job.pending = len(offsets)
+        for offset in offsets:
+            count = min(self.images_per_request, num_images - offset)
+            job.futures.append(self._pool.submit(self._run_sub_request, job, offset, count))
+        logging.info(f"Queued image job {job.id}: {num_images} image(s) in {job.pending} sub-request(s)")
+        return job
+
+    def _load_cached(self, job):
+        """Fills a job from a stored generation of the same request. Returns True on a hit."""
+        if self.store is None:
+            return False
+        generation = self._find_generation(job.request_key)
+        if not generation or len(generation["image_ids"]) != job.num_images:
+            return False
+        images = [self.store.get(digest) for digest in generation["image_ids"]]
+        if any(image is None for image in images):
+            return False  # some files were evicted
+        job.images = images
+        job.image_ids = list(generation["image_ids"])
+        job.cached = True
+        job.state = "done"
+        job.finished_at = time.time()
+        return True
+
+    def _run_sub_request(self, job, offset, count):
+        """Generates `count` images for slots starting at `offset`."""
+        with span("image.request", parent=job.span, images=count) as request_span:
+            try:
+                if job.cancel_event.is_set():
+                    return
+                with job._lock:
+                    if job.state == "queued":
+                        job.state = "running"
+                with span("imagen.predict", images=count):
+                    response = self._predict(job.prompt, count, job.style)
+                # Images land in their slots one by one as they are decoded
+                received = 0
+                for image in itertools.islice(self._process(response) or (), count):
+                    image_id = self._store_image(image)
+                    with job._lock:
+                        if job.cancel_event.is_set():
+                            break
+                        job.images[offset + received] = image
+                        job.image_ids[offset + received] = image_id
+                    received += 1
+                if not received and not job.cancel_event.is_set():
+                    raise RuntimeError("no images in the response")
+            except Exception as e:
+                logging.error(f"Image sub-request of job {job.id} failed: {e}")
+                request_span.record_error(e)
+                with job._lock:
+                    job.errors.append(str(e))
+            finally:
+                self._finish_sub_request(job)
+
+    def _store_image(self, image):
+        """Saves encoded image bytes to the store; returns the digest, or None."""
+        if self.store is None:
+            return None
+        try:
+            with span("image_store.put", image_bytes=len(image)):
+                return self.store.put(image)
+        except Exception as e:
+            logging.error(f"Could not save image to the image store: {e}")
+            return None
+
+    def _finish_sub_request(self, job):
+        with job._lock:
+            job.pending -= 1
+            if job.pending > 0 or job.state == "cancelled":
+                return
+            job.finished_at = time.time()
+            job.state = "done" if any(image is not None for image in job.images) else "failed"
+            image_ids = list(job.image_ids)
+        logging.info(
+            f"Image job {job.id} {job.state} in {job.finished_at - job.created_at:.1f}s "
+            f"({job.completed}/{job.num_images} images)"
+        )
+        if job.state == "done" and self.store is not None:
+            self._save_generation(job.request_key, job.prompt, job.style, job.model, job.params, image_ids)
+        job.end_span()
+
+    def cancel(self, job_id):
+        """Cancels a job. Returns False if it is unknown or already finished."""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        with job._lock:
+            if not job.active:
+                return False
+            job.cancel_event.set()
+            job.state = "cancelled"
+            job.finished_at = time.time()
+        for future in job.futures:
+            future.cancel()
+        job.end_span()
+        logging.info(f"Cancelled image job {job_id}")
+        return True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        """Forgets the oldest finished jobs beyond max_jobs. Caller holds the lock."""
+        for job_id in [job_id for job_id, job in self._jobs.items() if not job.active]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_image_job_queue():
+    """Returns the shared image job queue."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ImageJobQueue()
+        return _queue
@@ -0,0 +1,184 @@
+# image_store.py
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from metrics import CACHE_LOOKUPS
+from config.constants import IMAGE_STORE_CONFIG
+
+def request_key(prompt, style, model, params):
+    """Returns the cache key of an image request: a hash of everything that shapes its output."""
+    payload = json.dumps(
+        {"prompt": prompt, "style": style, "model": model, "params": params},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ImageStore:
+    """Content-addressed image files on disk, with JPEG thumbnails and a size bound.
+
+    An image is stored once under the SHA-256 of its encoded bytes
+    (<root>/<d[:2]>/<d>, thumbnail in <root>/thumbs/<d[:2]>/<d>), so repeated
+    puts of the same bytes are free. Reads bump the file's mtime; when the
+    store grows past `max_bytes`, the least recently used images are evicted.
+    """
+
+    def __init__(self, root, max_bytes, thumbnail_px):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.thumbnail_px = thumbnail_px
+        self._index = OrderedDict()  # digest -> bytes on disk (image + thumbnail), oldest first
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _path(self, digest, thumbnail=False):
+        base = os.path.join(self.root, "thumbs") if thumbnail else self.root
+        return os.path.join(base, digest[:2], digest)
+
+    def _load_index(self):
+        """Rebuilds the LRU index from the files on disk."""
+        entries = []
+        if os.path.isdir(self.root):
+            for shard in os.scandir(self.root):
+                if not shard.is_dir() or shard.name == "thumbs":
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.startswith("."):
+                        continue
+                    stat = entry.stat()
+                    size = stat.st_size
+                    thumb = self._path(entry.name, thumbnail=True)
+                    if os.path.exists(thumb):
+                        size += os.path.getsize(thumb)
+                    entries.append((stat.st_mtime, entry.name, size))
+        for _, digest, size in sorted(entries):
+            self._index[digest] = size
+            self._total += size
+        logging.info(f"Image store at {self.root}: {len(self._index)} images, {self._total / 1e6:.1f} MB")
+
+    @staticmethod
+    def _write_atomic(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{os.path.join(os.path.dirname(path), '.' + os.path.basename(path))}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _make_thumbnail(self, data):
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail((self.thumbnail_px, self.thumbnail_px))
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, format="JPEG", quality=80)
+            return buffer.getvalue()
+
+    def put(self, data):
+        """Stores encoded image bytes and returns their digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._index:
+                self._index.move_to_end(digest)
+                return digest
+
+        try:
+            thumbnail = self._make_thumbnail(data)
+        except Exception as e:
+            logging.warning(f"Could not build a thumbnail for image {digest[:12]}: {e}")
+            thumbnail = b""
+        self._write_atomic(self._path(digest), data)
+        if thumbnail:
+            self._write_atomic(self._path(digest, thumbnail=True), thumbnail)
+
+        with self._lock:
+            if digest not in self._index:
+                self._index[digest] = len(data) + len(thumbnail)
+                self._total += self._index[digest]
+            self._evict()
+        return digest
+
+    def _read(self, digest, thumbnail):
+        with self._lock:
+            if digest not in self._index:
+                self.misses += 1
+                CACHE_LOOKUPS.inc("image_store", "miss")
+                return None
+            self._index.move_to_end(digest)
+        try:
+            with open(self._path(digest, thumbnail), "rb") as f:
+                data = f.read()
+            now = time.time()
+            os.utime(self._path(digest), (now, now))
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            CACHE_LOOKUPS.inc("image_store", "miss")
+            return None
+        with self._lock:
+            self.hits += 1
+        CACHE_LOOKUPS.inc("image_store", "hit")
+        return data
+
+    def get(self, digest):
+        """Returns the encoded image bytes, or None if it is not stored."""
+        return self._read(digest, thumbnail=False)
+
+    def get_thumbnail(self, digest):
+        """Returns the JPEG thumbnail bytes, or None if it is not stored."""
+        return self._read(digest, thumbnail=True)
+
+    def contains(self, digest):
+        with self._lock:
+            return digest in self._index
+
+    def _evict(self):
+        """Deletes least recently used images until the store fits. Caller holds the lock."""
+        while self._total > self.max_bytes and len(self._index) > 1:
+            digest, size = self._index.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            for path in (self._path(digest), self._path(digest, thumbnail=True)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f"Could not evict {path}: {e}")
+
+    def stats(self):
+        """Returns size and hit rate metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "images": len(self._index),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_image_store():
+    """Returns the shared image store, or None when it is disabled."""
+    global _store
+    if not IMAGE_STORE_CONFIG["enabled"]:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore(
+                os.getenv("IMAGE_STORE_DIR", IMAGE_STORE_CONFIG["root"]),
+                IMAGE_STORE_CONFIG["max_mb"] * 1024 * 1024,
+                IMAGE_STORE_CONFIG["thumbnail_px"]
+            )
+        return _store
@@ -1,16 +1,72 @@
 # main.py
 from agent import create_agent_executor
+from providers import create_llm
+from streaming import stream_agent_events, TurnStats
+from history import HistoryManager, HistoryState, make_llm_summarizer, new_message
+from response_cache import get_response_cache
+from metrics import REGISTRY, start_metrics_server
+from config.constants import AGENT_ASYNC_CONFIG
 import sys # To exit the script
 
+MODEL_NAME = "gemini-2.5-pro-exp-03-25"
+
+DIM = "\033[2m"
+RESET = "\033[0m"
+
+def stream_turn(agent_executor, inputs):
+    """Streams one agent turn to the terminal and returns (final answer, succeeded, TurnStats)."""
+    stats = TurnStats()
+    answer_started = False
+    answer = ""
+    final_output = None
+    failed = False
+    for event in stream_agent_events(agent_executor, inputs, stats):
+        if event.kind == "thought":
+            print(f"{DIM}{event.content}{RESET}", end="", flush=True)
+        elif event.kind == "tool_start":
+            print(f"\n{DIM}[{event.name}] {event.content}{RESET}", flush=True)
+        elif event.kind == "tool_end":
+            print(f"{DIM}{event.content[:300]}{RESET}", flush=True)
+        elif event.kind == "token":
+            if not answer_started:
+                print("\nAgent: ", end="", flush=True)
+                answer_started = True
+            answer += event.content
+            print(event.content, end="", flush=True)
+        elif event.kind == "final":
+            final_output = event.content
+        elif event.kind == "error":
+            failed = True
+            print(f"\nAn error occurred: {event.content}")
+
+    if not answer_started:
+        # Nothing was streamed as an answer (e.g. parsing fallback), print the output
+        print(f"\nAgent: {final_output or 'Sorry, I could not process that.'}")
+    else:
+        print()
+    print(f"{DIM}({stats.summary()}){RESET}")
+    response = final_output or answer
+    return response, bool(response) and not (failed and not final_output), stats
+
 def main():
     """Main function to run the agent chat loop."""
     print("Setting up the agent...")
     try:
-        agent_executor = create_agent_executor()
+        agent_executor = create_agent_executor(model_name=MODEL_NAME, async_mode=AGENT_ASYNC_CONFIG["enabled"])
+        history_manager = HistoryManager(
+            MODEL_NAME,
+            summarize=make_llm_summarizer(lambda: create_llm(MODEL_NAME))
+        )
+        history_state = HistoryState()
+        response_cache = get_response_cache()
+        metrics_server = start_metrics_server()
         print("\nAgent setup complete. You can now chat with the agent.")
-        print("Type 'quit', 'exit', or 'bye' to end the conversation.")
+        print("Type 'quit', 'exit', or 'bye' to end the conversation, '/metrics' to print the metrics.")
+        if metrics_server:
+            print(f"Metrics: http://{metrics_server.server_address[0]}:{metrics_server.server_port}/metrics")
         print("-" * 50)
 
+        messages = []
         while True:
             try:
                 user_input = input("You: ")
@@ -21,12 +77,23 @@ def main():
                 if not user_input:
                     continue # Skip empty input
 
-                # Invoke the agent with the user's input
-                # The input is passed as a dictionary, matching the prompt's expected variable name ('input')
-                response = agent_executor.invoke({"input": user_input})
+                if user_input.strip() == "/metrics":
+                    print(REGISTRY.render(), end="")
+                    continue
 
-                # Print the final answer from the agent
-                print(f"Agent: {response.get('output', 'Sorry, I could not process that.')}") # Safely get the output
+                chat_history = history_manager.build(messages, history_state)
+                response = response_cache.get(MODEL_NAME, user_input, chat_history) if response_cache else None
+                if response is not None:
+                    print(f"Agent: {response}")
+                    print(f"{DIM}(answered from cache){RESET}")
+                else:
+                    # Stream the agent's thoughts, tool calls and answer as they arrive
+                    # The input is passed as a dictionary, matching the prompt's expected variable names
+                    response, succeeded, stats = stream_turn(agent_executor, {"input": user_input, "chat_history": chat_history})
+                    # Tool results (web search, code) go stale; only self-contained answers are reused
+                    if succeeded and response_cache and not stats.tool_calls:
+                        response_cache.put(MODEL_NAME, user_input, chat_history, response)
+                messages.extend([new_message("user", user_input), new_message("assistant", response)])
 
             except KeyboardInterrupt:
                  print("\nAgent: Goodbye! (Interrupted by user)")
@@ -0,0 +1,247 @@
+# metrics.py
+import bisect
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from config.constants import METRICS_CONFIG
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Sharding ---
+# Each thread updates one of SHARDS shards, each with its own lock, so
+# concurrent updates rarely contend; a scrape sums the shards.
+SHARDS = METRICS_CONFIG["shards"]
+_local = threading.local()
+_shard_counter = itertools.count()
+
+def _shard_index():
+    try:
+        return _local.shard
+    except AttributeError:
+        _local.shard = next(_shard_counter) % SHARDS
+        return _local.shard
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = [({}, threading.Lock()) for _ in range(SHARDS)]
+
+    def _new_row(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labels}")
+        return self._empty_row()
+
+    def _merged(self):
+        """Returns {label values: row} summed over all shards."""
+        merged = {}
+        for rows, lock in self._shards:
+            with lock:
+                snapshot = [(labels, list(row)) for labels, row in rows.items()]
+            for labels, row in snapshot:
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = row
+                else:
+                    for i, value in enumerate(row):
+                        total[i] += value
+        return merged
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, row in sorted(self._merged().items()):
+            lines.extend(self._render_row(labels, row))
+        return lines
+
+class Counter(_Metric):
+    """Monotonic count per label values: `counter.inc(*label_values, amount=1)`."""
+
+    type = "counter"
+
+    def _empty_row(self):
+        return [0]
+
+    def inc(self, *labels, amount=1):
+        rows, lock = self._shards[_shard_index()]
+        with lock:
+            row = rows.get(labels)
+            if row is None:
+                row = rows[labels] = self._new_row(labels)
+            row[0] += amount
+
+    def value(self, *labels):
+        row = self._merged().get(labels)
+        return row[0] if row else 0
+
+    def _render_row(self, labels, row):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(row[0])}"]
+
+class Histogram(_Metric):
+    """Distribution per label values in fixed buckets: `histogram.observe(value, *label_values)`."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=METRICS_CONFIG["latency_buckets_s"]):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _empty_row(self):
+        # A count per bucket, one for values above the last bucket, then the sum
+        return [0] * (len(self.buckets) + 2)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        rows, lock = self._shards[_shard_index()]
+        with lock:
+            row = rows.get(labels)
+            if row is None:
+                row = rows[labels] = self._new_row(labels)
+            row[index] += 1
+            row[-1] += value
+
+    def count(self, *labels):
+        row = self._merged().get(labels)
+        return sum(row[:-1]) if row else 0
+
+    def _render_row(self, labels, row):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+            cumulative += count
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', _format_value(bound)))} {cumulative}"
+            )
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(row[-1])}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=METRICS_CONFIG["latency_buckets_s"]):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# --- Metrics ---
+# Failed calls are counted with the exception type as their outcome, so
+# error rates come from the same counter as request rates.
+AGENT_TURNS = REGISTRY.counter("agent_turns_total", "Agent turns by outcome.", ("outcome",))
+AGENT_TURN_SECONDS = REGISTRY.histogram("agent_turn_seconds", "Duration of agent turns.")
+AGENT_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "agent_first_token_seconds", "Time to the first streamed token of agent turns."
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "llm_requests_total", "LLM calls by provider, model and outcome (retries included).", ("provider", "model", "outcome")
+)
+LLM_SECONDS = REGISTRY.histogram("llm_request_seconds", "Duration of LLM calls.", ("provider", "model"))
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens reported by the provider, by direction (input/output).", ("provider", "model", "direction")
+)
+TOOL_CALLS = REGISTRY.counter("tool_calls_total", "Agent tool calls by tool and outcome.", ("tool", "outcome"))
+TOOL_SECONDS = REGISTRY.histogram("tool_call_seconds", "Duration of agent tool calls.", ("tool",))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit, semantic_hit, miss).", ("cache", "result")
+)
+DB_OPERATIONS = REGISTRY.counter("db_operations_total", "Database operations by operation and outcome.", ("operation", "outcome"))
+DB_SECONDS = REGISTRY.histogram("db_operation_seconds", "Duration of database operations.", ("operation",))
+IMAGEN_REQUESTS = REGISTRY.counter("imagen_requests_total", "Imagen prediction requests by outcome.", ("outcome",))
+IMAGEN_SECONDS = REGISTRY.histogram("imagen_request_seconds", "Duration of Imagen prediction requests.")
+IMAGEN_IMAGES = REGISTRY.counter("imagen_images_total", "Images requested from Imagen.")
+
+def record_call(calls, seconds, labels, started, error=None):
+    """Counts one call (outcome "ok" or the exception type) and observes its duration since `started`."""
+    calls.inc(*labels, "ok" if error is None else type(error).__name__)
+    seconds.observe(time.perf_counter() - started, *labels)
+
+@contextmanager
+def track(calls, seconds, *labels):
+    """Records the wrapped block as one call in `calls` and `seconds` (see record_call)."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_call(calls, seconds, labels, started, e)
+        raise
+    record_call(calls, seconds, labels, started)
+
+# --- HTTP Endpoint ---
+def _make_handler():
+    # http.server is only imported by processes that serve metrics
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood the log
+
+    return MetricsHandler
+
+def start_metrics_server(port=None, host=None):
+    """Serves /metrics on a daemon thread. Returns the server, or None if disabled or the port is taken."""
+    from http.server import ThreadingHTTPServer
+    port = int(os.getenv("METRICS_PORT", METRICS_CONFIG["port"])) if port is None else port
+    host = os.getenv("METRICS_HOST", METRICS_CONFIG["host"]) if host is None else host
+    if not METRICS_CONFIG["enabled"] or not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _make_handler())
+    except OSError as e:
+        logging.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
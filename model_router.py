@@ -0,0 +1,187 @@
+# model_router.py
+import logging
+import re
+import threading
+import time
+from collections import deque
+from config.constants import AUTO_MODEL, AVAILABLE_MODELS, MODEL_ROUTER_CONFIG
+
+# Signals that a prompt is about code: fences, tracebacks, call syntax,
+# statement-ending punctuation and programming vocabulary
+CODE_PATTERN = re.compile(
+    r"```|Traceback \(most recent call last\)|^\s*(def|class|import|from|for|if|return)\s"
+    r"|\w+\([^()]*\)|[;{}]\s*$"
+    r"|\b(code|function|bug|debug|refactor|compile|exception|stack trace|regex|sql|script|"
+    r"python|javascript|typescript|java|golang|rust|c\+\+|html|css)\b",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Errors that make the router try the next model instead of failing the turn
+RATE_LIMIT_PATTERN = re.compile(r"\b429\b|rate.?limit|resource.?exhausted|quota", re.IGNORECASE)
+
+def classify_prompt(prompt):
+    """Returns "code", "chat" or "general" for a user prompt, using cheap text heuristics."""
+    if CODE_PATTERN.search(prompt):
+        return "code"
+    if len(prompt.strip()) <= MODEL_ROUTER_CONFIG["chat_max_chars"]:
+        return "chat"
+    return "general"
+
+def is_rate_limit(error_type, error):
+    return bool(RATE_LIMIT_PATTERN.search(f"{error_type or ''} {error or ''}"))
+
+def is_retryable(error_type, error):
+    """True for failures another model may not have: timeouts, rate limits and open circuits."""
+    return (
+        error_type in ("TimeoutError", "ReadTimeout", "APITimeoutError", "CircuitOpenError")
+        or is_rate_limit(error_type, error)
+    )
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class ModelRouter:
+    """Ranks models per request from live health metrics and a prompt classifier.
+
+    Every finished turn is recorded in a rolling window per model (the last
+    `window_s` seconds, at most `max_samples` turns). Candidates for a prompt
+    start from the preference list of its category; each is scored by its
+    p95 latency, scaled up by its position in that list, and models with a
+    high error rate or a recent rate limit are moved to the back.
+    """
+
+    def __init__(self, models=None, config=MODEL_ROUTER_CONFIG):
+        self.models = models or [m for m in AVAILABLE_MODELS if m != AUTO_MODEL]
+        self.config = config
+        self._samples = {model: deque(maxlen=config["max_samples"]) for model in self.models}
+        self._cooldown_until = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, latency_ms, error_type=None, error=None):
+        """Records the outcome of one turn served by `model_name`."""
+        now = time.monotonic()
+        with self._lock:
+            samples = self._samples.setdefault(model_name, deque(maxlen=self.config["max_samples"]))
+            samples.append((now, latency_ms, error_type is None))
+            if error_type is not None and is_rate_limit(error_type, error):
+                self._cooldown_until[model_name] = now + self.config["rate_limit_cooldown_s"]
+                logging.warning(f"Model {model_name} is rate limited; deprioritized for {self.config['rate_limit_cooldown_s']}s")
+
+    def _health(self, model_name, now):
+        """Returns the window metrics of one model. Caller holds the lock."""
+        samples = self._samples.get(model_name, ())
+        while samples and now - samples[0][0] > self.config["window_s"]:
+            samples.popleft()
+        latencies = sorted(latency for _, latency, ok in samples if ok and latency is not None)
+        requests = len(samples)
+        errors = sum(1 for _, _, ok in samples if not ok)
+        error_rate = errors / requests if requests else 0.0
+        cooling_down = self._cooldown_until.get(model_name, 0) > now
+        trusted = requests >= self.config["min_samples"]
+        return {
+            "model": model_name,
+            "requests": requests,
+            "p50_ms": _percentile(latencies, 0.5),
+            "p95_ms": _percentile(latencies, 0.95),
+            "error_rate": error_rate,
+            "cooling_down": cooling_down,
+            "healthy": not cooling_down and not (trusted and error_rate > self.config["max_error_rate"])
+        }
+
+    def route(self, prompt):
+        """Returns (category, models to try in order) for a prompt."""
+        category = classify_prompt(prompt)
+        preferred = [m for m in self.config["routes"][category] if m in self.models]
+        order = preferred + [m for m in self.models if m not in preferred]
+
+        now = time.monotonic()
+        with self._lock:
+            health = {model: self._health(model, now) for model in order}
+
+        def score(position, model):
+            h = health[model]
+            latency = h["p95_ms"] if h["requests"] >= self.config["min_samples"] and h["p95_ms"] else self.config["default_latency_ms"]
+            return (not h["healthy"], latency * (1 + position * self.config["preference_weight"]))
+
+        ranked = [model for _, model in sorted(enumerate(order), key=lambda item: score(*item))]
+        candidates = ranked[:self.config["max_attempts"]]
+        logging.info(f"Routed {category} prompt to {candidates}")
+        return category, candidates
+
+    def metrics(self):
+        """Returns the rolling-window metrics of every model, for display."""
+        now = time.monotonic()
+        with self._lock:
+            return [self._health(model, now) for model in self._samples]
+
+class RoutedAgent:
+    """Picks the model of each chat turn, falls back on failures and feeds the router's metrics.
+
+    Stands in for an agent executor when the "auto" model is selected; the
+    app and the server run every turn through it. `get_executor(model_name)`
+    supplies the executor of each model (an AgentRegistry's get). Callers
+    stream each attempt themselves and report how it went:
+
+        for category, model_name, executor in routed_agent.attempts(prompt):
+            stats, succeeded = ...  # stream the turn on executor
+            if routed_agent.finish(model_name, stats, succeeded):
+                break
+    """
+
+    def __init__(self, router, get_executor, idle_timeout_s=MODEL_ROUTER_CONFIG["idle_timeout_s"]):
+        self.router = router
+        self.get_executor = get_executor
+        self.idle_timeout_s = idle_timeout_s
+
+    def attempts(self, prompt, model_name=AUTO_MODEL):
+        """Yields (category, model_name, executor) for each model to try, best first.
+
+        "auto" yields the router's candidates for the prompt; any other model
+        name is tried alone (category None). Models whose executor can't be
+        built are recorded as failures and skipped.
+        """
+        if model_name == AUTO_MODEL:
+            category, candidates = self.router.route(prompt)
+        else:
+            category, candidates = None, [model_name]
+        for candidate in candidates:
+            try:
+                executor = self.get_executor(candidate)
+            except Exception as e:
+                logging.error(f"Agent for model {candidate} is unavailable: {e}")
+                self.router.record(candidate, None, type(e).__name__, str(e))
+                continue
+            yield category, candidate, executor
+
+    def finish(self, model_name, stats, succeeded, answered=False):
+        """Records an attempt's TurnStats and returns True when the turn is over.
+
+        The next model is only tried after a retryable failure (see
+        is_retryable), and not once answer text reached the user (`answered`).
+        """
+        self.router.record(model_name, stats.total_ms, stats.error_type, stats.error)
+        return succeeded or answered or not is_retryable(stats.error_type, stats.error)
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_model_router():
+    """Returns the shared model router."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
+
+def history_model(model_name, prompt):
+    """Returns the real model a turn's history is budgeted and summarized for.
+
+    "auto" has no budget or LLM of its own; it stands for the router's first
+    pick for the prompt. Other model names are returned unchanged.
+    """
+    if model_name != AUTO_MODEL:
+        return model_name
+    return get_model_router().route(prompt)[1][0]
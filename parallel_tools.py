@@ -0,0 +1,103 @@
+# parallel_tools.py
+# Building blocks for the async agent executor (see agent.py): a ReAct output
+# parser that accepts several actions per step, and a tool wrapper that bounds
+# how many tool calls run at once.
+import asyncio
+import contextvars
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from langchain.agents import AgentOutputParser
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain_core.agents import AgentAction
+from langchain_core.tools import BaseTool
+
+# One "Action: ... / Action Input: ..." pair. The input runs until the next
+# action, observation or thought, so several pairs can follow each other.
+ACTION_PATTERN = re.compile(
+    r"Action\s*\d*\s*:[ \t]*(.*?)\s*Action\s*\d*\s*Input\s*\d*\s*:[ \t]*(.*?)"
+    r"(?=\n\s*(?:Action\s*\d*\s*:|Observation|Thought)|\Z)",
+    re.DOTALL
+)
+
+class MultiActionReActParser(AgentOutputParser):
+    """ReAct parser that returns every action of a step, so the executor can run them concurrently."""
+
+    def parse(self, text):
+        matches = list(ACTION_PATTERN.finditer(text))
+        if len(matches) < 2:
+            # Final answers, single actions and malformed output behave as before
+            return ReActSingleInputOutputParser().parse(text)
+
+        actions = []
+        for i, match in enumerate(matches):
+            tool_input = match.group(2).strip(" ").strip('"').strip()
+            # The first action carries the thought; the others only their own lines,
+            # so the scratchpad doesn't repeat the whole step for each observation
+            log = text[:match.end()] if i == 0 else match.group(0)
+            actions.append(AgentAction(match.group(1).strip(), tool_input, log))
+        return actions
+
+    @property
+    def _type(self):
+        return "react-multi-action"
+
+class ConcurrencyLimitedTool(BaseTool):
+    """Wraps a tool so its async calls share a semaphore and a dedicated thread pool.
+
+    Synchronous tools run on `pool` instead of the event loop's small default
+    executor; native async tools are awaited directly. Callbacks are reported
+    for the wrapper only, so streamed tool events aren't duplicated.
+    """
+
+    tool: BaseTool
+    semaphore: asyncio.Semaphore
+    pool: ThreadPoolExecutor
+
+    def _run(self, tool_input: str, run_manager=None) -> str:
+        return self.tool.run(tool_input)
+
+    async def _arun(self, tool_input: str, run_manager=None) -> str:
+        async with self.semaphore:
+            if type(self.tool)._arun is not BaseTool._arun:
+                return await self.tool.arun(tool_input)
+            loop = asyncio.get_running_loop()
+            # Copy the context so the tool's spans stay in the turn's trace
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.pool, partial(context.run, self.tool.run, tool_input))
+
+_tool_pool = None
+_tool_pool_lock = threading.Lock()
+
+def get_tool_pool(max_workers):
+    """Returns the thread pool shared by the wrapped tools of every executor, sized on first use.
+
+    Executors are rebuilt and evicted by the registry; sharing one pool means
+    none of them leaves idle threads behind.
+    """
+    global _tool_pool
+    with _tool_pool_lock:
+        if _tool_pool is None:
+            _tool_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+        return _tool_pool
+
+def limit_tool_concurrency(tools, max_concurrent):
+    """Returns wrapped tools of which at most `max_concurrent` calls run at once in total.
+
+    The semaphore binds to the first event loop that uses it, so the wrapped
+    tools must stay on one loop (async_runtime's agent loop in the app).
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    pool = get_tool_pool(max_concurrent)
+    return [
+        ConcurrencyLimitedTool(
+            name=tool.name,
+            description=tool.description,
+            return_direct=tool.return_direct,
+            tool=tool,
+            semaphore=semaphore,
+            pool=pool
+        )
+        for tool in tools
+    ]
@@ -0,0 +1,111 @@
+# prompt_loader.py
+import argparse
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from langchain_core.prompts import PromptTemplate
+from config.prompts import REACT_CHAT_PROMPT, PARALLEL_ACTIONS_INSTRUCTIONS
+
+# Where refreshed copies of hub prompts are kept
+PROMPT_CACHE_DIR = os.getenv(
+    "PROMPT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "multi-chat-agent", "prompts")
+)
+
+# Bundled prompts by hub name
+PROMPTS = {
+    REACT_CHAT_PROMPT["name"]: REACT_CHAT_PROMPT
+}
+
+def _cache_path(name):
+    return os.path.join(PROMPT_CACHE_DIR, name.replace("/", "__") + ".json")
+
+def _read_cache(bundle):
+    """Returns the cached template for a bundle, or None if missing, stale or invalid."""
+    path = _cache_path(bundle["name"])
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable prompt cache {path}: {e}")
+        return None
+
+    if data.get("version") != bundle["version"]:
+        logging.info(f"Ignoring prompt cache for {bundle['name']}: bundled version changed")
+        return None
+
+    # A refreshed template must still accept the variables the agent fills in
+    expected = set(PromptTemplate.from_template(bundle["template"]).input_variables)
+    template = data.get("template", "")
+    if set(PromptTemplate.from_template(template).input_variables) != expected:
+        logging.warning(f"Ignoring prompt cache for {bundle['name']}: input variables changed")
+        return None
+    return template
+
+@lru_cache(maxsize=None)
+def load_prompt(name):
+    """Returns a PromptTemplate from the on-disk cache, or the bundled copy. Never hits the network."""
+    bundle = PROMPTS[name]
+    template = _read_cache(bundle)
+    source = "cache"
+    if template is None:
+        template = bundle["template"]
+        source = "bundled"
+    logging.info(f"Loaded prompt {name} v{bundle['version']} ({source})")
+    return PromptTemplate.from_template(template)
+
+@lru_cache(maxsize=None)
+def load_react_chat_prompt(parallel_actions=False):
+    """Returns the ReAct chat prompt used by the agent.
+
+    With `parallel_actions`, the prompt also tells the model it may request
+    several independent tool calls in one step.
+    """
+    prompt = load_prompt(REACT_CHAT_PROMPT["name"])
+    if not parallel_actions:
+        return prompt
+    if "Begin!" not in prompt.template:
+        logging.warning("ReAct chat prompt has no 'Begin!' marker; parallel action instructions not added")
+        return prompt
+    return PromptTemplate.from_template(
+        prompt.template.replace("Begin!", PARALLEL_ACTIONS_INSTRUCTIONS + "Begin!", 1)
+    )
+
+def refresh_prompt_cache(name=REACT_CHAT_PROMPT["name"]):
+    """Pulls the latest version of a prompt from LangChain Hub into the on-disk cache."""
+    from langchain import hub  # Only needed for an explicit refresh
+
+    bundle = PROMPTS[name]
+    prompt = hub.pull(name)
+    os.makedirs(PROMPT_CACHE_DIR, exist_ok=True)
+    path = _cache_path(name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "name": name,
+            "version": bundle["version"],
+            "template": prompt.template,
+            "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }, f)
+    os.replace(tmp_path, path)
+    load_prompt.cache_clear()
+    load_react_chat_prompt.cache_clear()
+    logging.info(f"Refreshed prompt cache for {name} at {path}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the bundled agent prompts.")
+    parser.add_argument("--refresh", action="store_true", help="pull the latest prompts from LangChain Hub into the cache")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for prompt_name in PROMPTS:
+        if args.refresh:
+            print(f"{prompt_name}: cached at {refresh_prompt_cache(prompt_name)}")
+        else:
+            cached = _read_cache(PROMPTS[prompt_name]) is not None
+            print(f"{prompt_name}: v{PROMPTS[prompt_name]['version']} ({'cache' if cached else 'bundled'})")
@@ -0,0 +1,208 @@
+# providers.py
+import atexit
+import logging
+import os
+import threading
+import httpx
+from dotenv import load_dotenv
+from config.constants import HTTP_POOL_CONFIG, RESILIENCE_CONFIG
+
+# --- Provider Declarations ---
+# Each backend is plain data. "kind" selects the client builder below; any
+# OpenAI-compatible API only needs a new entry here plus a route.
+PROVIDERS = {
+    "google": {
+        "kind": "google_genai",
+        "api_key_env": "GOOGLE_API_KEY"
+    },
+    "openrouter": {
+        "kind": "openai_compatible",
+        "api_key_env": "OPENROUTER_API_KEY",
+        "base_url": "https://openrouter.ai/api/v1",
+        "default_headers": {
+            "HTTP-Referer": "https://github.com/yourusername/your-repo",  # Replace with your repo URL
+            "X-Title": "Your App Name"  # Replace with your app name
+        }
+    },
+    # "openai": {
+    #     "kind": "openai_compatible",
+    #     "api_key_env": "OPENAI_API_KEY",
+    #     "base_url": "https://api.openai.com/v1"
+    # },
+}
+
+# --- Model Routes ---
+# Matched in order on the model name prefix. "models" maps app model names to
+# the provider's model names; "default_model" covers the rest of the prefix.
+MODEL_ROUTES = [
+    {"prefix": "gemini", "provider": "google"},
+    {
+        "prefix": "gemma",
+        "provider": "openrouter",
+        "default_model": "google/gemma-3-4b-it:free"  # Google Gemma 3 4B
+    },
+    {
+        "prefix": "deepseek",
+        "provider": "openrouter",
+        "models": {
+            "deepseek-chat": "deepseek/deepseek-r1:free",
+            "deepseek-coder": "deepseek/deepseek-r1:free"
+        }
+    },
+    # {"prefix": "gpt-", "provider": "openai"},
+]
+
+# --- Fake Provider ---
+# Local stand-in with injected latency and failures (see fakes.FakeProviderChatModel)
+# for load tests and offline evaluation. It answers any "fake*" model name with
+# synthetic output, so it is only registered with FAKE_LLM=1. Each setting can be
+# overridden with a FAKE_LLM_<SETTING> environment variable.
+FAKE_LLM_ENABLED = os.getenv("FAKE_LLM") == "1"
+if FAKE_LLM_ENABLED:
+    PROVIDERS["fake"] = {
+        "kind": "fake",
+        "latency_s": 0.5,
+        "jitter_s": 0.2,
+        "error_rate": 0.0,
+        "rate_limit_rate": 0.0,
+        "hang_rate": 0.0
+    }
+    MODEL_ROUTES.append({"prefix": "fake", "provider": "fake"})
+
+DEFAULT_TEMPERATURE = 0.7
+
+# --- Shared HTTP Clients ---
+# One keep-alive pool per provider, shared by every model and session.
+_http_clients = {}
+_async_http_clients = {}
+_clients_lock = threading.Lock()
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=HTTP_POOL_CONFIG["max_connections"],
+        max_keepalive_connections=HTTP_POOL_CONFIG["max_keepalive_connections"],
+        keepalive_expiry=HTTP_POOL_CONFIG["keepalive_expiry_s"]
+    )
+
+def _http_timeout():
+    return httpx.Timeout(
+        connect=HTTP_POOL_CONFIG["connect_timeout_s"],
+        read=HTTP_POOL_CONFIG["read_timeout_s"],
+        write=HTTP_POOL_CONFIG["write_timeout_s"],
+        pool=HTTP_POOL_CONFIG["pool_timeout_s"]
+    )
+
+def get_http_client(provider_name):
+    """Returns the shared synchronous httpx client of a provider."""
+    with _clients_lock:
+        if provider_name not in _http_clients:
+            _http_clients[provider_name] = httpx.Client(limits=_http_limits(), timeout=_http_timeout())
+            logging.info(f"Created shared HTTP client pool for provider: {provider_name}")
+        return _http_clients[provider_name]
+
+def get_async_http_client(provider_name):
+    """Returns the shared async httpx client of a provider.
+
+    Async calls must run on async_runtime's agent loop, since pooled
+    connections are bound to the loop that opened them.
+    """
+    with _clients_lock:
+        if provider_name not in _async_http_clients:
+            _async_http_clients[provider_name] = httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout())
+        return _async_http_clients[provider_name]
+
+def close_http_clients():
+    """Closes the shared synchronous clients. Async ones die with the agent loop."""
+    with _clients_lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _async_http_clients.clear()
+
+atexit.register(close_http_clients)
+
+# --- Resolution and Construction ---
+def _find_route(model_name):
+    for route in MODEL_ROUTES:
+        if model_name.startswith(route["prefix"]):
+            return route
+    raise ValueError(f"Unsupported model provider for: {model_name}")
+
+def resolve_model(model_name: str):
+    """Returns the (provider, provider model name) pair a model name is served by."""
+    route = _find_route(model_name)
+    provider_model = route.get("models", {}).get(model_name) or route.get("default_model") or model_name
+    return route["provider"], provider_model
+
+def _get_api_key(provider_name, provider):
+    api_key = os.getenv(provider["api_key_env"])
+    if not api_key:
+        raise ValueError(f"{provider['api_key_env']} not found in environment variables.")
+    return api_key
+
+def _client_retry_settings(provider_name):
+    """Client-level timeout and retries. Retries are left to the resilience layer when it is on."""
+    from resilience import get_policy  # resilience imports LangChain's chat model base (~0.5 s)
+
+    return {
+        "timeout": get_policy(provider_name)["timeout_s"],
+        "max_retries": 0 if RESILIENCE_CONFIG["enabled"] else 2
+    }
+
+# Client builders import their SDK on first use, so only the providers that
+# are actually used pay for it (langchain_openai alone takes ~0.75 s)
+def _build_google_genai(provider_name, provider, model, temperature):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        google_api_key=_get_api_key(provider_name, provider),
+        **_client_retry_settings(provider_name)
+    )
+
+def _build_openai_compatible(provider_name, provider, model, temperature):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        openai_api_key=_get_api_key(provider_name, provider),
+        base_url=provider.get("base_url"),
+        default_headers=provider.get("default_headers"),
+        http_client=get_http_client(provider_name),
+        http_async_client=get_async_http_client(provider_name),
+        **_client_retry_settings(provider_name)
+    )
+
+def _build_fake(provider_name, provider, model, temperature):
+    from fakes import FakeProviderChatModel  # Local development and failure testing only
+
+    settings = {
+        key: float(os.getenv(f"FAKE_LLM_{key.upper()}", provider[key]))
+        for key in ("latency_s", "jitter_s", "error_rate", "rate_limit_rate", "hang_rate")
+    }
+    return FakeProviderChatModel(**settings)
+
+CLIENT_BUILDERS = {
+    "google_genai": _build_google_genai,
+    "openai_compatible": _build_openai_compatible,
+    "fake": _build_fake
+}
+
+def create_llm(model_name: str, temperature: float = DEFAULT_TEMPERATURE):
+    """Creates the chat model for a model name from the matching provider."""
+    # Load environment variables
+    load_dotenv()
+    try:
+        provider_name, provider_model = resolve_model(model_name)
+        provider = PROVIDERS[provider_name]
+        llm = CLIENT_BUILDERS[provider["kind"]](provider_name, provider, provider_model, temperature)
+        if RESILIENCE_CONFIG["enabled"]:
+            from resilience import ResilientChatModel
+            llm = ResilientChatModel.wrap(llm, provider_name, provider_model)
+        logging.info(f"Initialized {provider_name} with model: {provider_model} (requested: {model_name})")
+        return llm
+    except Exception as e:
+        logging.error(f"Failed to initialize LLM for model {model_name}: {e}")
+        raise # Re-raise the exception to be caught by the caller (e.g., Streamlit app)
@@ -0,0 +1,447 @@
+# resilience.py
+# Timeouts, retries with jittered backoff, circuit breakers and hedged
+# requests around chat model calls (see providers.create_llm).
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from config.constants import RESILIENCE_CONFIG
+from metrics import LLM_REQUESTS, LLM_SECONDS, LLM_TOKENS, record_call
+from tracing import start_span
+
+# Failures worth retrying: timeouts, rate limits, overload and failed connections,
+# recognized by the client's exception type...
+TRANSIENT_TYPE_PATTERN = re.compile(
+    r"Timeout|RateLimit|TooManyRequests|ResourceExhausted|ServiceUnavailable|InternalServerError"
+    r"|DeadlineExceeded|APIConnectionError"
+)
+# ...or by an HTTP status of 429, 500, 502, 503 or 504 leading the message or
+# given as its error/status code. Other 5xx codes (501 Not Implemented, ...) and
+# numbers elsewhere in the text (e.g. "max_tokens must be <= 512") don't count.
+TRANSIENT_STATUS_PATTERN = re.compile(
+    r"(?:^|error code:?|status(?: code)?:?)\s*(?:429|500|502|503|504)\b",
+    re.IGNORECASE
+)
+
+# Inner calls run without callbacks so streamed tokens are only reported once, by the wrapper
+_NO_CALLBACKS = {"callbacks": []}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+def is_transient(error):
+    """Returns whether a failed call is worth retrying (see TRANSIENT_TYPE_PATTERN)."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return bool(TRANSIENT_TYPE_PATTERN.search(type(error).__name__) or TRANSIENT_STATUS_PATTERN.search(str(error)))
+
+def backoff_delay(attempt, base_s, max_s):
+    """Full-jitter exponential backoff: uniform in [0, min(max_s, base_s * 2**attempt)]."""
+    return random.uniform(0, min(max_s, base_s * 2 ** attempt))
+
+def get_policy(provider_name):
+    """Returns the resilience settings of a provider: the defaults with its overrides applied."""
+    policy = dict(RESILIENCE_CONFIG["providers"]["default"])
+    policy.update(RESILIENCE_CONFIG["providers"].get(provider_name, {}))
+    return policy
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive transient failures.
+
+    Closed: calls pass. Open: calls are rejected for `reset_timeout_s`.
+    Half-open: one trial call is let through; success closes the breaker,
+    failure opens it again. A trial that never reports back (for example a
+    cancelled call) is replaced after another `reset_timeout_s`. Calls that
+    fail for reasons unrelated to the provider's health (a 400) report
+    release() and leave the state as it is.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout_s):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raises CircuitOpenError if a call may not go out now."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open" and now - self._opened_at >= self.reset_timeout_s:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            trial_pending = self._trial_in_flight and now - self._trial_started < self.reset_timeout_s
+            if self.state == "open" or (self.state == "half_open" and trial_pending):
+                _count(self.name, "rejected")
+                raise CircuitOpenError(f"Circuit open for provider {self.name}; failing fast")
+            if self.state == "half_open":
+                self._trial_in_flight = True
+                self._trial_started = now
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logging.info(f"Circuit for provider {self.name} closed")
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """Frees the half-open trial slot without changing the state."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logging.warning(f"Circuit for provider {self.name} opened after {self._failures} failures")
+                    _count(self.name, "trips")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+class LatencyTracker:
+    """Recent latencies of successful calls, for the hedging delay."""
+
+    def __init__(self, max_samples):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q, min_samples):
+        """Returns the q-quantile, or None with fewer than `min_samples` samples."""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# --- Shared Per-Provider State ---
+_breakers = {}
+_trackers = {}
+_stats = Counter()
+_state_lock = threading.Lock()
+
+def _count(provider_name, event):
+    with _state_lock:
+        _stats[(provider_name, event)] += 1
+
+def get_circuit_breaker(provider_name):
+    with _state_lock:
+        if provider_name not in _breakers:
+            policy = get_policy(provider_name)
+            _breakers[provider_name] = CircuitBreaker(
+                provider_name, policy["failure_threshold"], policy["reset_timeout_s"]
+            )
+        return _breakers[provider_name]
+
+def get_latency_tracker(key):
+    with _state_lock:
+        if key not in _trackers:
+            _trackers[key] = LatencyTracker(RESILIENCE_CONFIG["latency_samples"])
+        return _trackers[key]
+
+def get_resilience_stats():
+    """Returns breaker state and retry, timeout, hedge and rejection counts per provider."""
+    with _state_lock:
+        providers = set(_breakers) | {provider for provider, _ in _stats}
+        return {
+            provider: {
+                "state": _breakers[provider].state if provider in _breakers else "closed",
+                **{event: _stats[(provider, event)] for event in ("retries", "timeouts", "hedges", "rejected", "trips")}
+            }
+            for provider in sorted(providers)
+        }
+
+class ResilientChatModel(BaseChatModel):
+    """Chat model wrapper adding resilience to every call of `inner`.
+
+    - Each attempt has a deadline of `timeout_s` (for streams: until the
+      first chunk, then `stream_idle_timeout_s` between chunks).
+    - Transient failures are retried with full-jitter exponential backoff.
+    - A per-provider circuit breaker fails fast while the provider is down.
+    - With `hedge`, a duplicate request is sent once an attempt is slower
+      than the provider's recent p95 latency, and the first reply wins.
+
+    Streams are only retried or hedged until their first chunk. Deadlines
+    and hedging apply to async calls (the path the agent uses); sync calls
+    rely on the client's own timeout. Every call, retries included, is
+    traced as one "llm.<provider>" span and counted in metrics.py.
+    """
+
+    inner: BaseChatModel
+    provider: str
+    model: str = ""
+    policy: dict
+    breaker: CircuitBreaker
+    latencies: LatencyTracker
+    first_chunk_latencies: LatencyTracker
+
+    @classmethod
+    def wrap(cls, inner, provider_name, model_name):
+        """Wraps `inner` with the policy and shared breaker of its provider."""
+        return cls(
+            inner=inner,
+            provider=provider_name,
+            model=model_name,
+            policy=get_policy(provider_name),
+            breaker=get_circuit_breaker(provider_name),
+            latencies=get_latency_tracker((provider_name, model_name, "call")),
+            first_chunk_latencies=get_latency_tracker((provider_name, model_name, "first_chunk"))
+        )
+
+    @property
+    def _llm_type(self):
+        return f"resilient-{self.inner._llm_type}"
+
+    # --- Retry Loop ---
+    def _should_retry(self, error, attempt):
+        """Records a failed attempt and returns whether to try again."""
+        if isinstance(error, CircuitOpenError):
+            return False
+        if not is_transient(error):
+            # The provider answered (e.g. a 400); that says nothing about its health
+            self.breaker.release()
+            return False
+        self.breaker.record_failure()
+        if attempt >= self.policy["max_retries"]:
+            return False
+        _count(self.provider, "retries")
+        logging.warning(f"{self.provider} call failed ({type(error).__name__}: {error}); retry {attempt + 1}/{self.policy['max_retries']}")
+        return True
+
+    def _retry(self, call):
+        for attempt in range(self.policy["max_retries"] + 1):
+            self.breaker.check()
+            try:
+                result = call()
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(backoff_delay(attempt, self.policy["backoff_base_s"], self.policy["backoff_max_s"]))
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _aretry(self, call):
+        for attempt in range(self.policy["max_retries"] + 1):
+            self.breaker.check()
+            try:
+                result = await call()
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.policy["backoff_base_s"], self.policy["backoff_max_s"]))
+            else:
+                self.breaker.record_success()
+                return result
+
+    # --- Hedging ---
+    def _hedge_delay(self, tracker):
+        if not self.policy["hedge"]:
+            return None
+        p = tracker.percentile(RESILIENCE_CONFIG["hedge_percentile"], RESILIENCE_CONFIG["hedge_min_samples"])
+        return None if p is None else max(p, RESILIENCE_CONFIG["hedge_min_delay_s"])
+
+    async def _ahedged(self, call, tracker, discard=None):
+        """Runs `call`, adding a duplicate after the hedge delay; returns the first success."""
+        delay = self._hedge_delay(tracker)
+        if delay is None:
+            return await call()
+
+        tasks = [asyncio.ensure_future(call())]
+        winner, error = None, None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                _count(self.provider, "hedges")
+                logging.info(f"{self.provider} call slower than {delay:.2f}s; sending a hedged request")
+                tasks.append(asyncio.ensure_future(call()))
+
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        # A loser that also finished may hold an open stream
+        for task in tasks:
+            if task is not winner and discard and task.done() and not task.cancelled() and task.exception() is None:
+                await discard(task.result())
+        if winner is None:
+            raise error
+        return winner.result()
+
+    # --- Single Attempts ---
+    async def _acall_once(self, messages, stop, kwargs):
+        start = time.perf_counter()
+        try:
+            message = await asyncio.wait_for(
+                self.inner.ainvoke(messages, config=_NO_CALLBACKS, stop=stop, **kwargs),
+                timeout=self.policy["timeout_s"]
+            )
+        except asyncio.TimeoutError:
+            _count(self.provider, "timeouts")
+            raise TimeoutError(f"{self.provider} call timed out after {self.policy['timeout_s']}s")
+        self.latencies.add(time.perf_counter() - start)
+        return message
+
+    async def _aopen_stream(self, messages, stop, kwargs):
+        """Starts a stream and waits for its first chunk. Returns (stream, first chunk or None)."""
+        start = time.perf_counter()
+        stream = self.inner.astream(messages, config=_NO_CALLBACKS, stop=stop, **kwargs)
+        try:
+            first = await asyncio.wait_for(stream.__anext__(), timeout=self.policy["timeout_s"])
+        except StopAsyncIteration:
+            first = None
+        except asyncio.TimeoutError:
+            await stream.aclose()
+            _count(self.provider, "timeouts")
+            raise TimeoutError(f"{self.provider} stream sent nothing for {self.policy['timeout_s']}s")
+        except BaseException:
+            await stream.aclose()
+            raise
+        self.first_chunk_latencies.add(time.perf_counter() - start)
+        return stream, first
+
+    @staticmethod
+    async def _aclose_stream(opened):
+        await opened[0].aclose()
+
+    # --- BaseChatModel Interface ---
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        call = _CallRecord(self, streaming=False)
+        try:
+            message = self._retry(lambda: self.inner.invoke(messages, config=_NO_CALLBACKS, stop=stop, **kwargs))
+        except Exception as e:
+            call.end(e)
+            raise
+        call.add(message)
+        call.end()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        call = _CallRecord(self, streaming=False)
+        try:
+            message = await self._aretry(
+                lambda: self._ahedged(lambda: self._acall_once(messages, stop, kwargs), self.latencies)
+            )
+        except Exception as e:
+            call.end(e)
+            raise
+        call.add(message)
+        call.end()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        def open_stream():
+            stream = iter(self.inner.stream(messages, config=_NO_CALLBACKS, stop=stop, **kwargs))
+            return stream, next(stream, None)
+
+        call, error = _CallRecord(self, streaming=True), None
+        try:
+            stream, chunk = self._retry(open_stream)
+            call.first_chunk()
+            while chunk is not None:
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    run_manager.on_llm_new_token(generation.text, chunk=generation)
+                call.add(chunk)
+                yield generation
+                chunk = next(stream, None)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            call.end(error)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        call, error = _CallRecord(self, streaming=True), None
+        try:
+            stream, chunk = await self._aretry(lambda: self._ahedged(
+                lambda: self._aopen_stream(messages, stop, kwargs), self.first_chunk_latencies, self._aclose_stream
+            ))
+        except Exception as e:
+            call.end(e)
+            raise
+        call.first_chunk()
+        idle_timeout_s = RESILIENCE_CONFIG["stream_idle_timeout_s"]
+        try:
+            while chunk is not None:
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(generation.text, chunk=generation)
+                call.add(chunk)
+                yield generation
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=idle_timeout_s)
+                except StopAsyncIteration:
+                    chunk = None
+                except asyncio.TimeoutError:
+                    _count(self.provider, "timeouts")
+                    raise TimeoutError(f"{self.provider} stream stalled for {idle_timeout_s}s")
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await stream.aclose()
+            call.end(error)
+
+class _CallRecord:
+    """Span, metrics and token usage of one ResilientChatModel call, retries included.
+
+    The span is ended explicitly instead of in a `span` block, because a
+    contextvar set in a generator can't be reset across its yields.
+    """
+
+    def __init__(self, model, streaming):
+        self.provider = model.provider
+        self.model = model.model
+        self.span = start_span(f"llm.{model.provider}", model=model.model, streaming=streaming)
+        self.started = time.perf_counter()
+        self.chunks = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def first_chunk(self):
+        self.span.set_attribute("first_chunk_ms", (time.perf_counter() - self.started) * 1000)
+
+    def add(self, message):
+        """Counts a message or streamed chunk and the token usage it reports."""
+        self.chunks += 1
+        usage = getattr(message, "usage_metadata", None) or {}
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.output_tokens += usage.get("output_tokens", 0)
+
+    def end(self, error=None):
+        record_call(LLM_REQUESTS, LLM_SECONDS, (self.provider, self.model), self.started, error)
+        if self.input_tokens or self.output_tokens:
+            LLM_TOKENS.inc(self.provider, self.model, "input", amount=self.input_tokens)
+            LLM_TOKENS.inc(self.provider, self.model, "output", amount=self.output_tokens)
+        self.span.set_attribute("chunks", self.chunks)
+        self.span.set_attribute("input_tokens", self.input_tokens)
+        self.span.set_attribute("output_tokens", self.output_tokens)
+        if error is not None:
+            self.span.record_error(error)
+        self.span.end()
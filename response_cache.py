@@ -0,0 +1,246 @@
+# response_cache.py
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from metrics import CACHE_LOOKUPS
+from config.constants import RESPONSE_CACHE_CONFIG
+
+# Where cached responses are stored
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "multi-chat-agent", "responses.sqlite3")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    history_hash TEXT NOT NULL,
+    input TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE INDEX IF NOT EXISTS responses_model_history ON responses (model, history_hash, last_access);
+"""
+
+def normalize_input(text):
+    """Case- and whitespace-insensitive form of a user prompt."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+def _history_text(history):
+    """Returns the truncated tail of the chat history that is part of the cache key."""
+    tail = history[-RESPONSE_CACHE_CONFIG["history_messages"]:] if RESPONSE_CACHE_CONFIG["history_messages"] else []
+    parts = []
+    for msg in tail:
+        if isinstance(msg, dict):
+            role, content = msg.get("role", ""), msg.get("content", "")
+        else:
+            role, content = getattr(msg, "type", ""), getattr(msg, "content", "")
+        parts.append(f"{role}:{normalize_input(str(content))}")
+    return "\n".join(parts)[-RESPONSE_CACHE_CONFIG["history_chars"]:]
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class ResponseCache:
+    """On-disk cache of agent answers keyed on model, prompt and recent history.
+
+    Exact tier: SHA-256 of the model name, the normalized prompt and the
+    truncated history. Semantic tier (optional, needs `embed`): answers of
+    the same model and history whose prompt embedding is at least
+    `similarity_threshold` cosine-similar. Entries expire after `ttl_s` and
+    the least recently used ones are evicted beyond `max_entries`.
+
+    The cache is shared by all users and conversations of the process (and
+    of every process using the same file): an answer stored for one is served
+    to anyone sending the same prompt after the same recent history. Callers
+    only store turns that used no tools, whose answers depend on live data.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, embed=None,
+                 ttl_s=RESPONSE_CACHE_CONFIG["ttl_s"],
+                 max_entries=RESPONSE_CACHE_CONFIG["max_entries"],
+                 similarity_threshold=RESPONSE_CACHE_CONFIG["similarity_threshold"],
+                 disabled_models=RESPONSE_CACHE_CONFIG["disabled_models"]):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.embed = embed
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.disabled_models = set(disabled_models)
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def is_enabled_for(self, model_name):
+        return model_name not in self.disabled_models
+
+    def _keys(self, model_name, user_input, history):
+        history_hash = _sha256(_history_text(history))
+        key = _sha256(f"{model_name}\n{history_hash}\n{normalize_input(user_input)}")
+        return key, history_hash
+
+    def get(self, model_name, user_input, history=()):
+        """Returns a cached answer, or None on a miss or when the model opted out."""
+        if not self.is_enabled_for(model_name):
+            return None
+
+        key, history_hash = self._keys(model_name, user_input, history)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl_s:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.exact_hits += 1
+                CACHE_LOOKUPS.inc("response", "hit")
+                return row[0]
+
+        if self.embed is not None:
+            response = self._semantic_get(model_name, user_input, history_hash, now)
+            if response is not None:
+                CACHE_LOOKUPS.inc("response", "semantic_hit")
+                return response
+
+        with self._lock:
+            self.misses += 1
+        CACHE_LOOKUPS.inc("response", "miss")
+        return None
+
+    def _semantic_get(self, model_name, user_input, history_hash, now):
+        """Returns the answer of the most similar cached prompt above the threshold."""
+        try:
+            query = self.embed(normalize_input(user_input))
+        except Exception as e:
+            logging.warning(f"Embedding failed, skipping semantic cache lookup: {e}")
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, response, embedding FROM responses "
+                "WHERE model = ? AND history_hash = ? AND embedding IS NOT NULL AND created_at >= ? "
+                "ORDER BY last_access DESC LIMIT ?",
+                (model_name, history_hash, now - self.ttl_s, RESPONSE_CACHE_CONFIG["semantic_candidates"])
+            ).fetchall()
+
+        best_key, best_response, best_score = None, None, self.similarity_threshold
+        for key, response, blob in rows:
+            score = _cosine(query, array("f", blob))
+            if score >= best_score:
+                best_key, best_response, best_score = key, response, score
+        if best_key is None:
+            return None
+
+        with self._lock:
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, best_key))
+            self._conn.commit()
+            self.semantic_hits += 1
+        logging.info(f"Semantic cache hit (similarity {best_score:.3f})")
+        return best_response
+
+    def put(self, model_name, user_input, history, response):
+        """Stores an answer and evicts the least recently used entries beyond max_entries."""
+        if not self.is_enabled_for(model_name):
+            return
+
+        key, history_hash = self._keys(model_name, user_input, history)
+        embedding = None
+        if self.embed is not None:
+            try:
+                embedding = array("f", self.embed(normalize_input(user_input))).tobytes()
+            except Exception as e:
+                logging.warning(f"Embedding failed, storing exact-match entry only: {e}")
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, history_hash, user_input, response, embedding, now, now)
+            )
+            self.stores += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drops expired entries and trims to max_entries. Caller holds the lock."""
+        expired = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_s,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+        self.evictions += expired + max(overflow, 0)
+
+    def stats(self):
+        """Returns hit-rate metrics."""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "size": size,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _make_embedder():
+    """Returns an embed(text) function for the semantic tier."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings  # Only needed for the semantic tier
+
+    embeddings = GoogleGenerativeAIEmbeddings(model=RESPONSE_CACHE_CONFIG["embedding_model"])
+    return embeddings.embed_query
+
+def get_response_cache():
+    """Returns the shared response cache, or None when caching is disabled or unavailable."""
+    global _cache
+    if not RESPONSE_CACHE_CONFIG["enabled"]:
+        return None
+    if _cache is not None:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None:
+            try:
+                embed = _make_embedder() if RESPONSE_CACHE_CONFIG["semantic_enabled"] else None
+                _cache = ResponseCache(embed=embed)
+                logging.info(f"Response cache opened at {RESPONSE_CACHE_PATH}")
+            except Exception as e:
+                logging.error(f"Failed to open response cache: {e}")
+                return None
+    return _cache
@@ -0,0 +1,253 @@
+# sandbox.py
+# Python execution for the agent in separate, resource-limited worker processes.
+# Standard library only: each worker is a fresh interpreter running this file
+# (see _Worker), so it never imports the app or its dependencies.
+import contextlib
+import contextvars
+import io
+import json
+import logging
+import math
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import zlib
+from collections import OrderedDict
+from multiprocessing.connection import Connection
+
+# Session whose namespace the agent's code runs in (set per conversation by the UI)
+current_session_id = contextvars.ContextVar("sandbox_session_id", default="default")
+
+class _CpuTimeExceeded(Exception):
+    pass
+
+def _on_cpu_limit(signum, frame):
+    raise _CpuTimeExceeded()
+
+def _worker_main(conn, memory_mb, preload_modules, max_sessions):
+    """Worker loop: apply limits, warm imports, then execute requests with per-session namespaces."""
+    import resource
+
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    for module in preload_modules:
+        try:
+            __import__(module)
+        except Exception:
+            pass  # Optional warm import; the code can still try to import it itself
+    conn.send({"ready": True})
+
+    namespaces = OrderedDict()
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        session_id, code, cpu_time_s = request["session_id"], request["code"], request["cpu_time_s"]
+
+        namespace = namespaces.pop(session_id, None)
+        if namespace is None:
+            namespace = {"__name__": "__main__"}
+        namespaces[session_id] = namespace
+        while len(namespaces) > max_sessions:
+            namespaces.popitem(last=False)
+
+        # RLIMIT_CPU counts the whole process, so allow `cpu_time_s` beyond what is used
+        # so far; rounding up keeps the budget from shrinking below cpu_time_s
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = math.ceil(usage.ru_utime + usage.ru_stime)
+        hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_time_s, hard))
+
+        output = io.StringIO()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                exec(code, namespace)
+        except _CpuTimeExceeded:
+            status = "cpu_limit"
+            output.write(f"\nExecution stopped: CPU time limit of {cpu_time_s}s exceeded.")
+        except MemoryError:
+            status = "memory_limit"
+            output.write("\nExecution stopped: memory limit exceeded.")
+        except BaseException:
+            status = "error"
+            output.write(traceback.format_exc(limit=5))
+        finally:
+            resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, hard))
+        conn.send({
+            "output": output.getvalue(),
+            "status": status,
+            "exec_ms": (time.perf_counter() - start) * 1000
+        })
+
+class _Worker:
+    """One pre-spawned worker process and the connection to it.
+
+    The worker runs this file in a fresh, isolated interpreter (`python -I`)
+    rather than a multiprocessing child, which would re-import the parent's
+    __main__ and with it the app. It only gets the environment variables
+    in `env_allowlist` and starts in a private temporary directory (removed
+    when the worker stops), so relative paths like `.env` don't resolve to
+    the app's files.
+
+    This is not a filesystem sandbox: the worker runs as the app's user and
+    can still open any file that user can read by absolute path. Run the
+    app as a user that can't read its secrets files if that matters.
+    """
+
+    def __init__(self, memory_mb, preload_modules, max_sessions, env_allowlist):
+        parent_socket, child_socket = socket.socketpair()
+        settings = json.dumps([memory_mb, list(preload_modules), max_sessions])
+        self.workdir = tempfile.mkdtemp(prefix="sandbox-")
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", os.path.abspath(__file__), str(child_socket.fileno()), settings],
+            cwd=self.workdir,
+            env={name: value for name, value in os.environ.items() if name in env_allowlist},
+            pass_fds=(child_socket.fileno(),),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL
+        )
+        child_socket.close()
+        self.conn = Connection(parent_socket.detach())
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = bool(self.conn.recv().get("ready"))
+        return self.ready
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+        self.conn.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+class SandboxPool:
+    """Pool of pre-spawned Python worker processes.
+
+    Each session is pinned to one worker so its variables persist between
+    calls. Sessions are not isolated from each other: the sessions pinned to
+    a worker share its interpreter and only get separate namespace dicts, so
+    code of one session can reach another's variables (e.g. through
+    gc.get_objects()) and files. Every call gets a CPU-time limit (enforced in the worker) and a
+    wall-clock limit (enforced here by killing and replacing the worker);
+    workers run under an address-space limit of `memory_mb`, with only the
+    `env_allowlist` environment variables. Output beyond `max_output_chars`
+    is truncated.
+    """
+
+    def __init__(self, workers=2, cpu_time_s=10, wall_time_s=30, memory_mb=1024,
+                 max_output_chars=4000, preload_modules=(), max_sessions_per_worker=50,
+                 env_allowlist=("PATH", "HOME", "LANG", "TZ")):
+        self.cpu_time_s = cpu_time_s
+        self.wall_time_s = wall_time_s
+        self.max_output_chars = max_output_chars
+        self._worker_args = (memory_mb, tuple(preload_modules), max_sessions_per_worker, frozenset(env_allowlist))
+        self._workers = [self._spawn() for _ in range(workers)]
+        self._locks = [threading.Lock() for _ in range(workers)]
+        self._stats_lock = threading.Lock()
+
+        self.calls = 0
+        self.restarts = 0
+        self.timeouts = 0
+        self.total_queue_wait_ms = 0.0
+        self.total_exec_ms = 0.0
+
+    def _spawn(self):
+        return _Worker(*self._worker_args)
+
+    def _slot(self, session_id):
+        # crc32 is stable across processes, unlike hash()
+        return zlib.crc32(session_id.encode("utf-8")) % len(self._workers)
+
+    def run(self, code, session_id=None):
+        """Executes code in the session's worker and returns a result dict.
+
+        Keys: output, status (ok/error/cpu_limit/memory_limit/timeout/crashed),
+        truncated, queue_wait_ms, exec_ms.
+        """
+        session_id = session_id or current_session_id.get()
+        slot = self._slot(session_id)
+        queued_at = time.perf_counter()
+        with self._locks[slot]:
+            queue_wait_ms = (time.perf_counter() - queued_at) * 1000
+            result = self._run_in_worker(slot, code, session_id)
+
+        output = result["output"]
+        result["truncated"] = len(output) > self.max_output_chars
+        if result["truncated"]:
+            output = output[:self.max_output_chars] + f"\n... [truncated {len(result['output']) - self.max_output_chars} characters]"
+        result["output"] = output
+        result["queue_wait_ms"] = queue_wait_ms
+
+        with self._stats_lock:
+            self.calls += 1
+            self.total_queue_wait_ms += queue_wait_ms
+            self.total_exec_ms += result["exec_ms"]
+        logging.info(
+            f"Sandbox call for session {session_id}: {result['status']}, "
+            f"queue wait {queue_wait_ms:.0f} ms, execution {result['exec_ms']:.0f} ms"
+        )
+        return result
+
+    def _run_in_worker(self, slot, code, session_id):
+        """Sends one request to the slot's worker, replacing the worker if it hangs or dies."""
+        worker = self._workers[slot]
+        start = time.perf_counter()
+        try:
+            if not worker.wait_ready(self.wall_time_s):
+                raise TimeoutError("worker did not start")
+            worker.conn.send({"session_id": session_id, "code": code, "cpu_time_s": self.cpu_time_s})
+            if worker.conn.poll(self.wall_time_s):
+                return worker.conn.recv()
+            status, message = "timeout", f"Execution stopped: wall-clock limit of {self.wall_time_s}s exceeded."
+            with self._stats_lock:
+                self.timeouts += 1
+        except (EOFError, OSError, TimeoutError) as e:
+            status, message = "crashed", f"Execution failed: the sandbox process exited ({str(e) or type(e).__name__})."
+
+        # The worker is stuck or gone: replace it. Session variables on it are lost.
+        worker.kill()
+        self._workers[slot] = self._spawn()
+        with self._stats_lock:
+            self.restarts += 1
+        return {
+            "output": f"{message} Variables from earlier calls were reset.",
+            "status": status,
+            "exec_ms": (time.perf_counter() - start) * 1000
+        }
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "workers": len(self._workers),
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+                "avg_queue_wait_ms": self.total_queue_wait_ms / self.calls if self.calls else 0.0,
+                "avg_exec_ms": self.total_exec_ms / self.calls if self.calls else 0.0
+            }
+
+    def close(self):
+        for worker in self._workers:
+            worker.kill()
+
+if __name__ == "__main__":
+    # Worker entry point, started by _Worker: sandbox.py <connection fd> <settings json>
+    _worker_main(Connection(int(sys.argv[1])), *json.loads(sys.argv[2]))
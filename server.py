@@ -0,0 +1,388 @@
+# server.py
+# Headless HTTP API over the same agent, database and image job code as the
+# Streamlit app, for clients that don't need the UI. Run it with
+#
+#     uvicorn server:app --host 127.0.0.1 --port 8000 --workers 4
+#
+# or `python server.py`. The API has no authentication of its own: keep it on
+# loopback and put an authenticating reverse proxy in front for other hosts.
+#
+# Each worker process keeps one AgentRegistry shared by all of its requests,
+# and state that matters across requests lives in MongoDB: a turn's messages
+# are written (awaited, see async_database.py) before it reports "done", so
+# workers and replicas can sit behind a load balancer. Image jobs are the
+# exception: a job and its images are held by the worker that runs it, so
+# route /images/* with sticky sessions (or run a single image worker).
+import json
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from agent_registry import AgentRegistry
+from async_database import add_message_async, close_async_db_connection
+from database import (
+    initialize_database_in_background,
+    create_conversation,
+    list_conversations,
+    get_conversation,
+    rename_conversation,
+    delete_conversation,
+    get_message_page,
+    get_messages,
+    get_conversation_summary,
+    save_conversation_summary,
+    MESSAGE_PROJECTION
+)
+from history import HistoryManager, HistoryState, make_llm_summarizer
+from image_generation import prewarm_prediction_client
+from image_jobs import get_image_job_queue
+from image_store import get_image_store
+from metrics import CONTENT_TYPE, REGISTRY
+from model_router import RoutedAgent, get_model_router, history_model
+from providers import create_llm, resolve_model
+from response_cache import get_response_cache
+from sandbox import current_session_id
+from streaming import TurnStats, astream_agent_events
+from tracing import span
+from config.constants import (
+    AGENT_REGISTRY_CONFIG,
+    AUTO_MODEL,
+    DEFAULTS,
+    IMAGEN_CLIENT_CONFIG,
+    SERVER_CONFIG
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Shared State ---
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_agent_registry():
+    """Returns the executor registry of this worker process, prewarming it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AgentRegistry()
+            _registry.prewarm(AGENT_REGISTRY_CONFIG["prewarm_models"])
+        return _registry
+
+@lru_cache(maxsize=None)
+def get_summarizer(model_name):
+    """One lazily created summarizer per model, shared across requests."""
+    return make_llm_summarizer(lambda: create_llm(model_name))
+
+@asynccontextmanager
+async def lifespan(app):
+    initialize_database_in_background()
+    get_agent_registry()
+    if IMAGEN_CLIENT_CONFIG["prewarm"]:
+        prewarm_prediction_client()
+    yield
+    await close_async_db_connection()
+
+app = FastAPI(title="Multi Chat Agent", lifespan=lifespan)
+
+# --- Request Bodies ---
+class ConversationCreate(BaseModel):
+    name: str = Field("New Conversation", min_length=1, max_length=200)
+
+class ConversationUpdate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+
+class ChatRequest(BaseModel):
+    content: str = Field(..., min_length=1)
+    model: str = DEFAULTS["initial_model"]
+
+class ImageRequest(BaseModel):
+    prompt: str = Field(..., min_length=1)
+    num_images: int = Field(DEFAULTS["num_images"], ge=1, le=8)
+    style: str = DEFAULTS["style"]
+    use_cache: bool = True
+
+# --- Helpers ---
+PageSize = Query(SERVER_CONFIG["page_size"], ge=1, le=SERVER_CONFIG["max_page_size"])
+
+def encode_cursor(cursor):
+    """Turns a (datetime, id) keyset cursor into an opaque string, or None."""
+    if cursor is None:
+        return None
+    value, doc_id = cursor
+    return f"{value.isoformat()}|{doc_id}"
+
+def decode_cursor(text):
+    if not text:
+        return None
+    try:
+        value, doc_id = text.split("|", 1)
+        return datetime.fromisoformat(value), doc_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def conversation_view(conversation):
+    return {key: conversation.get(key) for key in ("_id", "name", "created_at", "updated_at")}
+
+def message_view(message):
+    return {key: message.get(key) for key in ("_id", "role", "content", "timestamp")}
+
+def require_conversation(conversation_id):
+    conversation = get_conversation(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+def _image_media_type(data):
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    return "application/octet-stream"
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+# --- Service ---
+@app.get("/health")
+def health():
+    return {"status": "ok", "agents": get_agent_registry().stats()}
+
+@app.get("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# --- Conversations ---
+# Plain `def` handlers: FastAPI runs them on its threadpool, so the blocking
+# database.py calls never hold up the event loop.
+@app.post("/conversations", status_code=201)
+def create_conversation_endpoint(body: ConversationCreate):
+    conversation_id = create_conversation(body.name)
+    if conversation_id is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return conversation_view(require_conversation(str(conversation_id)))
+
+@app.get("/conversations")
+def list_conversations_endpoint(limit: int = PageSize, before: Optional[str] = None):
+    conversations, cursor = list_conversations(limit, decode_cursor(before))
+    return {
+        "conversations": [conversation_view(c) for c in conversations],
+        "next_cursor": encode_cursor(cursor)
+    }
+
+@app.get("/conversations/{conversation_id}")
+def get_conversation_endpoint(conversation_id: str):
+    return conversation_view(require_conversation(conversation_id))
+
+@app.patch("/conversations/{conversation_id}")
+def rename_conversation_endpoint(conversation_id: str, body: ConversationUpdate):
+    if not rename_conversation(conversation_id, body.name):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation_view(require_conversation(conversation_id))
+
+@app.delete("/conversations/{conversation_id}", status_code=204)
+def delete_conversation_endpoint(conversation_id: str):
+    require_conversation(conversation_id)
+    if not delete_conversation(conversation_id):
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return Response(status_code=204)
+
+@app.get("/conversations/{conversation_id}/messages")
+def list_messages_endpoint(conversation_id: str, limit: int = PageSize, before: Optional[str] = None):
+    require_conversation(conversation_id)
+    messages, cursor = get_message_page(conversation_id, limit, decode_cursor(before))
+    return {"messages": [message_view(m) for m in messages], "next_cursor": encode_cursor(cursor)}
+
+# --- Chat Turns ---
+def build_chat_history(conversation_id, model_name):
+    """Builds the budgeted chat history from the latest page, as the chat page does.
+
+    `model_name` must be a real model (see model_router.history_model), not "auto".
+    """
+    messages, cursor = get_message_page(conversation_id, DEFAULTS["chat_page_size"])
+    summary, summary_until = get_conversation_summary(conversation_id)
+    manager = HistoryManager(
+        model_name,
+        summarize=get_summarizer(model_name),
+        fetch_older=lambda after, before, limit: get_messages(
+            conversation_id, limit=limit, before=before, projection=MESSAGE_PROJECTION, after=after,
+            oldest_first=True
+        ),
+        on_summary=lambda summary, until: save_conversation_summary(conversation_id, summary, until)
+    )
+    state = HistoryState(conversation_id, summary, summary_until)
+    return manager.build(messages, state, has_unloaded_older=bool(cursor))
+
+async def run_turn(conversation_id, prompt, model_name):
+    """Runs one chat turn and yields (event, data) pairs, ending with "done".
+
+    Events are the AgentEvent kinds ("thought", "token", "tool_start",
+    "tool_end", "error") plus "model" when "auto" picks a model. "done"
+    carries the stored assistant message and is only sent once the turn's
+    messages are written, so any worker can serve the next request. The
+    response cache and the router metrics are handled as in the app.
+    """
+    # Python_REPL code of this conversation shares one sandbox namespace
+    current_session_id.set(conversation_id)
+    with span("chat.turn", model=model_name) as turn_span:
+        with span("history.build"):
+            history = await run_in_threadpool(
+                build_chat_history, conversation_id, history_model(model_name, prompt)
+            )
+        await add_message_async(conversation_id, "user", prompt)
+
+        response_cache = get_response_cache()
+        cached = None
+        if response_cache:
+            cached = await run_in_threadpool(response_cache.get, model_name, prompt, history)
+        turn_span.set_attribute("cached", cached is not None)
+        stats, succeeded, used_model = TurnStats(), True, model_name
+        if cached is not None:
+            response_content = cached
+            yield "token", {"content": cached}
+        else:
+            routed_agent = RoutedAgent(get_model_router(), get_agent_registry().get)
+            if model_name == AUTO_MODEL:
+                idle_timeout_s = routed_agent.idle_timeout_s
+            else:
+                idle_timeout_s = SERVER_CONFIG["turn_idle_timeout_s"]
+            response_content, succeeded = "Sorry, no model is available right now.", False
+            inputs = {"input": prompt, "chat_history": history}
+            # Building an executor can block, so the attempts are drawn in the threadpool
+            attempts = iterate_in_threadpool(routed_agent.attempts(prompt, model_name))
+            async for _, used_model, agent_executor in attempts:
+                if model_name == AUTO_MODEL:
+                    yield "model", {"model": used_model}
+
+                stats = TurnStats()
+                answer, final_output, error = "", None, None
+                async for event in astream_agent_events(agent_executor, inputs, stats, idle_timeout_s):
+                    if event.kind == "token":
+                        answer += event.content
+                    elif event.kind == "final":
+                        final_output = event.content
+                        continue
+                    elif event.kind == "error":
+                        error = event.content
+                    yield event.kind, {"content": event.content, "name": event.name}
+
+                succeeded = bool(final_output or answer) and not (error and not final_output)
+                if error and not final_output:
+                    response_content = f"An error occurred during agent processing: {error}"
+                else:
+                    response_content = final_output or answer or 'Sorry, I had trouble processing that.'
+                # Falling back is only safe before the client has seen answer tokens
+                if routed_agent.finish(used_model, stats, succeeded, answered=bool(answer)):
+                    break
+            # Tool results (web search, code) go stale; only self-contained answers are reused
+            if succeeded and response_cache and not stats.tool_calls:
+                await run_in_threadpool(response_cache.put, model_name, prompt, history, response_content)
+
+        assistant_message = await add_message_async(conversation_id, "assistant", response_content)
+    yield "done", {
+        "message": message_view(assistant_message) if assistant_message else {"role": "assistant", "content": response_content},
+        "model": used_model,
+        "cached": cached is not None,
+        "succeeded": succeeded,
+        "time_to_first_token_ms": stats.time_to_first_token_ms,
+        "total_ms": stats.total_ms,
+        "trace_id": turn_span.trace_id
+    }
+
+@app.post("/conversations/{conversation_id}/messages")
+async def post_message_endpoint(conversation_id: str, body: ChatRequest, stream: bool = True):
+    """Sends a user message. Streams the turn as server-sent events, or with stream=false returns the "done" data."""
+    if body.model != AUTO_MODEL:
+        try:
+            resolve_model(body.model)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    await run_in_threadpool(require_conversation, conversation_id)
+    turn = run_turn(conversation_id, body.content, body.model)
+    if not stream:
+        async for event, data in turn:
+            if event == "done":
+                return data
+
+    async def events():
+        try:
+            async for event, data in turn:
+                yield _sse(event, data)
+        finally:
+            await turn.aclose()  # a client that disconnects cancels the agent turn
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- Images ---
+def job_view(job):
+    state, images, errors = job.snapshot()
+    return {
+        "id": job.id,
+        "state": state,
+        "prompt": job.prompt,
+        "style": job.style,
+        "num_images": job.num_images,
+        "completed": sum(1 for image in images if image is not None),
+        "cached": job.cached,
+        "image_ids": list(job.image_ids),
+        "errors": errors
+    }
+
+def require_job(job_id):
+    job = get_image_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return job
+
+@app.post("/images", status_code=202)
+def submit_image_job_endpoint(body: ImageRequest):
+    job = get_image_job_queue().submit(body.prompt, body.num_images, body.style, use_cache=body.use_cache)
+    return job_view(job)
+
+@app.get("/images/{job_id}")
+def get_image_job_endpoint(job_id: str):
+    return job_view(require_job(job_id))
+
+@app.delete("/images/{job_id}")
+def cancel_image_job_endpoint(job_id: str):
+    job = require_job(job_id)
+    get_image_job_queue().cancel(job_id)
+    return job_view(job)
+
+@app.get("/images/{job_id}/{index}")
+def get_job_image_endpoint(job_id: str, index: int):
+    _, images, _ = require_job(job_id).snapshot()
+    if not 0 <= index < len(images) or images[index] is None:
+        raise HTTPException(status_code=404, detail="Image not ready")
+    return Response(images[index], media_type=_image_media_type(images[index]))
+
+@app.get("/image-files/{digest}")
+def get_image_file_endpoint(digest: str, thumbnail: bool = False):
+    """Serves an image of this worker's image store by its digest (a job's image_ids)."""
+    store = get_image_store()
+    data = None
+    if store is not None:
+        data = store.get_thumbnail(digest) if thumbnail else store.get(digest)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(data, media_type=_image_media_type(data), headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        app,
+        host=os.getenv("SERVER_HOST", SERVER_CONFIG["host"]),
+        port=int(os.getenv("SERVER_PORT", SERVER_CONFIG["port"]))
+    )
@@ -0,0 +1,242 @@
+# streaming.py
+import asyncio
+import logging
+import queue
+import time
+from dataclasses import dataclass, field
+from async_runtime import run_coroutine
+from metrics import AGENT_FIRST_TOKEN_SECONDS, AGENT_TURN_SECONDS, AGENT_TURNS
+
+# Marker the react-chat prompt asks the model to put before its answer
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+_DONE = object()
+
+@dataclass
+class AgentEvent:
+    """A single streamed step of an agent turn.
+
+    kind is one of: "thought" (reasoning text), "token" (final answer text),
+    "tool_start", "tool_end", "final" (the executor's complete output) or "error".
+    For errors, name is the exception type ("TimeoutError" for idle timeouts).
+    """
+    kind: str
+    content: str
+    name: str = None
+
+@dataclass
+class TurnStats:
+    """Timing, outcome, LLM usage and tool calls of a single agent turn."""
+    started_at: float = field(default_factory=time.perf_counter)
+    first_token_at: float = None
+    finished_at: float = None
+    error_type: str = None
+    error: str = None
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    tool_calls: int = 0
+
+    @property
+    def time_to_first_token_ms(self):
+        if self.first_token_at is None:
+            return None
+        return (self.first_token_at - self.started_at) * 1000
+
+    @property
+    def total_ms(self):
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at) * 1000
+
+    def summary(self):
+        """Short human readable timing line."""
+        ttft = self.time_to_first_token_ms
+        ttft_text = f"{ttft / 1000:.2f}s" if ttft is not None else "n/a"
+        return f"first token {ttft_text} · total {self.total_ms / 1000:.2f}s"
+
+class _FinalAnswerSplitter:
+    """Splits the streamed text of one LLM call into thought and final answer parts."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        self.thought_pos = 0
+        self.final_pos = None
+
+    def feed(self, chunk):
+        """Adds a chunk and returns the new (kind, text) pieces it completes."""
+        self.text += chunk
+        pieces = []
+        idx = self.text.find(FINAL_ANSWER_MARKER)
+        if idx == -1:
+            # Hold back enough text to catch a marker split across chunks
+            safe = len(self.text) - len(FINAL_ANSWER_MARKER)
+            if safe > self.thought_pos:
+                pieces.append(("thought", self.text[self.thought_pos:safe]))
+                self.thought_pos = safe
+            return pieces
+
+        if idx > self.thought_pos:
+            pieces.append(("thought", self.text[self.thought_pos:idx]))
+            self.thought_pos = idx
+        if self.final_pos is None:
+            start = idx + len(FINAL_ANSWER_MARKER)
+            # Skip the whitespace after the marker, but only once it has arrived
+            while start < len(self.text) and self.text[start].isspace():
+                start += 1
+            if start == len(self.text):
+                return pieces
+            self.final_pos = start
+        if len(self.text) > self.final_pos:
+            pieces.append(("token", self.text[self.final_pos:]))
+            self.final_pos = len(self.text)
+        return pieces
+
+    def flush(self):
+        """Returns any held-back thought text at the end of an LLM call."""
+        pieces = []
+        if self.final_pos is None and len(self.text) > self.thought_pos:
+            pieces.append(("thought", self.text[self.thought_pos:]))
+        self.reset()
+        return pieces
+
+def _chunk_text(chunk):
+    """Extracts the text of a streamed chat or LLM chunk."""
+    content = getattr(chunk, "content", None)
+    if content is None:
+        content = getattr(chunk, "text", chunk)
+    if isinstance(content, list):
+        # Some providers stream a list of content parts
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content if isinstance(content, str) else str(content)
+
+def _record_usage(stats, output):
+    """Counts a finished LLM call and the token usage its message reports."""
+    usage = getattr(output, "usage_metadata", None) or {}
+    stats.llm_calls += 1
+    stats.input_tokens += usage.get("input_tokens", 0)
+    stats.output_tokens += usage.get("output_tokens", 0)
+
+async def _pump_events(agent_executor, inputs, out, stats):
+    """Translates astream_events into AgentEvents on a thread-safe queue, counting LLM usage in `stats`."""
+    splitter = _FinalAnswerSplitter()
+    try:
+        async for event in agent_executor.astream_events(inputs, version="v2"):
+            kind = event["event"]
+            if kind in ("on_chat_model_start", "on_llm_start"):
+                splitter.reset()
+            elif kind in ("on_chat_model_stream", "on_llm_stream"):
+                for piece_kind, text in splitter.feed(_chunk_text(event["data"]["chunk"])):
+                    out.put(AgentEvent(piece_kind, text))
+            elif kind in ("on_chat_model_end", "on_llm_end"):
+                _record_usage(stats, event["data"].get("output"))
+                for piece_kind, text in splitter.flush():
+                    out.put(AgentEvent(piece_kind, text))
+            elif kind == "on_tool_start":
+                out.put(AgentEvent("tool_start", str(event["data"].get("input", "")), name=event["name"]))
+            elif kind == "on_tool_end":
+                out.put(AgentEvent("tool_end", str(event["data"].get("output", "")), name=event["name"]))
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                output = event["data"].get("output") or {}
+                if isinstance(output, dict):
+                    out.put(AgentEvent("final", output.get("output", "")))
+    except Exception as e:
+        logging.exception("Error while streaming agent events:")
+        out.put(AgentEvent("error", str(e), name=type(e).__name__))
+    finally:
+        out.put(_DONE)
+
+class _LoopQueue:
+    """Hands events from the agent loop to an asyncio.Queue of another event loop."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+def _record_event(stats, event):
+    if stats.first_token_at is None and event.kind in ("thought", "token"):
+        stats.first_token_at = time.perf_counter()
+    if event.kind == "tool_start":
+        stats.tool_calls += 1
+    elif event.kind == "error":
+        stats.error_type, stats.error = event.name, event.content
+
+def _idle_timeout_event(stats, idle_timeout_s):
+    event = AgentEvent("error", f"No response for {idle_timeout_s} seconds.", name="TimeoutError")
+    stats.error_type, stats.error = event.name, event.content
+    return event
+
+def _finish_turn(stats):
+    stats.finished_at = time.perf_counter()
+    ttft = stats.time_to_first_token_ms
+    AGENT_TURNS.inc(stats.error_type or "ok")
+    AGENT_TURN_SECONDS.observe(stats.total_ms / 1000)
+    if ttft is not None:
+        AGENT_FIRST_TOKEN_SECONDS.observe(ttft / 1000)
+    logging.info(
+        f"Agent turn finished: time to first token "
+        f"{f'{ttft:.0f} ms' if ttft is not None else 'n/a'}, total {stats.total_ms:.0f} ms"
+    )
+
+def stream_agent_events(agent_executor, inputs, stats=None, idle_timeout_s=None):
+    """Runs one agent turn and yields AgentEvents as they happen.
+
+    The executor runs on the shared agent event loop so the caller (a
+    Streamlit script or the CLI loop) can consume events synchronously.
+    Pass a TurnStats to record time-to-first-token, total time, errors and
+    the LLM calls and tokens of the turn.
+    With `idle_timeout_s`, a turn that produces no event for that long is
+    cancelled and ends with a "TimeoutError" error event. Closing the
+    generator early cancels the turn too.
+    """
+    stats = stats if stats is not None else TurnStats()
+    events = queue.Queue()
+    pump = run_coroutine(_pump_events(agent_executor, inputs, events, stats))
+
+    try:
+        while True:
+            try:
+                event = events.get(timeout=idle_timeout_s)
+            except queue.Empty:
+                yield _idle_timeout_event(stats, idle_timeout_s)
+                break
+            if event is _DONE:
+                break
+            _record_event(stats, event)
+            yield event
+    finally:
+        # Also reached when the caller stops consuming (a Streamlit rerun or
+        # stop, the CLI breaking out); the turn must not keep spending tokens
+        pump.cancel()
+        _finish_turn(stats)
+
+async def astream_agent_events(agent_executor, inputs, stats=None, idle_timeout_s=None):
+    """Async version of stream_agent_events for callers on another event loop (server.py).
+
+    The turn still runs on the shared agent loop. Closing the generator
+    early (e.g. the client disconnected) cancels the turn.
+    """
+    stats = stats if stats is not None else TurnStats()
+    events = _LoopQueue(asyncio.get_running_loop())
+    pump = run_coroutine(_pump_events(agent_executor, inputs, events, stats))
+
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(events.queue.get(), timeout=idle_timeout_s)
+            except asyncio.TimeoutError:
+                yield _idle_timeout_event(stats, idle_timeout_s)
+                break
+            if event is _DONE:
+                break
+            _record_event(stats, event)
+            yield event
+    finally:
+        pump.cancel()
+        _finish_turn(stats)
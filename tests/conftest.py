@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# Make the top-level modules importable when pytest runs from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
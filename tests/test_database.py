@@ -0,0 +1,187 @@
+# test_database.py
+import threading
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import database
+from database import MessageWriteBuffer, _keyset_filter, build_message
+
+CONVERSATION_ID = str(ObjectId())
+
+class FakeStore:
+    """Records inserts; fails while `failing` is set."""
+
+    def __init__(self):
+        self.inserted = []
+        self.batches = []
+        self.failing = False
+        self.lock = threading.Lock()
+
+    def insert_messages(self, messages):
+        if self.failing:
+            raise RuntimeError("write failed")
+        with self.lock:
+            self.batches.append(len(messages))
+            self.inserted.extend(messages)
+
+    def save_message(self, message):
+        self.insert_messages([message])
+        return str(message["_id"])
+
+def make_buffer(store, **kwargs):
+    # The writer thread isn't started; tests flush explicitly
+    return MessageWriteBuffer(lambda: store, **kwargs)
+
+def messages(count, conversation_id=CONVERSATION_ID):
+    return [build_message(conversation_id, "user", f"message {i}") for i in range(count)]
+
+# --- Keyset Filter ---
+def test_keyset_filter_without_cursors():
+    assert _keyset_filter("timestamp") == {}
+
+def test_keyset_filter_before():
+    ts, oid = datetime(2024, 1, 1), ObjectId()
+    assert _keyset_filter("timestamp", before=(ts, str(oid))) == {"$or": [
+        {"timestamp": {"$lt": ts}},
+        {"timestamp": ts, "_id": {"$lt": oid}}
+    ]}
+
+def test_keyset_filter_after():
+    ts, oid = datetime(2024, 1, 1), ObjectId()
+    assert _keyset_filter("created_at", after=(ts, oid)) == {"$or": [
+        {"created_at": {"$gt": ts}},
+        {"created_at": ts, "_id": {"$gt": oid}}
+    ]}
+
+def test_keyset_filter_between():
+    start, end = (datetime(2024, 1, 1), ObjectId()), (datetime(2024, 1, 2), ObjectId())
+    result = _keyset_filter("timestamp", before=end, after=start)
+    assert result == {"$and": [
+        _keyset_filter("timestamp", before=end),
+        _keyset_filter("timestamp", after=start)
+    ]}
+
+# --- Write Buffer ---
+def test_flush_writes_in_order_and_clears_pending():
+    store = FakeStore()
+    buffer = make_buffer(store)
+    batch = messages(5)
+    for message in batch:
+        assert buffer.enqueue(message)
+    assert buffer.has_pending(CONVERSATION_ID)
+
+    assert buffer.flush()
+    assert store.inserted == batch
+    assert store.batches == [5]
+    assert not buffer.has_pending(CONVERSATION_ID)
+    assert buffer.queue_depth == 0
+
+def test_failed_flush_requeues_batch_in_front():
+    store = FakeStore()
+    buffer = make_buffer(store)
+    first, second = messages(3), messages(2)
+    for message in first:
+        buffer.enqueue(message)
+
+    store.failing = True
+    assert not buffer.flush()
+    assert buffer.failed_flushes == 1
+    assert buffer.has_pending(CONVERSATION_ID)
+
+    for message in second:
+        buffer.enqueue(message)
+    store.failing = False
+    assert buffer.flush()
+    assert store.inserted == first + second
+
+def test_enqueue_refuses_beyond_max_queue_size():
+    buffer = make_buffer(FakeStore(), max_queue_size=3)
+    assert all(buffer.enqueue(message) for message in messages(3))
+    assert not buffer.enqueue(messages(1)[0])
+    assert buffer.sync_fallbacks == 1
+
+def test_batch_in_flight_counts_toward_max_queue_size():
+    store = FakeStore()
+    buffer = make_buffer(store, max_queue_size=3)
+    entered, release = threading.Event(), threading.Event()
+    insert = store.insert_messages
+
+    def slow_insert(batch):
+        entered.set()
+        release.wait(5)
+        insert(batch)
+
+    store.insert_messages = slow_insert
+    for message in messages(3):
+        buffer.enqueue(message)
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    try:
+        assert entered.wait(5)
+        # The queue is empty, but the 3 messages being written still take up room
+        assert buffer.queue_depth == 0
+        assert not buffer.enqueue(messages(1)[0])
+    finally:
+        release.set()
+        flusher.join(5)
+    assert buffer.enqueue(messages(1)[0])
+
+def test_stopped_buffer_refuses_and_flushes():
+    store = FakeStore()
+    buffer = make_buffer(store).start()
+    batch = messages(2)
+    for message in batch:
+        buffer.enqueue(message)
+    buffer.stop()
+    assert store.inserted == batch
+    assert not buffer.enqueue(messages(1)[0])
+
+def test_writer_thread_flushes_full_batches():
+    store = FakeStore()
+    buffer = make_buffer(store, batch_size=4, flush_interval_s=60).start()
+    try:
+        for message in messages(4):
+            buffer.enqueue(message)
+        for _ in range(100):
+            if store.inserted:
+                break
+            threading.Event().wait(0.05)
+        assert store.batches == [4]
+    finally:
+        buffer.stop()
+
+# --- add_message ---
+@pytest.fixture
+def patched_db(monkeypatch):
+    store = FakeStore()
+    buffer = make_buffer(store, max_queue_size=2)
+    monkeypatch.setattr(database, "get_store", lambda: store)
+    monkeypatch.setattr(database, "get_message_buffer", lambda: buffer)
+    return store, buffer
+
+def test_add_message_is_buffered(patched_db):
+    store, buffer = patched_db
+    view = database.add_message(CONVERSATION_ID, "user", "hi")
+    assert view["content"] == "hi" and view["role"] == "user"
+    assert store.inserted == []
+    assert buffer.has_pending(CONVERSATION_ID)
+
+def test_add_message_fallback_writes_queued_messages_first(patched_db):
+    store, buffer = patched_db
+    contents = ["one", "two", "three"]
+    for content in contents:
+        assert database.add_message(CONVERSATION_ID, "user", content)
+    # The third didn't fit in the queue and was written directly, after the first two
+    assert [message["content"] for message in store.inserted] == contents
+
+def test_add_message_fallback_fails_if_queued_messages_cannot_be_written(patched_db):
+    store, buffer = patched_db
+    database.add_message(CONVERSATION_ID, "user", "one")
+    database.add_message(CONVERSATION_ID, "user", "two")
+    store.failing = True
+    assert database.add_message(CONVERSATION_ID, "user", "three") is False
+    store.failing = False
+    assert buffer.flush()
+    assert [message["content"] for message in store.inserted] == ["one", "two"]
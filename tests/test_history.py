@@ -0,0 +1,90 @@
+# test_history.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from config.constants import HISTORY_CONFIG
+from database import message_cursor
+from history import HistoryManager, HistoryState
+
+START = datetime(2024, 1, 1)
+
+def make_messages(count):
+    return [
+        {
+            "_id": f"{i:024x}",
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i}",
+            "timestamp": START + timedelta(seconds=i)
+        }
+        for i in range(count)
+    ]
+
+class Conversation:
+    """Stored messages, a fetch_older over them and a summarizer recording what it folds."""
+
+    def __init__(self, count):
+        self.messages = make_messages(count)
+        self.folded = []
+
+    def fetch_older(self, after, before, limit):
+        gap = [
+            msg for msg in self.messages
+            if (after is None or message_cursor(msg) > after) and message_cursor(msg) < before
+        ]
+        return [dict(msg) for msg in gap[:limit]]
+
+    def summarize(self, previous_summary, messages):
+        self.folded.extend(msg["content"] for msg in messages)
+        return f"summary of {len(self.folded)} messages"
+
+@pytest.fixture
+def catchup_limit(monkeypatch):
+    monkeypatch.setitem(HISTORY_CONFIG, "max_catchup_messages", 8)
+    return 8
+
+def build(conversation, state, loaded=5):
+    manager = HistoryManager("test-model", summarize=conversation.summarize, fetch_older=conversation.fetch_older)
+    return manager.build(conversation.messages[-loaded:], state, has_unloaded_older=True)
+
+def test_catch_up_folds_small_gap_in_one_turn(catchup_limit):
+    conversation = Conversation(10)
+    state = HistoryState()
+    build(conversation, state)
+    assert conversation.folded == [f"message {i}" for i in range(5)]
+    assert state.caught_up
+    assert state.summary_until == message_cursor(conversation.messages[4])
+
+def test_catch_up_resumes_gap_larger_than_limit(catchup_limit):
+    conversation = Conversation(25)
+    state = HistoryState()
+
+    build(conversation, state)
+    assert conversation.folded == [f"message {i}" for i in range(8)]
+    assert not state.caught_up
+
+    build(conversation, state)
+    build(conversation, state)
+    assert conversation.folded == [f"message {i}" for i in range(20)]
+    assert state.summary_until == message_cursor(conversation.messages[19])
+    assert state.caught_up
+
+def test_catch_up_stops_on_gap_of_exactly_limit(catchup_limit):
+    conversation = Conversation(13)
+    state = HistoryState()
+    build(conversation, state)
+    build(conversation, state)
+    assert conversation.folded == [f"message {i}" for i in range(8)]
+    assert state.caught_up
+
+def test_catch_up_starts_after_stored_summary(catchup_limit):
+    conversation = Conversation(15)
+    state = HistoryState(summary="earlier", summary_until=message_cursor(conversation.messages[5]))
+    build(conversation, state)
+    assert conversation.folded == [f"message {i}" for i in range(6, 10)]
+
+def test_history_keeps_loaded_messages_verbatim_after_summary(catchup_limit):
+    conversation = Conversation(10)
+    history = build(conversation, HistoryState())
+    assert history[0].content.startswith("Summary of the earlier conversation:")
+    assert [msg.content for msg in history[1:]] == [f"message {i}" for i in range(5, 10)]
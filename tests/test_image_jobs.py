@@ -0,0 +1,161 @@
+# test_image_jobs.py
+import threading
+
+from image_jobs import ImageJobQueue
+from image_store import ImageStore
+
+def fake_predict(prompt, count, style):
+    return [f"{prompt}-{style}-{i}".encode() for i in range(count)]
+
+def wait_done(job, timeout=5):
+    """Waits for every sub-request, including the generation save after the last one."""
+    for future in job.futures:
+        future.result(timeout)
+    assert not job.active
+
+class FakeGenerations:
+    """In-memory stand-in for the image_generations collection."""
+
+    def __init__(self):
+        self.saved = {}
+
+    def find(self, key):
+        return self.saved.get(key)
+
+    def save(self, key, prompt, style, model, params, image_ids):
+        self.saved[key] = {"image_ids": image_ids}
+
+def make_queue(tmp_path, predict=fake_predict, **kwargs):
+    generations = FakeGenerations()
+    queue = ImageJobQueue(
+        predict=predict,
+        process=lambda response: iter(response),
+        store=ImageStore(str(tmp_path), max_bytes=10**6, thumbnail_px=64),
+        find_generation=generations.find,
+        save_generation=generations.save,
+        **kwargs
+    )
+    return queue, generations
+
+# --- Job Queue ---
+def test_job_is_split_into_sub_requests(tmp_path):
+    calls = []
+
+    def predict(prompt, count, style):
+        calls.append(count)
+        return fake_predict(prompt, count, style)
+
+    queue, _ = make_queue(tmp_path, predict=predict, images_per_request=2)
+    job = queue.submit("cat", 5, "Realistic")
+    wait_done(job)
+    assert sorted(calls) == [1, 2, 2]
+    assert job.state == "done"
+    assert job.completed == 5
+    assert all(image_id for image_id in job.image_ids)
+
+def test_images_land_in_request_order(tmp_path):
+    def predict(prompt, count, style):
+        return [f"{prompt}-{count}-{i}".encode() for i in range(count)]
+
+    queue, _ = make_queue(tmp_path, predict=predict, images_per_request=2)
+    job = queue.submit("dog", 3, "Realistic")
+    wait_done(job)
+    _, images, errors = job.snapshot()
+    assert errors == []
+    assert images == [b"dog-2-0", b"dog-2-1", b"dog-1-0"]
+
+def test_failed_sub_request_keeps_other_images(tmp_path):
+    calls = []
+
+    def predict(prompt, count, style):
+        calls.append(count)
+        if len(calls) == 1:
+            raise RuntimeError("quota exceeded")
+        return fake_predict(prompt, count, style)
+
+    queue, _ = make_queue(tmp_path, predict=predict, images_per_request=1, max_concurrent_requests=1)
+    job = queue.submit("bird", 2, "Realistic")
+    wait_done(job)
+    assert job.state == "done"
+    assert job.completed == 1
+    assert job.errors == ["quota exceeded"]
+
+def test_job_fails_without_images(tmp_path):
+    queue, generations = make_queue(tmp_path, predict=lambda prompt, count, style: [])
+    job = queue.submit("fish", 1, "Realistic")
+    wait_done(job)
+    assert job.state == "failed"
+    assert generations.saved == {}
+
+def test_second_request_is_served_from_the_store(tmp_path):
+    calls = []
+
+    def predict(prompt, count, style):
+        calls.append(count)
+        return fake_predict(prompt, count, style)
+
+    queue, _ = make_queue(tmp_path, predict=predict)
+    first = queue.submit("tree", 2, "Realistic")
+    wait_done(first)
+    second = queue.submit("tree", 2, "Realistic")
+    assert second.cached and second.state == "done"
+    assert second.images == first.images
+    assert len(calls) == 1
+
+    third = queue.submit("tree", 2, "Realistic", use_cache=False)
+    wait_done(third)
+    assert not third.cached
+    assert len(calls) == 2
+
+def test_cancel_drops_sub_requests_that_have_not_started(tmp_path):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def predict(prompt, count, style):
+        calls.append(count)
+        started.set()
+        release.wait(5)
+        return fake_predict(prompt, count, style)
+
+    queue, generations = make_queue(tmp_path, predict=predict, images_per_request=1, max_concurrent_requests=1)
+    job = queue.submit("moon", 3, "Realistic")
+    assert started.wait(5)
+    assert queue.cancel(job.id)
+    release.set()
+    for future in job.futures:
+        if not future.cancelled():
+            future.result(5)
+    assert job.state == "cancelled"
+    assert calls == [1]
+    assert job.completed == 0
+    assert generations.saved == {}
+    assert not queue.cancel(job.id)
+
+def test_finished_jobs_are_pruned_beyond_max_jobs(tmp_path):
+    queue, _ = make_queue(tmp_path, max_jobs=2)
+    jobs = []
+    for i in range(4):
+        job = queue.submit(f"prompt {i}", 1, "Realistic")
+        wait_done(job)
+        jobs.append(job)
+    assert queue.get(jobs[0].id) is None
+    assert queue.get(jobs[-1].id) is jobs[-1]
+
+# --- Image Store ---
+def test_store_evicts_least_recently_used(tmp_path):
+    store = ImageStore(str(tmp_path), max_bytes=250, thumbnail_px=64)
+    first = store.put(b"a" * 100)
+    second = store.put(b"b" * 100)
+    store.get(first)  # first is now the most recently used
+    third = store.put(b"c" * 100)
+    assert store.contains(first) and store.contains(third)
+    assert not store.contains(second)
+    assert store.get(second) is None
+    assert store.evictions == 1
+
+def test_store_index_is_rebuilt_from_disk(tmp_path):
+    store = ImageStore(str(tmp_path), max_bytes=10**6, thumbnail_px=64)
+    digest = store.put(b"image bytes")
+    assert store.put(b"image bytes") == digest
+    reopened = ImageStore(str(tmp_path), max_bytes=10**6, thumbnail_px=64)
+    assert reopened.get(digest) == b"image bytes"
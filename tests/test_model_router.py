@@ -0,0 +1,85 @@
+# test_model_router.py
+import pytest
+
+from config.constants import MODEL_ROUTER_CONFIG
+from model_router import ModelRouter, RoutedAgent, classify_prompt
+from streaming import TurnStats
+
+MODELS = ["gemini-1.5-flash", "gemma", "gemini-1.5-pro", "deepseek-coder"]
+
+def turn_stats(error_type=None, error=None, total_ms=100.0):
+    stats = TurnStats(error_type=error_type, error=error)
+    stats.finished_at = stats.started_at + total_ms / 1000
+    return stats
+
+@pytest.fixture
+def router():
+    return ModelRouter(models=MODELS)
+
+# --- Prompt Classification ---
+@pytest.mark.parametrize("prompt, category", [
+    ("hi there", "chat"),
+    ("why does my python script raise a KeyError?", "code"),
+    ("```\nprint(1)\n```", "code"),
+    ("Explain the main causes of the French revolution and how they relate to the economic situation of the time", "general"),
+])
+def test_classify_prompt(prompt, category):
+    assert classify_prompt(prompt) == category
+
+# --- Router ---
+def test_route_follows_category_preferences(router):
+    category, candidates = router.route("hi")
+    assert category == "chat"
+    assert candidates == MODEL_ROUTER_CONFIG["routes"]["chat"][:MODEL_ROUTER_CONFIG["max_attempts"]]
+
+def test_rate_limited_model_moves_to_the_back(router):
+    router.record("gemini-1.5-flash", None, "RateLimitError", "429 Too Many Requests")
+    _, candidates = router.route("hi")
+    assert candidates[0] == "gemma"
+    assert "gemini-1.5-flash" not in candidates[:2]
+
+# --- Routed Agent ---
+def run_turn(routed_agent, prompt, outcomes, model_name="auto"):
+    """Drives routed_agent like the frontends do; `outcomes` maps model -> (stats, succeeded)."""
+    tried = []
+    for _, candidate, executor in routed_agent.attempts(prompt, model_name):
+        tried.append(candidate)
+        stats, succeeded = outcomes[candidate]
+        if routed_agent.finish(candidate, stats, succeeded):
+            break
+    return tried
+
+def test_routed_agent_falls_back_on_timeouts(router):
+    routed_agent = RoutedAgent(router, get_executor=lambda model: f"executor:{model}")
+    tried = run_turn(routed_agent, "hi", {
+        "gemini-1.5-flash": (turn_stats("TimeoutError", "no response"), False),
+        "gemma": (turn_stats(), True),
+    })
+    assert tried == ["gemini-1.5-flash", "gemma"]
+    assert {m["model"]: m["requests"] for m in router.metrics()}["gemma"] == 1
+
+def test_routed_agent_stops_on_non_retryable_errors(router):
+    routed_agent = RoutedAgent(router, get_executor=lambda model: model)
+    tried = run_turn(routed_agent, "hi", {
+        "gemini-1.5-flash": (turn_stats("ValueError", "bad output"), False),
+    })
+    assert tried == ["gemini-1.5-flash"]
+
+def test_routed_agent_does_not_fall_back_after_answer_text(router):
+    routed_agent = RoutedAgent(router, get_executor=lambda model: model)
+    assert routed_agent.finish("gemma", turn_stats("TimeoutError", "stalled"), False, answered=True)
+
+def test_routed_agent_skips_models_without_executor(router):
+    def get_executor(model):
+        if model == "gemini-1.5-flash":
+            raise ValueError("GOOGLE_API_KEY not found")
+        return model
+
+    routed_agent = RoutedAgent(router, get_executor)
+    attempts = list(routed_agent.attempts("hi"))
+    assert [model for _, model, _ in attempts] == ["gemma", "gemini-1.5-pro"]
+    assert {m["model"]: m["requests"] for m in router.metrics()}["gemini-1.5-flash"] == 1
+
+def test_routed_agent_tries_a_fixed_model_alone(router):
+    routed_agent = RoutedAgent(router, get_executor=lambda model: model)
+    assert list(routed_agent.attempts("hi", "deepseek-coder")) == [(None, "deepseek-coder", "deepseek-coder")]
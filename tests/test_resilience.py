@@ -0,0 +1,168 @@
+# test_resilience.py
+import threading
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, is_transient
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", fake)
+    return fake
+
+# --- Circuit Breaker ---
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout_s=10)
+    for _ in range(2):
+        breaker.check()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout_s=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_breaker_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.check()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+def test_breaker_trial_success_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.check()
+
+def test_breaker_trial_failure_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout_s=10)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 10
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+def test_breaker_replaces_trial_that_never_reports(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.check()
+    clock.now += 10
+    breaker.check()
+    assert breaker.state == "half_open"
+
+def test_breaker_release_keeps_half_open(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.check()
+    breaker.release()
+    assert breaker.state == "half_open"
+    breaker.check()
+
+def test_breaker_release_keeps_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout_s=10)
+    breaker.record_failure()
+    breaker.release()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+# --- Retry Classification ---
+class RateLimitError(Exception):
+    pass
+
+class BadRequestError(Exception):
+    pass
+
+@pytest.mark.parametrize("error", [
+    TimeoutError("call timed out"),
+    ConnectionResetError("connection reset by peer"),
+    RateLimitError("slow down"),
+    Exception("429 Too Many Requests"),
+    Exception("503 Service Unavailable"),
+    Exception("Error code: 502 - bad gateway"),
+    Exception("upstream returned status code: 504"),
+])
+def test_transient_errors(error):
+    assert is_transient(error)
+
+@pytest.mark.parametrize("error", [
+    BadRequestError("Error code: 400 - invalid request"),
+    ValueError("max_tokens must be <= 512"),
+    Exception("prompt has 5030 tokens, more than the limit"),
+    Exception("501 Not Implemented"),
+    Exception("invalid API key: check the connection settings"),
+    Exception("model is unavailable in your region"),
+])
+def test_permanent_errors(error):
+    assert not is_transient(error)
+
+class _Breaker:
+    def __init__(self):
+        self.events = []
+
+    def record_success(self):
+        self.events.append("success")
+
+    def release(self):
+        self.events.append("release")
+
+    def record_failure(self):
+        self.events.append("failure")
+
+def _should_retry(error, attempt=0, max_retries=2):
+    model = type("Model", (), {})()
+    model.breaker = _Breaker()
+    model.provider = "test"
+    model.policy = {"max_retries": max_retries, "backoff_base_s": 0, "backoff_max_s": 0}
+    return resilience.ResilientChatModel._should_retry(model, error, attempt), model.breaker.events
+
+def test_permanent_error_is_not_retried_and_leaves_breaker():
+    assert _should_retry(BadRequestError("Error code: 400")) == (False, ["release"])
+
+def test_transient_error_is_retried_and_counts_as_failure():
+    assert _should_retry(Exception("503 Service Unavailable")) == (True, ["failure"])
+
+def test_transient_error_is_not_retried_past_max_retries():
+    assert _should_retry(Exception("503 Service Unavailable"), attempt=2) == (False, ["failure"])
+
+def test_open_circuit_is_not_retried():
+    assert _should_retry(CircuitOpenError("open")) == (False, [])
+
+# --- Shared Counters ---
+def test_count_is_thread_safe():
+    provider = "test-count"
+    threads = [
+        threading.Thread(target=lambda: [resilience._count(provider, "retries") for _ in range(2000)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert resilience.get_resilience_stats()[provider]["retries"] == 16000
@@ -0,0 +1,57 @@
+# test_streaming.py
+from streaming import FINAL_ANSWER_MARKER, _FinalAnswerSplitter
+
+def split(chunks):
+    """Feeds chunks to a fresh splitter; returns the joined thought and token text."""
+    splitter = _FinalAnswerSplitter()
+    pieces = []
+    for chunk in chunks:
+        pieces.extend(splitter.feed(chunk))
+    pieces.extend(splitter.flush())
+    thought = "".join(text for kind, text in pieces if kind == "thought")
+    tokens = "".join(text for kind, text in pieces if kind == "token")
+    return thought, tokens
+
+def test_thought_only():
+    thought, tokens = split(["Thought: I need ", "to search.\nAction: web_search"])
+    assert thought == "Thought: I need to search.\nAction: web_search"
+    assert tokens == ""
+
+def test_final_answer_in_one_chunk():
+    thought, tokens = split(["Thought: done\nFinal Answer: 42"])
+    assert thought == "Thought: done\n"
+    assert tokens == "42"
+
+def test_marker_split_across_chunks():
+    text = "Thought: done\nFinal Answer: Paris is the capital."
+    # Every split point, including ones inside the marker
+    for i in range(1, len(text)):
+        thought, tokens = split([text[:i], text[i:]])
+        assert thought == "Thought: done\n"
+        assert tokens == "Paris is the capital."
+
+def test_marker_fed_character_by_character():
+    thought, tokens = split(list("I know it.\nFinal Answer:   yes"))
+    assert thought == "I know it.\n"
+    assert tokens == "yes"
+
+def test_whitespace_after_marker_is_held_until_text_arrives():
+    splitter = _FinalAnswerSplitter()
+    assert splitter.feed(FINAL_ANSWER_MARKER) == []
+    assert splitter.feed("  ") == []
+    assert splitter.feed("ok") == [("token", "ok")]
+
+def test_answer_streams_incrementally():
+    splitter = _FinalAnswerSplitter()
+    splitter.feed("Final Answer: one")
+    assert splitter.feed(" two") == [("token", " two")]
+    assert splitter.feed(" three") == [("token", " three")]
+
+def test_flush_resets_between_llm_calls():
+    splitter = _FinalAnswerSplitter()
+    splitter.feed("Final Answer: first")
+    assert splitter.flush() == []
+    text = "Thought: second call, long enough"
+    held = len(FINAL_ANSWER_MARKER)
+    assert splitter.feed(text) == [("thought", text[:-held])]
+    assert splitter.flush() == [("thought", text[-held:])]
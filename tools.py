@@ -1,14 +1,56 @@
 # tools.py
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_experimental.tools import PythonREPLTool
+import atexit
+import re
+import threading
+from langchain_core.tools import BaseTool
+from sandbox import SandboxPool
+from web_search import WebSearchTool, get_search_service
+from tracing import span
+from metrics import TOOL_CALLS, TOOL_SECONDS, track
+from config.constants import SANDBOX_CONFIG
 
 # Initialize the search tool
 # name parameter is important for the agent to identify the tool
-search_tool = DuckDuckGoSearchRun(name="WebSearch")
+# Results are cached, identical in-flight queries are shared, and calls are
+# rate limited with a hard timeout (see web_search.py)
+search_tool = WebSearchTool(service=get_search_service())
+
+# --- Sandboxed Python ---
+_sandbox_pool = None
+_sandbox_lock = threading.Lock()
+
+def get_sandbox_pool():
+    """Returns the shared sandbox pool, spawning its workers on first use."""
+    global _sandbox_pool
+    with _sandbox_lock:
+        if _sandbox_pool is None:
+            _sandbox_pool = SandboxPool(**SANDBOX_CONFIG)
+            atexit.register(_sandbox_pool.close)
+        return _sandbox_pool
+
+class SandboxedPythonTool(BaseTool):
+    """Python REPL tool that runs code in the sandbox pool instead of the app process."""
+
+    name: str = "Python_REPL"
+    description: str = (
+        "A Python shell. Use this to execute python commands. Input should be a valid python command. "
+        "If you want to see the output of a value, you should print it out with `print(...)`. "
+        "Variables persist between calls within the same conversation."
+    )
+
+    def _run(self, query: str, run_manager=None) -> str:
+        # Strip markdown code fences the LLM often wraps code in
+        code = re.sub(r"^(\s|`)*(?i:python(?=\s))?\s*", "", query)
+        code = re.sub(r"(\s|`)*$", "", code)
+        with span(f"tool.{self.name}", code_chars=len(code)) as tool_span, track(TOOL_CALLS, TOOL_SECONDS, self.name):
+            result = get_sandbox_pool().run(code)
+            tool_span.set_attribute("output_chars", len(result["output"]))
+        return result["output"]
 
 # Initialize the Python REPL tool
-# This provides the agent the ability to execute Python code
-python_repl_tool = PythonREPLTool()
+# This provides the agent the ability to execute Python code, in separate
+# worker processes with CPU, memory, wall-clock and output limits (see sandbox.py)
+python_repl_tool = SandboxedPythonTool()
 
 # Create a list of tools that the agent can use
 # Now includes both WebSearch and PythonREPL
@@ -17,4 +59,4 @@ agent_tools = [search_tool, python_repl_tool]
 # You can add more tools here later and append them to the agent_tools list
 # from langchain.tools import ...
 # my_other_tool = ...
-# agent_tools.append(my_other_tool)
\ No newline at end of file
+# agent_tools.append(my_other_tool)
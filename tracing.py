@@ -0,0 +1,309 @@
+# tracing.py
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from config.constants import TRACING_CONFIG
+
+# OTLP span kind and status codes
+SPAN_KIND_INTERNAL = 1
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_STOP = object()
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def stage_summary(durations_by_stage):
+    """Returns count, p50, p95 and max (ms) per stage from {stage: [duration_ms, ...]}, slowest p95 first."""
+    stats = []
+    for stage, durations in durations_by_stage.items():
+        durations = sorted(durations)
+        if durations:
+            stats.append({
+                "stage": stage,
+                "count": len(durations),
+                "p50_ms": _percentile(durations, 0.5),
+                "p95_ms": _percentile(durations, 0.95),
+                "max_ms": durations[-1]
+            })
+    return sorted(stats, key=lambda s: s["p95_ms"], reverse=True)
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class Span:
+    """One timed operation. Spans of a turn share its trace_id; parent_id links them into a tree."""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        """Ends the span and hands it to the tracer. Later calls are ignored."""
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._on_end(self)
+
+    @property
+    def duration_ms(self):
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self):
+        """Returns the span in OTLP/JSON encoding."""
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_UNSET}
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+class Tracer:
+    """Creates spans and keeps recent traces and per-stage durations in memory.
+
+    The current span lives in a contextvar, so nested `span()` blocks form a
+    tree across function calls, asyncio tasks and copied contexts; threads
+    started without the caller's context begin a new trace. Finished spans
+    are handed to `exporter` without blocking the caller.
+    """
+
+    def __init__(self, exporter=None, enabled=True,
+                 max_traces=TRACING_CONFIG["max_traces"], stage_samples=TRACING_CONFIG["stage_samples"]):
+        self.exporter = exporter
+        self.enabled = enabled
+        self.max_traces = max_traces
+        self.stage_samples = stage_samples
+        self._traces = OrderedDict()  # trace_id -> finished spans, oldest trace first
+        self._stages = {}  # span name -> recent durations in ms
+        self._lock = threading.Lock()
+
+    def start_span(self, name, parent=None, **attributes):
+        """Starts a span without making it current; the caller must end() it.
+
+        The parent defaults to the current span. Use this for spans that
+        outlive a block, like streams and background jobs.
+        """
+        return Span(self, name, parent if parent is not None else _current_span.get(), attributes)
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        """Times the block as a span and makes it current for the spans started inside."""
+        span = self.start_span(name, parent, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def _on_end(self, span):
+        if not self.enabled:
+            return
+        with self._lock:
+            trace = self._traces.get(span.trace_id)
+            if trace is None:
+                trace = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            trace.append(span)
+            durations = self._stages.get(span.name)
+            if durations is None:
+                durations = self._stages[span.name] = deque(maxlen=self.stage_samples)
+            durations.append(span.duration_ms)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def get_trace(self, trace_id):
+        """Returns the finished spans of a trace in start order ([] once it has been evicted)."""
+        with self._lock:
+            spans = list(self._traces.get(trace_id, ()))
+        return sorted(spans, key=lambda span: span.start_ns)
+
+    def stage_stats(self):
+        """Returns p50/p95 per span name over the recent spans (see stage_summary)."""
+        with self._lock:
+            durations = {name: list(values) for name, values in self._stages.items()}
+        return stage_summary(durations)
+
+class SpanExporter:
+    """Exports finished spans as OTLP/JSON from a background thread.
+
+    Each batch is one ExportTraceServiceRequest: appended as a line to
+    `path` (the format the collector's otlpjsonfile receiver reads) and,
+    with an `endpoint`, POSTed to that OTLP/HTTP traces URL. Once the file
+    would grow past `max_file_mb` it is moved to `<path>.1`, replacing the
+    previous backup, so the disk use stays under twice the cap. When the
+    queue is full new spans are dropped and counted rather than blocking callers.
+    """
+
+    def __init__(self, path=None, endpoint=None, service_name=TRACING_CONFIG["service_name"],
+                 max_queue=TRACING_CONFIG["max_queue"], batch_size=TRACING_CONFIG["batch_size"],
+                 flush_interval_s=TRACING_CONFIG["flush_interval_s"], max_file_mb=TRACING_CONFIG["max_file_mb"]):
+        self.path = path
+        self.max_file_bytes = int(max_file_mb * 1024 * 1024)
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.exported = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stop = [first], False
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def encode(self, spans):
+        """Returns the ExportTraceServiceRequest JSON body for a batch of spans."""
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [span.to_otlp() for span in spans]}]
+        }]}, separators=(",", ":"), default=str)
+
+    def _write(self, batch):
+        body = self.encode(batch)
+        try:
+            if self.path:
+                self._append(body + "\n")
+            if self.endpoint:
+                request = urllib.request.Request(
+                    self.endpoint, data=body.encode("utf-8"), headers={"Content-Type": "application/json"}
+                )
+                with urllib.request.urlopen(request, timeout=5):
+                    pass
+            self.exported += len(batch)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Could not export {len(batch)} spans: {e}")
+
+    def _append(self, line):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(line.encode("utf-8")) > self.max_file_bytes:
+            os.replace(self.path, f"{self.path}.1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def close(self, timeout=5):
+        """Flushes the queued spans and stops the export thread."""
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": self._queue.qsize()
+        }
+
+# --- Shared Tracer ---
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def _create_exporter():
+    path = os.getenv("TRACE_EXPORT_PATH", TRACING_CONFIG["export_path"])
+    endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", TRACING_CONFIG["otlp_endpoint"])
+    if not (path or endpoint):
+        return None
+    exporter = SpanExporter(path=path, endpoint=endpoint)
+    atexit.register(exporter.close)
+    logging.info(f"Exporting spans to {' and '.join(target for target in (path, endpoint) if target)}")
+    return exporter
+
+def get_tracer():
+    """Returns the shared tracer, starting its exporter on first use."""
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            enabled = TRACING_CONFIG["enabled"]
+            _tracer = Tracer(exporter=_create_exporter() if enabled else None, enabled=enabled)
+    return _tracer
+
+def span(name, parent=None, **attributes):
+    """Context manager timing a block as a span of the current trace (see Tracer.span)."""
+    return get_tracer().span(name, parent, **attributes)
+
+def start_span(name, parent=None, **attributes):
+    """Starts a span that the caller ends (see Tracer.start_span)."""
+    return get_tracer().start_span(name, parent, **attributes)
+
+def current_span():
+    """Returns the current span, or None outside of any span."""
+    return _current_span.get()
@@ -0,0 +1,218 @@
+# web_search.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from langchain_core.tools import BaseTool
+from tracing import span
+from metrics import CACHE_LOOKUPS, TOOL_CALLS, TOOL_SECONDS, track
+from config.constants import WEB_SEARCH_CONFIG
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` saved up."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Takes one token, waiting up to `timeout` seconds. Returns False if none became available."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl_s` seconds."""
+
+    def __init__(self, ttl_s, max_entries):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if time.monotonic() > expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl_s)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+class DuckDuckGoBackend:
+    """Search backend using DuckDuckGo (the original WebSearch tool's backend)."""
+
+    def __init__(self):
+        from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+        self._wrapper = DuckDuckGoSearchAPIWrapper()
+
+    def search(self, query):
+        return self._wrapper.run(query)
+
+class SearchService:
+    """Cached, coalescing, rate-limited front for a search backend.
+
+    - Results are cached for `cache_ttl_s`, keyed on the normalized query.
+    - Identical queries already in flight share one backend call.
+    - Backend calls are limited by a process-wide token bucket.
+    - Each search has a hard `timeout_s`; a slow backend call keeps running
+      in the pool but the caller gets a timeout message instead of stalling.
+    """
+
+    def __init__(self, backend, cache_ttl_s=WEB_SEARCH_CONFIG["cache_ttl_s"],
+                 cache_max_entries=WEB_SEARCH_CONFIG["cache_max_entries"],
+                 rate_per_s=WEB_SEARCH_CONFIG["rate_per_s"], burst=WEB_SEARCH_CONFIG["burst"],
+                 timeout_s=WEB_SEARCH_CONFIG["timeout_s"], max_workers=WEB_SEARCH_CONFIG["max_workers"]):
+        self.backend = backend
+        self.timeout_s = timeout_s
+        self._cache = TTLCache(cache_ttl_s, cache_max_entries)
+        self._bucket = TokenBucket(rate_per_s, burst)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.backend_calls = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    @staticmethod
+    def _normalize(query):
+        return " ".join(query.split()).casefold()
+
+    def search(self, query):
+        """Returns the result text for one query, or a short error message."""
+        return self._result(query, self._submit(query), time.monotonic() + self.timeout_s)
+
+    def _submit(self, query):
+        """Returns a future for the query's result: cached, already in flight, or newly fetched on the pool."""
+        key = self._normalize(query)
+        cached = self._cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.cache_hits += 1
+            CACHE_LOOKUPS.inc("web_search", "hit")
+            future = Future()
+            future.set_result(cached)
+            return future
+        CACHE_LOOKUPS.inc("web_search", "miss")
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self._pool.submit(self._fetch, key, query, future)
+        return future
+
+    def _result(self, query, future, deadline):
+        """Waits for a search future until `deadline` (time.monotonic())."""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logging.warning(f"Web search timed out after {self.timeout_s}s: {query}")
+            return f"Search timed out after {self.timeout_s} seconds."
+        except Exception as e:
+            return f"Search failed: {e}"
+
+    def _fetch(self, key, query, future):
+        """Runs one backend call (after a rate token) and resolves the shared future."""
+        try:
+            if not self._bucket.acquire(self.timeout_s):
+                with self._lock:
+                    self.rate_limited += 1
+                raise RuntimeError("rate limit reached, try again later")
+            with self._lock:
+                self.backend_calls += 1
+            result = self.backend.search(query)
+            self._cache.set(key, result)
+            future.set_result(result)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logging.error(f"Web search failed for '{query}': {e}")
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def search_many(self, queries):
+        """Runs several queries concurrently. Returns results in input order."""
+        # Backend calls run on the shared pool; this thread only waits for them
+        deadline = time.monotonic() + self.timeout_s
+        futures = [self._submit(query) for query in queries]
+        return [self._result(query, future, deadline) for query, future in zip(queries, futures)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cache_hits": self.cache_hits,
+                "coalesced": self.coalesced,
+                "backend_calls": self.backend_calls,
+                "timeouts": self.timeouts,
+                "rate_limited": self.rate_limited,
+                "errors": self.errors
+            }
+
+class WebSearchTool(BaseTool):
+    """Agent tool on top of a SearchService, with parallel sub-queries."""
+
+    name: str = "WebSearch"
+    description: str = (
+        "A web search engine. Useful for answering questions about current events "
+        "or facts you don't know. Input should be a search query. To look up several "
+        f"independent things at once, separate the queries with '{WEB_SEARCH_CONFIG['query_separator']}'."
+    )
+    service: SearchService
+
+    def _run(self, query: str, run_manager=None) -> str:
+        queries = [q.strip() for q in query.split(WEB_SEARCH_CONFIG["query_separator"]) if q.strip()]
+        queries = queries[:WEB_SEARCH_CONFIG["max_subqueries"]]
+        if not queries:
+            return "Empty search query."
+        with span(f"tool.{self.name}", queries=len(queries)), track(TOOL_CALLS, TOOL_SECONDS, self.name):
+            results = self.service.search_many(queries)
+        if len(results) == 1:
+            return results[0]
+        return "\n\n".join(f"Results for '{q}':\n{r}" for q, r in zip(queries, results))
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_search_service():
+    """Returns the shared DuckDuckGo-backed search service."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = SearchService(DuckDuckGoBackend())
+        return _service